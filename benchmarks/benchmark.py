@@ -0,0 +1,263 @@
+"""
+Benchmarks for the Weil-Peterson calculator.
+
+    python -m benchmarks.benchmark run [--targets 1,3 2,2 ...] [--engines default rational ...]
+    python -m benchmarks.benchmark compare [--threshold 0.2] [--baseline INDEX]
+
+`run` times the recursion from an empty base table (see WeilPetersonTable.initialize_table)
+up to each target, the integrators and F as microbenchmarks, and loading and saving tables,
+and appends the results to a history file of JSON lines. `compare` compares the last run in
+the history with an earlier one, by default the last one on the same machine, and exits with
+status 1 if any benchmark got slower by more than the threshold.
+"""
+from datetime import datetime
+from pathlib import Path
+import subprocess
+import tempfile
+import platform
+import argparse
+import time
+import json
+import sys
+
+PROJECT_ROOT = Path(__file__).parent.parent
+HISTORY = Path(__file__).parent / "history.jsonl"
+
+DEFAULT_TARGETS = [(0, 7), (1, 5), (2, 3), (3, 1), (3, 0)]
+ENGINES = {"default": {}, "rational": {"rational": True}, "modular": {}, "float": {"exact": False}}
+
+def best_of(function, repeat=3):
+    """
+    Returns the shortest wall time of repeat calls of function
+    """
+    times = []
+    for _ in range(repeat):
+        T0 = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - T0)
+    return min(times)
+
+def _base_table(directory):
+    from src.mirzakhani_recursion import WeilPetersonTable
+
+    filename = Path(directory) / "base.pkl"
+    WeilPetersonTable(None).initialize_table(filename)
+    return filename
+
+def bench_recursion(targets, engines, directory):
+    """
+    Times each engine from an empty base table up to the targets, in order,
+    so later targets can use the entries of earlier ones
+    """
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+    from src.modular import MultiModularSolver
+    import src.kernels as kernels
+
+    results = {}
+    for engine in engines:
+        kernels.shared_cache.clear()
+        calculator = WeilPetersonCalculator(_base_table(directory), **ENGINES[engine])
+        for g, n in targets:
+            T0 = time.perf_counter()
+            if engine == "modular":
+                MultiModularSolver(calculator).run([(g, n)])
+            else:
+                calculator(g, n)
+            results[f"recursion/{engine}/V_({g},{n})"] = time.perf_counter() - T0
+
+    return results
+
+def bench_kernels(k_max=30, repeat=3):
+    """
+    Times the exact F_{2k-1} coefficients, and F as a SymPy expression
+    """
+    import sympy as sp
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+    import src.kernels as kernels
+
+    def rational():
+        for k in range(1, k_max + 1):
+            kernels.F_rational(k)
+
+    calculator = WeilPetersonCalculator(None, kernel_cache=kernels.FKernelCache())
+    t = sp.Symbol("t")
+
+    def expression():
+        calculator.kernels.clear()
+        for k in range(1, k_max + 1):
+            calculator.F(k, t)
+
+    return {f"kernels/F_rational/k≤{k_max}": best_of(rational, repeat),
+            f"kernels/F/k≤{k_max}": best_of(expression, repeat)}
+
+def bench_integrals(directory, g=2, n=4, repeat=3):
+    """
+    Times the integrators on the integrands of the terms of V_(g,n), built as the
+    calculator builds them, and building the integrand of the second term
+    """
+    import src.integration as integration
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+
+    calculator = WeilPetersonCalculator(_base_table(directory))
+    calculator(g, n)
+
+    double = calculator._integrand_1(g, n)
+    single = calculator._integrand_3(g, n)
+
+    return {f"integration/double_integral/V_({g-1},{n+1})":
+                best_of(lambda: integration.double_integral(double, calculator.F_coefficients,
+                                                            calculator._double_weight), repeat),
+            f"integration/single_integral/V_({g},{n-1})":
+                best_of(lambda: integration.single_integral(single, calculator.F_coefficients), repeat),
+            f"integration/split_integrand/V_({g},{n})":
+                best_of(lambda: calculator._integrand_2(g, n), repeat)}
+
+def bench_tables(directory, targets, repeat=3):
+    """
+    Times saving and loading a table with the targets, as a pickle, a compact pickle and a store
+    """
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+
+    calculator = WeilPetersonCalculator(_base_table(directory), rational=True)
+    for g, n in targets:
+        calculator(g, n)
+
+    results = {}
+    for name, suffix, compact in [("pickle", ".pkl", False), ("compact", ".pkl", True), ("store", ".sqlite", False)]:
+        filename = Path(directory) / f"{name}{suffix}"
+        if compact:
+            calculator.compact_table()
+
+        def save():
+            if filename.exists():
+                filename.unlink()
+            calculator.save_table(filename)
+
+        def load():
+            table = WeilPetersonCalculator(filename)
+            for g, n in targets:
+                table._check_table(g, n)
+            if table.store is not None:
+                table.store.close()
+
+        results[f"tables/save/{name}"] = best_of(save, repeat)
+        results[f"tables/load/{name}"] = best_of(load, repeat)
+
+    return results
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(targets=DEFAULT_TARGETS, engines=("default", "rational"), history=HISTORY, repeat=3):
+    """
+    Runs every benchmark and appends the results to the history file
+
+    :returns: the history record of the run
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        results = {}
+        results.update(bench_recursion(targets, engines, directory))
+        results.update(bench_kernels(repeat=repeat))
+        results.update(bench_integrals(directory, repeat=repeat))
+        results.update(bench_tables(directory, targets, repeat=repeat))
+
+    record = {"date": datetime.now().isoformat(timespec="seconds"),
+              "commit": _commit(),
+              "machine": platform.node(),
+              "python": platform.python_version(),
+              "results": results}
+
+    with open(history, "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+    return record
+
+def load_history(history=HISTORY):
+    if not Path(history).exists():
+        return []
+    with open(history) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def same_machine(baseline, current):
+    return (baseline.get("machine"), baseline.get("python")) == (current.get("machine"), current.get("python"))
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compares the results of two runs. Times from different machines or Python versions
+    are not comparable, so they are never reported as regressions.
+
+    :returns: list of (name, baseline time, current time, relative change), and the
+              list of names that got slower by more than threshold
+    """
+    comparable = same_machine(baseline, current)
+    rows, regressions = [], []
+    for name, t in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        t0 = baseline["results"][name]
+        change = (t - t0) / t0 if t0 else 0.0
+        rows.append((name, t0, t, change))
+        if comparable and change > threshold:
+            regressions.append(name)
+
+    return rows, regressions
+
+def _parse_target(text):
+    g, n = text.split(",")
+    return int(g), int(n)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the Weil-Peterson calculator")
+    parser.add_argument("--history", type=str, default=str(HISTORY))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--targets", type=_parse_target, nargs="+", default=DEFAULT_TARGETS)
+    run_parser.add_argument("--engines", type=str, nargs="+", default=["default", "rational"], choices=list(ENGINES))
+    run_parser.add_argument("--repeat", type=int, default=3)
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--baseline", type=int, default=None,
+                                help="index of the baseline run in the history, by default the last earlier "
+                                     "run on the same machine")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        record = run(args.targets, args.engines, args.history, args.repeat)
+        for name, t in record["results"].items():
+            print(f"{name:<50} {1e3*t:12.3f} ms")
+        return 0
+
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two runs in the history to compare.")
+        return 0
+
+    current = history[-1]
+    if args.baseline is None:
+        earlier = [record for record in history[:-1] if same_machine(record, current)]
+        if not earlier:
+            print(f"No earlier run on {current.get('machine')} to compare with.")
+            return 0
+        baseline = earlier[-1]
+    else:
+        baseline = history[args.baseline]
+        if not same_machine(baseline, current):
+            print(f"The baseline ran on {baseline.get('machine')} (Python {baseline.get('python')}), "
+                  f"not {current.get('machine')} (Python {current.get('python')}): changes are not regressions.")
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    for name, t0, t, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<50} {1e3*t0:12.3f} ms {1e3*t:12.3f} ms {100*change:+7.1f}%{flag}")
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,11 @@ import argparse
 import logging
 from pathlib import Path
 from src.mirzakhani_recursion import WeilPetersonCalculator, WeilPetersonTable
+from src.scheduler import Scheduler
+from src.modular import MultiModularSolver
+from src.profiling import Profiler
+from src.batch import BatchRun, parse_targets
+from src.profiling import peak_rss
 
 TODAY = datetime.now().strftime("%d-%m-%Y")
 PROJECT_ROOT = Path(__file__).parent
@@ -21,9 +26,18 @@ parser = argparse.ArgumentParser(
     
 tab_dir = "tables/"
 parser.add_argument("-r", "--run"       , type=bool, default=True)
-parser.add_argument("-g", "--genus"     , type=int , default=False)
-parser.add_argument("-n", "--boundaries", type=int , default=False)
-parser.add_argument("-e", "--exact"     , type=bool, default=True)
+parser.add_argument("-g", "--genus"     , type=str , default=None, help="genus, list or range, e.g. 2, 1,3 or 7:20")
+parser.add_argument("-n", "--boundaries", type=str , default=None, help="no. of boundaries, list or range, e.g. 0:3")
+parser.add_argument("-e", "--exact"     , action=argparse.BooleanOptionalAction, default=True)
+parser.add_argument("-p", "--precision" , type=int , default=None)
+parser.add_argument("-j", "--jobs"      , type=int , default=1)
+parser.add_argument("--entry-jobs"      , type=int , default=1, help="processes integrating the terms of one entry")
+parser.add_argument("-c", "--compact"   , action=argparse.BooleanOptionalAction, default=False)
+parser.add_argument("-q", "--rational"  , action=argparse.BooleanOptionalAction, default=False)
+parser.add_argument("-m", "--modular"   , action=argparse.BooleanOptionalAction, default=False)
+parser.add_argument("--min-degree"      , type=int , default=None)
+parser.add_argument("--max-degree"      , type=int , default=None)
+parser.add_argument("--memory-budget"   , type=float, default=None, help="MiB of table entries kept in memory")
 
 parser.add_argument("-o" , "--output"      , type=str , default=False)
 parser.add_argument("-i" , "--input"       , type=str , default=f"Weil-Peterson-base.pkl")
@@ -33,8 +47,17 @@ parser.add_argument("-t", "--test"      , type=bool, default=False)
 parser.add_argument("-d", "--display"   , type=str , default=False)
 parser.add_argument("-v", "--verbose"   , type=bool, default=True)
 parser.add_argument("-s", "--save"      , type=bool, default=True)
+parser.add_argument("--save-interval"   , type=float, default=300, help="seconds between saves of the table")
+parser.add_argument("-k", "--save-kernels", action=argparse.BooleanOptionalAction, default=False)
 parser.add_argument("-new", "--new"     , type=str , default=False)
 parser.add_argument("-init", "--initialize", type=str, default=False)
+parser.add_argument("--import", dest="import_tables", type=str, nargs="+", default=False)
+parser.add_argument("--merge"   , type=str, nargs="+", default=False, help="pickled tables to merge into a store")
+parser.add_argument("--info"    , type=str, default=False)
+parser.add_argument("--verify"  , type=str, default=False, help="check every entry of a table at random points mod p")
+parser.add_argument("-cp", "--checkpoint", action=argparse.BooleanOptionalAction, default=True)
+parser.add_argument("--resume"  , action="store_true")
+parser.add_argument("--profile" , type=str, default=False)
 
 args = parser.parse_args()
 
@@ -57,7 +80,46 @@ if args.display:
     table = WeilPetersonTable(DATA_PATH/args.display)
     table.display_table()
 
-if not args.genus and not args.boundaries:
+if args.info:
+    table = WeilPetersonTable(DATA_PATH/args.info)
+    if table.store is not None:
+        print(table.store.info())
+    else:
+        print({"file": str(DATA_PATH/args.info), "entries": len(table.keys())})
+
+if args.verify:
+    # e.g. python main.py --verify old/mytable_poly_broken.pkl -j 4
+    import src.verification as verification
+    table = WeilPetersonTable(DATA_PATH/args.verify)
+    results = verification.verify_table(table, jobs=args.jobs)
+    failed = {key: failures for key, failures in results.items() if failures}
+    for (g, n), failures in failed.items():
+        print(f"V_({g},{n}): " + "; ".join(failures))
+    print(f"{len(results) - len(failed)} of {len(results)} entries passed.")
+    exit(1 if failed else 0)
+
+if args.import_tables:
+    target = args.input_output or args.output or args.input
+    table = WeilPetersonTable(DATA_PATH/target)
+    for filename in args.import_tables:
+        table.import_table(filename)
+    table.save_table(DATA_PATH/target)
+
+if args.merge:
+    # e.g. python main.py --merge data/*/table_*.pkl -o shared.sqlite
+    target = args.input_output or args.output or args.input
+    table = WeilPetersonTable(DATA_PATH/target)
+    totals = {}
+    for filename in args.merge:
+        statuses = table.merge_table(filename)
+        for status, entries in statuses.items():
+            totals[status] = totals.get(status, 0) + len(entries)
+        print(f"{filename}: " + ", ".join(f"{len(entries)} {status}" for status, entries in sorted(statuses.items())))
+    print("Total: " + ", ".join(f"{count} {status}" for status, count in sorted(totals.items())))
+    for g, n, source, record in table.store.conflicts():
+        print(f"Kept apart (conflicting or disjoint): V_({g},{n}) in <{source}>")
+
+if args.genus is None and args.boundaries is None:
     logging.warning("No (g,n) specified. Exiting.")
     logging.info("Session finished.\n    ___________\n")
     exit()
@@ -67,32 +129,82 @@ if args.input_output:
     args.output = args.input_output
     
 if args.run:
-    calculator = WeilPetersonCalculator(f"{DATA_PATH}/{args.input}", exact=args.exact)
+    # The scheduler computes exact entries only
+    if args.jobs > 1 and not args.exact and not args.modular:
+        parser.error("--jobs only applies to exact computations, it cannot be used with --no-exact")
     
-    g = args.genus
-    n = args.boundaries
-    V = calculator(g=g, n=n)
-
-    if args.verbose:
-        print("--------------------------------"*2)
-        print(f"V_({g},{n}):")
-        print("--------------------------------"*2)
-        print(V.simplify())
-        print("--------------------------------"*2)
-
-    if args.save or args.output:
+    calculator = WeilPetersonCalculator(f"{DATA_PATH}/{args.input}", exact=args.exact, compact=args.compact,
+                                        checkpoint=args.checkpoint, rational=args.rational,
+                                        precision=args.precision, entry_jobs=args.entry_jobs,
+                                        memory_budget=None if args.memory_budget is None else args.memory_budget*2**20)
+    if args.resume:
+        calculator.resume()
+    if args.profile:
+        calculator.profiler = Profiler()
+    
+    targets = parse_targets(args.genus or 0, args.boundaries or 0)
+    
+    truncated = args.min_degree is not None or args.max_degree is not None
+    if truncated:
+        compute = lambda g, n: calculator(g=g, n=n, min_degree=args.min_degree, max_degree=args.max_degree)
+    elif args.modular:
+        solver = MultiModularSolver(calculator, jobs=args.jobs)
+        compute = lambda g, n: solver.run([(g, n)])[(g, n)]
+    elif args.jobs > 1 and args.exact:
+        scheduler = Scheduler(calculator, jobs=args.jobs)
+        compute = lambda g, n: scheduler.run([(g, n)])[(g, n)]
+    else:
+        compute = lambda g, n: calculator(g=g, n=n)
+    
+    # Approximations are not stored in the table
+    save = None
+    if args.exact and (args.save or args.output):
         if args.output:
-            calculator.save_table(DATA_PATH/args.output)
-
+            SAVE_FILE = DATA_PATH/args.output
         else:
-            from datetime import datetime
-            
             SAVE_PATH = DATA_PATH / TODAY
             
             if not SAVE_PATH.exists():
                 SAVE_PATH.mkdir(parents=True, exist_ok=True)
             
             FILENAME = datetime.now().strftime(f"table_%d-%m-%Y_%H-%M")
-            calculator.save_table(f"{SAVE_PATH}/{FILENAME}.pkl")
+            SAVE_FILE = f"{SAVE_PATH}/{FILENAME}.pkl"
+        save = lambda: calculator.save_table(SAVE_FILE, save_kernels=args.save_kernels)
+    
+    batch = BatchRun(calculator, save=save, save_interval=args.save_interval)
+    try:
+        volumes = batch.run(targets, compute)
+    finally:
+        calculator.close()
+
+    if args.verbose:
+        for (g, n), V in volumes.items():
+            print("--------------------------------"*2)
+            print(f"V_({g},{n}):")
+            print("--------------------------------"*2)
+            print(V.simplify())
+        print("--------------------------------"*2)
+        
+        # Approximations are compared with the exact entries of the table
+        if not args.exact:
+            for (g_err, n_err), (error, method) in calculator.approximation_errors().items():
+                if method == "exact":
+                    print(f"V_({g_err},{n_err}): relative error ≤ {error:.2e}")
+                else:
+                    print(f"V_({g_err},{n_err}): relative error ≈ {error:.2e} (estimated, no exact entry)")
+    
+    if len(targets) > 1:
+        print("\n".join(batch.summary()))
+    
+    if calculator.memory is not None:
+        memory = calculator.memory.report()
+        print(f"Peak memory: {memory['rss']/2**20:.1f} MiB, table entries ≤ {memory['entries']/2**20:.1f} MiB "
+              f"(estimated), {memory['evictions']} evictions, {memory['reloads']} reloads")
+    else:
+        print(f"Peak memory: {peak_rss()/2**20:.1f} MiB")
+    logging.info(f"Peak memory: {peak_rss()/2**20:.1f} MiB")
+
+    if args.profile:
+        calculator.profiler.save(args.profile)
     
 logging.info("Session finished.\n    ___________\n")
\ No newline at end of file
@@ -0,0 +1,399 @@
+from fractions import Fraction
+from math import comb, factorial
+import numpy as np
+import src.kernels as kernels
+import src.scheduler as scheduler
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of rows of the product V₁ ⊗ V₂ built at once in term 2
+_CHUNK = 1 << 20
+
+class ModularArithmetic:
+    """
+    Arithmetic in Z/pZ on int64 arrays. Primes are kept below 2^31,
+    so that products of two residues fit in an int64.
+    """
+    dtype = np.int64
+
+    def __init__(self, p):
+        if not 2 < p < 2**31:
+            raise ValueError(f"Modulus {p} does not fit the int64 arithmetic")
+        self.p = p
+
+    def convert(self, r):
+        """
+        Returns the residue of the rational r
+        """
+        r = Fraction(r)
+        den = r.denominator % self.p
+        if den == 0:
+            raise ZeroDivisionError(f"{r} is not defined modulo {self.p}")
+        return r.numerator * pow(den, -1, self.p) % self.p
+
+    def array(self, values):
+        return np.array([self.convert(r) for r in values], dtype=self.dtype)
+
+    def zeros(self, size):
+        return np.zeros(size, dtype=self.dtype)
+
+    def integers(self, a):
+        """
+        Returns the residues of an int64 array
+        """
+        return a % self.p
+
+    def inverse(self, a):
+        return np.array([pow(int(x), -1, self.p) for x in a], dtype=self.dtype)
+
+    def mul(self, a, b):
+        return a * b % self.p
+
+    def reduce(self, a):
+        return a % self.p
+
+    def nonzero(self, a):
+        return a != 0
+
+class FloatArithmetic:
+    """
+    Floating-point arithmetic on float64 arrays
+    """
+    dtype = np.float64
+
+    def convert(self, r):
+        return float(Fraction(r))
+
+    def array(self, values):
+        return np.array([self.convert(r) for r in values], dtype=self.dtype)
+
+    def zeros(self, size):
+        return np.zeros(size, dtype=self.dtype)
+
+    def integers(self, a):
+        return a.astype(self.dtype)
+
+    def inverse(self, a):
+        return 1 / a
+
+    def mul(self, a, b):
+        return a * b
+
+    def reduce(self, a):
+        return a
+
+    def nonzero(self, a):
+        return a != 0
+
+class MPArithmetic(FloatArithmetic):
+    """
+    Floating-point arithmetic with dps decimal digits on object arrays of mpmath numbers.
+    The numbers belong to a context of their own, so the global mpmath precision is left alone.
+    """
+    dtype = object
+
+    def __init__(self, dps=50):
+        import mpmath
+        self.dps = dps
+        self.mp = mpmath.MPContext()
+        self.mp.dps = dps
+
+    def convert(self, r):
+        r = Fraction(r)
+        return self.mp.mpf(r.numerator) / r.denominator
+
+    def zeros(self, size):
+        return np.array([self.mp.zero]*size, dtype=object)
+
+    def integers(self, a):
+        return np.array([self.mp.mpf(int(x)) for x in a], dtype=object)
+
+    def nonzero(self, a):
+        return np.array([bool(x) for x in a], dtype=bool)
+
+def _remove_each(P):
+    """
+    For an array of partitions P, yields (mask, x, R) for each column i, where mask
+    selects the rows in which P[:, i] is the first occurrence of its value, x is that
+    value and R the rest of the partition
+    """
+    for i in range(P.shape[1]):
+        if i == 0:
+            mask = np.ones(len(P), dtype=bool)
+        else:
+            mask = P[:, i] != P[:, i-1]
+        yield mask, P[mask, i], np.delete(P[mask], i, axis=1)
+
+def _orbit_sizes(R):
+    """
+    Returns the number of distinct permutations of each row of an array of partitions R
+    """
+    m = R.shape[1]
+    # Π count! over the values of the row, as the product of the positions within each run
+    runs = np.ones(len(R), dtype=np.int64)
+    position = np.ones(len(R), dtype=np.int64)
+    for i in range(1, m):
+        position = np.where(R[:, i] == R[:, i-1], position + 1, 1)
+        runs *= position
+    return factorial(m) // runs
+
+class ArrayRecursion:
+    """
+    Mirzakhani's recursion on NumPy arrays, for the rational coefficients of the
+    volumes, with the powers of π implied by the grading (see WeilPetersonCalculator.rational).
+    The coefficients are elements of a field given by an arithmetic: ModularArithmetic,
+    FloatArithmetic or MPArithmetic.
+
+    A volume V_(g,n) = Σ_α c_α m_α (see SymmetricVolume) is kept as a pair (P, C) of an
+    (m, n) array of partitions α, padded with zeros to n parts, and the array of the c_α.
+    The recursion only computes the coefficients of the monomials with non-increasing
+    exponents, which determine the symmetric volume.
+    """
+    def __init__(self, arithmetic, known=None):
+        """
+        :param arithmetic: coefficient arithmetic
+        :param known: optional dict {(g,n): {α: rational}} of volumes to start from
+        """
+        self.arithmetic = arithmetic
+        self.volumes = {}
+        self._splits = {}
+        self._size = -1
+
+        for (g, n), coefficients in (known or {}).items():
+            self.add(g, n, coefficients)
+
+    def add(self, g, n, coefficients):
+        """
+        Adds V_(g,n) given as a dict {α: rational}
+        """
+        P = np.zeros((len(coefficients), n), dtype=np.int64)
+        for i, alpha in enumerate(coefficients):
+            P[i, :len(alpha)] = alpha
+        self.volumes[(g, n)] = (P, self.arithmetic.array(coefficients.values()))
+
+    def coefficients(self, g, n):
+        """
+        Returns V_(g,n) as a dict {α: coefficient}, computing it if necessary
+        """
+        P, C = self.volume(g, n)
+        return {tuple(int(a) for a in row if a): c for row, c in zip(P, C)}
+
+    def volume(self, g, n):
+        """
+        Returns the pair (P, C) of V_(g,n), computing it if necessary
+        """
+        if (g, n) not in self.volumes:
+            self.compute([(g, n)])
+        return self.volumes[(g, n)]
+
+    def compute(self, targets):
+        """
+        Computes the volumes of targets and everything they depend on, bottom-up
+        """
+        graph = scheduler.dependency_graph(targets, known=lambda g, n: (g, n) in self.volumes)
+        self._tables(max((3*g + n for g, n in graph), default=0))
+        for level in scheduler.levels(graph):
+            for g, n in level:
+                self.volumes[(g, n)] = self._calculate(g, n)
+
+    def _tables(self, size):
+        """
+        Builds the tables F[k, j] = r_j of F_{2k-1} (see kernels.F_rational),
+        W[a, b] = (2a-1)!(2b-1)!/(2a+2b-1)! and the inverses 1/(2(2h+1)), for k, a, b, h ≤ size
+        """
+        if size <= self._size:
+            return
+
+        arithmetic = self.arithmetic
+        self._F = np.zeros((size + 1, size + 1), dtype=arithmetic.dtype)
+        self._W = np.zeros((size + 1, size + 1), dtype=arithmetic.dtype)
+        self._F[:] = arithmetic.convert(0)
+        self._W[:] = arithmetic.convert(0)
+        for k in range(1, size + 1):
+            self._F[k, :k+1] = arithmetic.array(kernels.shared_cache.rational(k))
+            self._W[k, 1:] = arithmetic.array(kernels.double_weight(k, b) for b in range(1, size + 1))
+        self._integration = arithmetic.array(Fraction(1, 2*(2*h + 1)) for h in range(size + 1))
+        self._size = size
+
+    def _combine(self, P, C):
+        """
+        Adds up the coefficients of equal rows of P, and drops the zero ones
+        """
+        m, n = P.shape
+        if m == 0:
+            return P, C
+
+        if n == 0:
+            index, inverse = np.zeros(1, dtype=np.intp), np.zeros(m, dtype=np.intp)
+        else:
+            base = int(P.max()) + 1
+            if base**n < 2**62:
+                # Rows are encoded as integers in base max+1
+                keys = P @ (base ** np.arange(n - 1, -1, -1, dtype=np.int64))
+                _, index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            else:
+                _, index, inverse = np.unique(P, axis=0, return_index=True, return_inverse=True)
+
+        total = self.arithmetic.zeros(len(index))
+        np.add.at(total, inverse.ravel(), C)
+        total = self.arithmetic.reduce(total)
+
+        keep = self.arithmetic.nonzero(total)
+        return P[index][keep], total[keep]
+
+    def _split(self, g, n):
+        """
+        Returns the terms of V_(g,n)(x, L2, ..., Ln) grouped by the exponent of x and the
+        sorted exponents of L2, ..., Ln, as arrays (x, R, C). Each coefficient is multiplied
+        by the number of monomials in the group, the distinct permutations of R.
+        """
+        if (g, n) not in self._splits:
+            P, C = self.volume(g, n)
+            xs, rests, coeffs = [], [], []
+            for mask, x, rest in _remove_each(P):
+                xs.append(x)
+                rests.append(rest)
+                coeffs.append(self.arithmetic.mul(C[mask], self.arithmetic.integers(_orbit_sizes(rest))))
+
+            self._splits[(g, n)] = (np.concatenate(xs), np.concatenate(rests), np.concatenate(coeffs))
+
+        return self._splits[(g, n)]
+
+    def _double_integral(self, k, rest, c):
+        """
+        Integrates the terms c x^(2a-1) y^(2b-1) H(x+y, L1) L^(2 rest), with k = a+b,
+        keeping only the non-increasing monomials L1^(2j) L^(2 rest)
+        """
+        P, c = self._combine(np.column_stack([k, rest]), c)
+        k, rest = P[:, 0], P[:, 1:]
+        first = rest[:, 0] if rest.shape[1] else np.zeros(len(k), dtype=np.int64)
+
+        rows, coeffs = [], []
+        for j in range(0, int(k.max(initial=0)) + 1):
+            mask = (k >= j) & (first <= j)
+            if mask.any():
+                rows.append(np.column_stack([np.full(mask.sum(), j), rest[mask]]))
+                coeffs.append(self.arithmetic.mul(c[mask], self._F[k[mask], j]))
+
+        return rows, coeffs
+
+    def _term_1(self, g, n):
+        if g < 1:
+            return [], []
+
+        # V_(g-1,n+1)(x, L2, ..., Ln, y), for the exponents of x and y taken out of each
+        # partition in every way, with the rest in decreasing order
+        P, C = self.volume(g-1, n+1)
+        k, rests, coeffs = [], [], []
+        for mask, x, R in _remove_each(P):
+            for mask_y, y, rest in _remove_each(R):
+                a, b = x[mask_y] + 1, y + 1
+                k.append(a + b)
+                rests.append(rest)
+                coeffs.append(self.arithmetic.mul(C[mask][mask_y], self._W[a, b]))
+
+        return self._double_integral(np.concatenate(k), np.concatenate(rests), np.concatenate(coeffs))
+
+    def _term_2(self, g, n):
+        arithmetic = self.arithmetic
+
+        # As in WeilPetersonCalculator._compute_term_2, one representative I per (g₁, n₁),
+        # accumulated by the sorted exponents of L2, ..., Ln
+        rows, coeffs = [], []
+        for g1 in range(0, g+1):
+            g2 = g - g1
+            for n1 in range(0, n):
+                n2 = n - 1 - n1
+                if (2*g1 + n1 < 2) or (2*g2 + n2 < 2):
+                    continue
+
+                x1, R1, C1 = self._split(g1, n1+1)
+                x2, R2, C2 = self._split(g2, n2+1)
+                C1 = arithmetic.mul(C1, arithmetic.convert(comb(n-1, n1)))
+
+                step = max(1, _CHUNK // max(len(x2), 1))
+                for start in range(0, len(x1), step):
+                    i = np.repeat(np.arange(start, min(start + step, len(x1))), len(x2))
+                    j = np.tile(np.arange(len(x2)), len(i) // max(len(x2), 1))
+
+                    a, b = x1[i] + 1, x2[j] + 1
+                    rest = -np.sort(-np.concatenate([R1[i], R2[j]], axis=1), axis=1)
+                    c = arithmetic.mul(arithmetic.mul(C1[i], C2[j]), self._W[a, b])
+
+                    P, c = self._combine(np.column_stack([a + b, rest]), c)
+                    rows.append(P)
+                    coeffs.append(c)
+
+        if not rows:
+            return [], []
+
+        # Average over each orbit
+        P, c = self._combine(np.concatenate(rows), np.concatenate(coeffs))
+        orbits = arithmetic.integers(_orbit_sizes(P[:, 1:]))
+        c = arithmetic.mul(c, arithmetic.inverse(orbits))
+
+        return self._double_integral(P[:, 0], P[:, 1:], c)
+
+    def _term_3(self, g, n):
+        if n < 2:
+            return [], []
+
+        # V_(g,n-1)(x, L̂_k) contributes 2 C(2j, 2t) r_j L1^(2j-2t) Lk^(2t). Only monomials
+        # with non-increasing exponents are kept, so the others are taken in decreasing order.
+        P, C = self.volume(g, n-1)
+        rows, coeffs = [], []
+        for mask, x, others in _remove_each(P):
+            a, c = x + 1, C[mask]
+            for k in range(0, n-1):
+                rest = np.insert(others, k, 0, axis=1)
+                above = rest[:, k-1] if k > 0 else None
+                below = rest[:, k+1] if k < n-2 else np.zeros(len(rest), dtype=np.int64)
+                first = rest[:, 0] if k > 0 else None
+
+                for j in range(0, int(a.max(initial=0)) + 1):
+                    for t in range(0, j//2 + 1):
+                        mask_t = (a >= j) & (below <= t)
+                        if above is not None:
+                            mask_t &= (above >= t) & (first <= j - t)
+                        if not mask_t.any():
+                            continue
+
+                        row = rest[mask_t]
+                        row[:, k] = t
+                        factor = self.arithmetic.convert(2*comb(2*j, 2*t))
+                        rows.append(np.column_stack([np.full(len(row), j - t), row]))
+                        coeffs.append(self.arithmetic.mul(self.arithmetic.mul(c[mask_t], self._F[a[mask_t], j]), factor))
+
+        return rows, coeffs
+
+    def _calculate(self, g, n):
+        arithmetic = self.arithmetic
+
+        if (g, n) == (0, 3):
+            return np.zeros((1, 3), dtype=np.int64), arithmetic.array([1])
+        if (g, n) == (1, 1):
+            return np.array([[1], [0]], dtype=np.int64), arithmetic.array([Fraction(1, 48), Fraction(1, 12)])
+        if 2*g + n <= 3:
+            return np.zeros((0, n), dtype=np.int64), arithmetic.zeros(0)
+
+        # Dilaton equation: c L1^(2j) contributes c 2j (-4)^(j-1) / (2g-2)
+        if n == 0:
+            P, C = self.volume(g, 1)
+            factors = arithmetic.array(Fraction(2*j*(-4)**(j-1), 2*g - 2) if j else 0 for j in P[:, 0].tolist())
+            return self._combine(np.zeros((len(C), 0), dtype=np.int64), arithmetic.mul(C, factors))
+
+        self._tables(3*g + n)
+
+        rows, coeffs = [], []
+        for term in (self._term_1, self._term_2, self._term_3):
+            term_rows, term_coeffs = term(g, n)
+            rows.extend(term_rows)
+            coeffs.extend(term_coeffs)
+
+        if not rows:
+            return np.zeros((0, n), dtype=np.int64), arithmetic.zeros(0)
+
+        # ∫ L1^(2h) dL1 / (2 L1) = L1^(2h) / (2(2h+1))
+        P, C = self._combine(np.concatenate(rows), np.concatenate(coeffs))
+        return P, arithmetic.mul(C, self._integration[P[:, 0]])
@@ -0,0 +1,114 @@
+"""
+Computing many volumes V_(g,n) in one process.
+
+The targets are ordered by the levels of their shared dependency graph (see
+scheduler), so every target finds its dependencies already in the table, and
+all targets are computed by one calculator, keeping its table, kernels and
+caches warm in between.
+"""
+import src.scheduler as scheduler
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def parse_values(text):
+    """
+    Parses a list of non-negative integers: "7", "7:20" (inclusive), "1,3,5",
+    or combinations such as "0:2,5"
+
+    :returns: sorted list of ints
+    """
+    values = set()
+    for part in str(text).split(","):
+        part = part.strip()
+        if ":" in part:
+            start, stop = part.split(":")
+            values.update(range(int(start), int(stop) + 1))
+        elif part:
+            values.add(int(part))
+
+    if any(value < 0 for value in values):
+        raise ValueError(f"Negative value in {text}")
+    return sorted(values)
+
+def parse_targets(genus, boundaries):
+    """
+    Returns every (g,n) with g in the values of genus and n in the values of boundaries
+    (see parse_values), leaving out the unstable ones with 2g-2+n ≤ 0
+    """
+    return [(g, n) for g in parse_values(genus) for n in parse_values(boundaries) if 2*g - 2 + n > 0]
+
+def plan(targets, known=None):
+    """
+    Orders the targets so that the dependencies of each are computed before it
+
+    :param known: optional predicate known(g, n) for entries that are already available
+    :returns: list of (g,n)
+    """
+    targets = set(targets)
+    graph = scheduler.dependency_graph(targets, known=known)
+    order = [node for level in scheduler.levels(graph) for node in level if node in targets]
+    # Known targets are looked up first
+    return sorted(targets - set(order)) + order
+
+class BatchRun:
+    """
+    Computes a list of targets with one calculator, in the order of plan, saving the
+    table every save_interval seconds through save(), and once more at the end.
+    """
+    def __init__(self, calculator, save=None, save_interval=300):
+        """
+        :param save: function called without arguments to save the table, or None
+        :param save_interval: smallest number of seconds between two saves
+        """
+        self.calculator = calculator
+        self.save = save
+        self.save_interval = save_interval
+        self.times = {}
+
+    def _known(self, g, n):
+        return self.calculator._check_table(g, n)[1]
+
+    def run(self, targets, compute=None):
+        """
+        :param compute: function compute(g, n) returning V_(g,n), by default the calculator
+        :returns: dict {(g,n): V}
+        """
+        if compute is None:
+            compute = self.calculator
+
+        order = plan(targets, known=self._known)
+        logger.info(f"Planned {len(order)} targets: {order}")
+
+        # Entries needed by later targets are evicted last (see memory.MemoryBudget)
+        if getattr(self.calculator, "memory", None) is not None:
+            self.calculator.memory.plan(order)
+
+        results = {}
+        last_save = time.time()
+        for i, (g, n) in enumerate(order):
+            T0 = time.time()
+            results[(g, n)] = compute(g, n)
+            self.times[(g, n)] = time.time() - T0
+            logger.info(f"Target {i+1}/{len(order)}: V_({g},{n}) ({self.times[(g, n)]:.2f} s)")
+
+            if self.save is not None and time.time() - last_save >= self.save_interval and i + 1 < len(order):
+                self.save()
+                last_save = time.time()
+
+        if self.save is not None:
+            self.save()
+
+        return results
+
+    def summary(self):
+        """
+        Returns the lines of a table of the time spent on each target
+        """
+        lines = [f"{'target':<12}{'time (s)':>12}{'total (s)':>12}"]
+        total = 0.0
+        for (g, n), t in self.times.items():
+            total += t
+            lines.append(f"{f'V_({g},{n})':<12}{t:>12.2f}{total:>12.2f}")
+        return lines
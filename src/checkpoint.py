@@ -0,0 +1,116 @@
+from pathlib import Path
+import tempfile
+import pickle
+import struct
+import json
+import zlib
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<QI")     # payload length, CRC32 of payload
+
+def journal_file(table_file):
+    """
+    Returns the journal file belonging to a table
+    """
+    table_file = Path(table_file)
+    return table_file.with_name(table_file.stem + ".journal")
+
+def atomic_dump(obj, filename):
+    """
+    Pickles obj to filename by writing a temporary file in the same directory
+    and renaming it, so filename always holds either the old or the new table
+    """
+    filename = Path(filename)
+    fd, tmp = tempfile.mkstemp(dir=filename.parent, prefix=filename.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(obj, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+class Journal:
+    """
+    Append-only journal of table entries.
+
+    Each entry is written as a length and checksum header followed by the
+    compressed record, and synced to disk before returning. A crash while
+    writing can only leave a truncated last entry, which is cut off (see repair)
+    on replay and before the first new entry is appended.
+    """
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self._repaired = False
+
+    def _valid_length(self):
+        """
+        Returns the length of the complete entries at the start of the journal
+        """
+        offset = 0
+        with open(self.filename, "rb") as file:
+            while True:
+                header = file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return offset
+                length, checksum = _HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    return offset
+                offset += _HEADER.size + length
+
+    def repair(self):
+        """
+        Cuts off a truncated or corrupted last entry, so that new entries can be replayed
+        """
+        self._repaired = True
+        if not self.filename.exists():
+            return
+
+        length = self._valid_length()
+        if length < os.path.getsize(self.filename):
+            logger.warning(f"Cutting off an incomplete entry at the end of <{self.filename}>.")
+            os.truncate(self.filename, length)
+
+    def append(self, g, n, record):
+        if not self._repaired:
+            self.repair()
+
+        payload = zlib.compress(json.dumps({"g": g, "n": n, "record": record}, separators=(",", ":")).encode())
+        with open(self.filename, "ab") as file:
+            file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def replay(self):
+        """
+        Yields (g, n, record) for every complete entry, up to the first
+        truncated or corrupted one, which is then cut off
+        """
+        if not self.filename.exists():
+            return
+
+        self.repair()
+        with open(self.filename, "rb") as file:
+            while True:
+                header = file.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, checksum = _HEADER.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                entry = json.loads(zlib.decompress(payload))
+                yield entry["g"], entry["n"], entry["record"]
+
+    def __len__(self):
+        return sum(1 for _ in self.replay())
+
+    def clear(self):
+        if self.filename.exists():
+            self.filename.unlink()
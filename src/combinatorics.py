@@ -0,0 +1,33 @@
+"""
+Combinatorics of exponents, with only the standard library, so that src.query can
+use it without importing SymPy.
+"""
+
+def distinct_permutations(sequence):
+    """
+    Generate all distinct permutations of a sequence with repeated elements,
+    without generating the repeated ones.
+    
+    Parameters:
+    - sequence: Sequence of sortable elements
+    Yields:
+    - Tuples, in lexicographic order
+    """
+    items = sorted(sequence)
+    n = len(items)
+    
+    while True:
+        yield tuple(items)
+        
+        # Find the next permutation in lexicographic order
+        i = n - 2
+        while i >= 0 and items[i] >= items[i+1]:
+            i -= 1
+        if i < 0:
+            return
+        
+        j = n - 1
+        while items[j] <= items[i]:
+            j -= 1
+        items[i], items[j] = items[j], items[i]
+        items[i+1:] = reversed(items[i+1:])
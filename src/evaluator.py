@@ -0,0 +1,211 @@
+"""
+Evaluation of Weil-Peterson volumes at many boundary lengths at once.
+
+A volume V_(g,n) = Σ_α c_α π^(6g-6+2n-2|α|) m_α(L1², ..., Ln²) is symmetric, so it
+can be written in the power sums p_k = Σ_i L_i^(2k) instead:
+
+    V_(g,n) = Σ_λ d_λ π^(6g-6+2n-2|λ|) p_λ,     p_λ = Π_i p_(λ_i),
+
+with λ running over partitions with at most n parts. Evaluating the power sums
+takes a table of powers of the L_i², after which each point costs one product of
+power sums per partition, instead of one product per monomial.
+"""
+from functools import lru_cache
+from fractions import Fraction
+from math import factorial, pi
+from collections import Counter
+import numpy as np
+import src.utils as utils
+
+# Number of (point, partition) pairs evaluated at once
+_CHUNK = 1 << 22
+
+def _automorphisms(mu):
+    """
+    Returns Π_k m_k(μ)!, the number of permutations of the parts of μ that fix it
+    """
+    result = 1
+    for count in Counter(mu).values():
+        result *= factorial(count)
+    return result
+
+@lru_cache(maxsize=None)
+def power_sum_expansion(lam):
+    """
+    Returns p_λ in the monomial basis, as a dict {μ: R_λμ} with p_λ = Σ_μ R_λμ m_μ.
+
+    The product is built in the augmented monomials m̃_μ = Π m_k(μ)! m_μ, where
+        p_k m̃_μ = m̃_(μ ∪ k) + Σ_i m̃_(μ + k e_i).
+    """
+    augmented = {(): 1}
+    for k in lam:
+        product = {}
+        for mu, c in augmented.items():
+            for i in range(len(mu) + 1):
+                nu = list(mu) + [0]*(i == len(mu))
+                nu[i] += k
+                nu = tuple(sorted(nu, reverse=True))
+                product[nu] = product.get(nu, 0) + c
+        augmented = product
+
+    return {mu: c * _automorphisms(mu) for mu, c in augmented.items()}
+
+def to_power_sums(coefficients):
+    """
+    Converts Σ_α c_α m_α to Σ_λ d_λ p_λ.
+
+    Since p_λ = R_λλ m_λ + (terms m_μ with fewer parts), the m_α are eliminated
+    from the longest to the shortest, exactly.
+
+    :param coefficients: dict {α: rational}, α partitions in decreasing order
+    :returns: dict {λ: rational}
+    """
+    remainder = {alpha: Fraction(c) for alpha, c in coefficients.items() if c}
+    result = {}
+    for length in range(max((len(alpha) for alpha in remainder), default=0), -1, -1):
+        for alpha in sorted(alpha for alpha in remainder if len(alpha) == length):
+            c = remainder.pop(alpha)
+            if not c:
+                continue
+
+            expansion = power_sum_expansion(alpha)
+            d = c / expansion[alpha]
+            result[alpha] = d
+            for mu, r in expansion.items():
+                if mu != alpha:
+                    remainder[mu] = remainder.get(mu, 0) - d*r
+
+    return result
+
+class VolumeEvaluator:
+    """
+    Evaluates V_(g,n) at an (N, n) array of boundary lengths, in float64 or in
+    mpmath arbitrary precision.
+
+    With basis="power", the volume is evaluated through the power sums (see the
+    module docstring). The power sum coefficients alternate in sign, so at large
+    lengths cancellation can cost float64 precision. basis="monomial" evaluates
+    every monomial from a table of powers instead, which is slower but has only
+    positive terms.
+    """
+    def __init__(self, coefficients, g, n, basis="power"):
+        """
+        :param coefficients: dict {α: c_α} of rationals, without the powers of π
+        :param basis: "power" or "monomial"
+        """
+        if basis not in ("power", "monomial"):
+            raise ValueError(f"Unknown basis: {basis}")
+
+        self.g = g
+        self.n = n
+        self.basis = basis
+        self.top = 3*g - 3 + n
+
+        if basis == "power":
+            terms = to_power_sums(coefficients)
+        else:
+            terms = {tuple(monom): c for alpha, c in coefficients.items()
+                     for monom in utils.distinct_permutations(list(alpha) + [0]*(n - len(alpha)))}
+
+        self.rationals = list(terms.values())
+
+        # Exponents: rows of parts λ (padded with 0, p_0 = 1) or of monomial exponents of the L_i²
+        width = max((len(key) for key in terms), default=0)
+        self.exponents = np.zeros((len(terms), max(width, 1)), dtype=np.int64)
+        for i, key in enumerate(terms):
+            self.exponents[i, :len(key)] = key
+        self.degree = int(self.exponents.max(initial=0))
+
+        # π^(2(top - |λ|)) is folded into the float64 coefficients
+        self.pi_powers = np.array([2*(self.top - sum(key)) for key in terms], dtype=np.int64)
+        self.coefficients = np.array([float(c) * pi**k for c, k in zip(self.rationals, self.pi_powers)],
+                                     dtype=np.float64)
+        self._mp_coefficients = {}
+
+    @classmethod
+    def from_entry(cls, V, g, n, basis="power"):
+        """
+        Builds the evaluator of a table entry, a SymmetricVolume or a Poly
+        """
+        from src.symmetric import SymmetricVolume
+
+        if not isinstance(V, SymmetricVolume):
+            V = SymmetricVolume.from_poly(V, n)
+        return cls(V.rationals(), g, n, basis=basis)
+
+    def __len__(self):
+        return len(self.rationals)
+
+    def _check(self, L):
+        L = np.asarray(L)
+        if L.ndim == 1:
+            L = L.reshape(1, -1)
+        if L.shape[1] != self.n:
+            raise ValueError(f"Expected lengths of shape (N, {self.n}), got {L.shape}")
+        return L
+
+    def _powers(self, x, one):
+        """
+        Returns the table T of shape (N, degree+1, ...) with T[:, k] = x^k
+        """
+        powers = [np.full_like(x, one)]
+        for _ in range(self.degree):
+            powers.append(powers[-1] * x)
+        return np.stack(powers, axis=1)
+
+    def _evaluate(self, L, coefficients, one):
+        x = L * L
+        result = []
+        step = max(1, _CHUNK // max(self.exponents.size, 1))
+        for start in range(0, len(x), step):
+            chunk = x[start:start + step]
+            powers = self._powers(chunk, one)
+
+            if self.basis == "power":
+                # p_k = Σ_i L_i^(2k), with p_0 = 1
+                sums = powers.sum(axis=2)
+                sums[:, 0] = one
+                products = sums[:, self.exponents].prod(axis=2)
+            else:
+                products = np.ones((len(chunk), len(self.exponents)), dtype=chunk.dtype) * one
+                for i in range(self.n):
+                    products = products * powers[:, self.exponents[:, i], i]
+
+            result.append(products @ coefficients)
+
+        if not result:
+            return np.zeros(0, dtype=L.dtype)
+        return np.concatenate(result)
+
+    def __call__(self, L):
+        """
+        Evaluates the volume in float64.
+
+        :param L: array of shape (N, n) of boundary lengths
+        :returns: array of N volumes
+        """
+        L = self._check(L).astype(np.float64)
+        if self.n == 0:
+            return np.full(len(L), self.coefficients.sum())
+        return self._evaluate(L, self.coefficients, 1.0)
+
+    def evaluate_mp(self, L, dps=50):
+        """
+        Evaluates the volume in mpmath with dps decimal digits.
+
+        :param L: array of shape (N, n) of boundary lengths, as floats, strings or mpf
+        :returns: object array of N mpf volumes
+        """
+        import mpmath
+
+        with mpmath.workdps(dps):
+            if dps not in self._mp_coefficients:
+                self._mp_coefficients[dps] = np.array([mpmath.mpf(c.numerator) / c.denominator * mpmath.pi**int(k)
+                                                       for c, k in zip(self.rationals, self.pi_powers)], dtype=object)
+            coefficients = self._mp_coefficients[dps]
+
+            L = self._check(L)
+            L = np.vectorize(mpmath.mpf, otypes=[object])(L) if L.size else L.astype(object)
+            if self.n == 0:
+                return np.array([sum(coefficients, mpmath.mpf(0))] * len(L), dtype=object)
+            return self._evaluate(L, coefficients, mpmath.mpf(1))
@@ -0,0 +1,214 @@
+"""
+Export of tables to NumPy arrays, for tools that cannot read pickled SymPy objects.
+
+    python -m src.export data/mytable_poly.pkl [-o data/mytable_poly_arrays]
+
+Every V_(g,n) = Σ c π^k L^e is written to a directory g{g}_n{n}/ of .npy files,
+one row per term:
+
+    exponents.npy       int32 (T, n)    exponents e of L1, ..., Ln
+    pi_powers.npy       int32 (T,)      powers k of π
+    numerators.npy      int64 (T,)      c = numerator / denominator, in lowest terms
+    denominators.npy    int64 (T,)
+
+When a numerator or denominator does not fit in int64, the integers of that
+array are instead stored as little-endian two's complement byte strings, one
+after the other in numerators.bytes.npy (uint8), with numerators.offsets.npy
+(int64, T+1) marking where each one starts. index.json lists the entries.
+
+.npy files rather than .npz, since arrays inside a zip archive cannot be memory
+mapped: read_volume maps the files without reading or copying them, and only
+the rows that are used are ever read from disk.
+"""
+from fractions import Fraction
+import argparse
+import json
+import os
+import numpy as np
+
+FORMAT_VERSION = 1
+INT64_MAX = 2**63 - 1
+
+def entry_directory(g, n):
+    return f"g{g}_n{n}"
+
+def _write_integers(directory, name, values):
+    """
+    Writes values as int64 if they all fit, and as byte strings otherwise
+
+    :returns: "int64" or "bytes"
+    """
+    if all(-INT64_MAX <= v <= INT64_MAX for v in values):
+        np.save(os.path.join(directory, f"{name}.npy"), np.array(values, dtype=np.int64))
+        return "int64"
+
+    blobs = [v.to_bytes(v.bit_length()//8 + 1, "little", signed=True) for v in values]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+    np.save(os.path.join(directory, f"{name}.bytes.npy"), np.frombuffer(b"".join(blobs), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    return "bytes"
+
+def write_volume(directory, g, n, record):
+    """
+    Writes the plain record of V_(g,n) (see serialization.volume_to_record) to directory/g{g}_n{n}
+
+    :returns: the entry of index.json
+    """
+    from src.query import record_terms
+
+    exponents, pi_powers, numerators, denominators = [], [], [], []
+    for monom, coefficient in record_terms(record):
+        for k, num, den in coefficient:
+            exponents.append(list(monom[:n]) + [0]*(n - len(monom)))
+            pi_powers.append(k)
+            numerators.append(num)
+            denominators.append(den)
+
+    path = os.path.join(directory, entry_directory(g, n))
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "exponents.npy"), np.array(exponents, dtype=np.int32).reshape(len(exponents), n))
+    np.save(os.path.join(path, "pi_powers.npy"), np.array(pi_powers, dtype=np.int32))
+
+    return {"g": g, "n": n, "terms": len(exponents), "path": entry_directory(g, n),
+            "numerators": _write_integers(path, "numerators", numerators),
+            "denominators": _write_integers(path, "denominators", denominators),
+            "truncation": record.get("truncation")}
+
+def export_table(table, directory):
+    """
+    Writes every entry of a WeilPetersonTable to directory, one entry in memory at a time
+    for stores
+
+    :returns: list of the entries of index.json
+    """
+    import src.serialization as serialization
+
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for g, n in table.keys():
+        V = table._get_entry(g, n, truncated=True)
+        entries.append(write_volume(directory, g, n, serialization.volume_to_record(V, n)))
+
+    # The index is written last, so an interrupted export has none
+    index = os.path.join(directory, "index.json")
+    with open(index + ".tmp", "w") as file:
+        json.dump({"format": FORMAT_VERSION, "entries": entries}, file, indent=1)
+    os.replace(index + ".tmp", index)
+    return entries
+
+class BigIntArray:
+    """
+    Read-only sequence of the integers stored as byte strings (see the module docstring),
+    decoded when they are accessed
+    """
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return int.from_bytes(self.blob[start:stop].tobytes(), "little", signed=True)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class VolumeArrays:
+    """
+    Arrays of V_(g,n) read by read_volume: exponents, pi_powers, and numerators and
+    denominators as int64 arrays or BigIntArrays
+    """
+    def __init__(self, g, n, exponents, pi_powers, numerators, denominators, truncation=None):
+        self.g = g
+        self.n = n
+        self.exponents = exponents
+        self.pi_powers = pi_powers
+        self.numerators = numerators
+        self.denominators = denominators
+        self.truncation = truncation
+
+    def __len__(self):
+        return len(self.pi_powers)
+
+    def rationals(self):
+        """
+        Returns the coefficients {α: c_α} of V_(g,n) in the symmetric monomials m_α(L1², ..., Ln²),
+        without the powers of π, read from the rows with non-increasing exponents only
+        """
+        exponents = np.asarray(self.exponents)
+        if self.n > 1:
+            rows = np.flatnonzero(np.all(exponents[:, :-1] >= exponents[:, 1:], axis=1))
+        else:
+            rows = np.arange(len(self))
+
+        top = 6*self.g - 6 + 2*self.n
+        coefficients = {}
+        for i in rows.tolist():
+            monom = exponents[i].tolist()
+            if self.pi_powers[i] != top - sum(monom):
+                raise ValueError(f"V_({self.g},{self.n}) is not graded: π^{self.pi_powers[i]} L^{monom}")
+            alpha = tuple(e//2 for e in monom if e)
+            coefficients[alpha] = coefficients.get(alpha, 0) + Fraction(int(self.numerators[i]), int(self.denominators[i]))
+        return coefficients
+
+    def evaluator(self, basis="power"):
+        """
+        Returns a VolumeEvaluator of V_(g,n)
+        """
+        from src.evaluator import VolumeEvaluator
+
+        return VolumeEvaluator(self.rationals(), self.g, self.n, basis=basis)
+
+def read_index(directory):
+    with open(os.path.join(directory, "index.json")) as file:
+        return json.load(file)
+
+def _read_integers(path, name, kind, mmap_mode):
+    if kind == "int64":
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+    return BigIntArray(np.load(os.path.join(path, f"{name}.bytes.npy"), mmap_mode=mmap_mode),
+                       np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode=mmap_mode))
+
+def read_volume(directory, g, n, mmap=True, index=None):
+    """
+    Returns the VolumeArrays of V_(g,n) in an exported table, memory mapped unless mmap
+    is False, or None if there is no entry
+
+    :param index: contents of index.json, read if not given
+    """
+    if index is None:
+        index = read_index(directory)
+    entry = next((entry for entry in index["entries"] if (entry["g"], entry["n"]) == (g, n)), None)
+    if entry is None:
+        return None
+
+    mmap_mode = "r" if mmap else None
+    path = os.path.join(directory, entry["path"])
+    truncation = entry.get("truncation")
+    return VolumeArrays(g, n,
+                        np.load(os.path.join(path, "exponents.npy"), mmap_mode=mmap_mode),
+                        np.load(os.path.join(path, "pi_powers.npy"), mmap_mode=mmap_mode),
+                        _read_integers(path, "numerators", entry["numerators"], mmap_mode),
+                        _read_integers(path, "denominators", entry["denominators"], mmap_mode),
+                        None if truncation is None else tuple(truncation))
+
+def main(argv=None):
+    from src.mirzakhani_recursion import WeilPetersonTable
+
+    parser = argparse.ArgumentParser(description="Export a table of Weil-Peterson volumes to NumPy arrays")
+    parser.add_argument("table", type=str)
+    parser.add_argument("-o", "--output", type=str, default=None, help="directory, by default next to the table")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.table)[0] + "_arrays"
+    entries = export_table(WeilPetersonTable(args.table), output)
+    big = sum(1 for entry in entries if "bytes" in (entry["numerators"], entry["denominators"]))
+    print(f"Exported {len(entries)} entries to <{output}> ({big} with integers beyond int64)")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
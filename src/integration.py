@@ -0,0 +1,109 @@
+from math import comb
+
+
+def _accumulate(result, key, value):
+    if key in result:
+        result[key] += value
+    else:
+        result[key] = value
+
+
+def _drop_zeros(result):
+    return {key: value for key, value in result.items() if value}
+
+
+def split_integrand(V1, V2, multiplicity=1, min_degree=0, integrand=None):
+    """
+    Adds the terms of multiplicity * V₁(x, L_I) V₂(y, L_J) to the integrand of double_integral,
+    with the exponents of L_I ⊔ L_J sorted in decreasing order (see the second term of
+    WeilPetersonCalculator). Products of degree too low to integrate to terms of degree
+    at least min_degree are skipped.
+
+    :param V1, V2: dicts {(e1, ..., ek): coefficient}, e1 the exponent of x and y
+    :returns: dict {(a, b, rest): coefficient}
+    """
+    if integrand is None:
+        integrand = {}
+
+    for monom1, c1 in V1.items():
+        a = monom1[0]//2 + 1
+        c1 = multiplicity*c1
+
+        for monom2, c2 in V2.items():
+            # A term of degree d integrates to terms of degree at most d + 4
+            if sum(monom1) + sum(monom2) + 4 < min_degree:
+                continue
+            b = monom2[0]//2 + 1
+            rest = tuple(sorted(monom1[1:] + monom2[1:], reverse=True))
+            _accumulate(integrand, (a, b, rest), c1*c2)
+
+    return integrand
+
+
+def single_integral(integrand, F, min_degree=0):
+    """
+    Integrates against the kernel x*(H(x, L1 + Lk) + H(x, L1 - Lk)).
+
+    The integrand maps (a, k, rest) to the coefficient c of the term
+        c * x^(2a-1) * (H(x, L1 + Lk) + H(x, L1 - Lk)) * L^rest,
+    where k is the position of Lk in rest (the exponents of L2,...,Ln).
+    Since ∫ x^(2a-1) H(x, t) dx = F_{2a-1}(t), and only even powers of Lk
+    survive in F_{2a-1}(L1 + Lk) + F_{2a-1}(L1 - Lk), the result is
+
+        sum_j f_{a,j} * 2 * sum_{m even} C(2j, m) L1^(2j-m) Lk^m.
+
+    :param integrand: dict {(a, k, rest): coefficient}
+    :param F: function returning the coefficients [f_{a,0}, ..., f_{a,a}] of F_{2a-1}(t)
+    :param min_degree: only terms of total degree at least min_degree are computed
+    :returns: dict {(e1, e2, ..., en): coefficient}
+    """
+    # Coefficients 2 C(2j, m) f_{a,j} of L1^(2j-m) Lk^m, for each a
+    expanded = {}
+
+    result = {}
+    for (a, k, rest), c in integrand.items():
+        degree = sum(rest)
+        if 2*a + degree < min_degree:
+            continue
+        if a not in expanded:
+            expanded[a] = [(2*j - m, m, 2*comb(2*j, m)*f)
+                           for j, f in enumerate(F(a)) for m in range(0, 2*j + 1, 2)]
+
+        for e1, m, f in expanded[a]:
+            if e1 + m + degree < min_degree:
+                continue
+            monom = list(rest)
+            monom[k] += m
+            _accumulate(result, (e1, *monom), c*f)
+
+    return _drop_zeros(result)
+
+
+def double_integral(integrand, F, weight, min_degree=0):
+    """
+    Integrates against the kernel x*y*H(x + y, L1).
+
+    The integrand maps (a, b, rest) to the coefficient c of the term
+        c * x^(2a-1) * y^(2b-1) * H(x + y, L1) * L^rest.
+    Each such term integrates to
+        c * (2a-1)!(2b-1)!/(2a+2b-1)! * F_{2a+2b-1}(L1) * L^rest.
+
+    :param integrand: dict {(a, b, rest): coefficient}
+    :param F: function returning the coefficients [f_{k,0}, ..., f_{k,k}] of F_{2k-1}(t)
+    :param weight: function returning (2a-1)!(2b-1)!/(2a+2b-1)!
+    :param min_degree: only terms of total degree at least min_degree are computed
+    :returns: dict {(e1, e2, ..., en): coefficient}
+    """
+    # Terms with the same a+b share the kernel F_{2a+2b-1}(L1)
+    grouped = {}
+    for (a, b, rest), c in integrand.items():
+        if 2*(a + b) + sum(rest) >= min_degree:
+            _accumulate(grouped, (a + b, rest), c*weight(a, b))
+
+    result = {}
+    for (k, rest), c in grouped.items():
+        f = F(k)
+        for j in range(max(0, (min_degree - sum(rest) + 1)//2), len(f)):
+            _accumulate(result, (2*j, *rest), c*f[j])
+
+    return _drop_zeros(result)
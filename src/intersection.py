@@ -0,0 +1,183 @@
+"""
+Intersection numbers on the moduli spaces of curves, and single coefficients of volumes.
+
+By Mirzakhani's theorem, with D = 3g-3+n,
+
+    V_(g,n)(L) = Σ_(|d|+m=D) (2π²)^m / (2^|d| d! m!) ⟨κ₁^m τ_d1 ... τ_dn⟩_g L^(2d),
+
+where d! = Π d_i!. The ψ-class numbers ⟨τ_d1 ... τ_dn⟩_g follow from the string, dilaton
+and DVV (Virasoro) equations, and the κ₁ numbers from the ψ-class numbers, through
+κ₁^m = Σ_P (-1)^(m-|P|) π_*(Π_(B ∈ P) ψ^(|B|+1)) over the set partitions P of {1, ..., m}.
+"""
+from collections import Counter
+from fractions import Fraction
+from math import factorial, comb
+import itertools
+
+def double_factorial(k):
+    """
+    Returns k!! for k ≥ -1, with (-1)!! = 1
+    """
+    result = 1
+    while k > 1:
+        result *= k
+        k -= 2
+    return result
+
+def integer_partitions(m, largest=None):
+    """
+    Yields the partitions of m as non-increasing tuples
+    """
+    if largest is None:
+        largest = m
+    if m == 0:
+        yield ()
+        return
+    for part in range(min(m, largest), 0, -1):
+        for rest in integer_partitions(m - part, part):
+            yield (part,) + rest
+
+def count_partitions(D, n):
+    """
+    Returns the number of partitions with at most n parts of every number 0, ..., D,
+    i.e. the number of coefficients c_α of a volume V_(g,n) with D = 3g-3+n
+    """
+    # counts[k][s]: partitions of s with at most k parts
+    counts = [[1] + [0]*D]
+    for k in range(1, n + 1):
+        row = list(counts[-1])
+        for s in range(k, D + 1):
+            row[s] += row[s - k]
+        counts.append(row)
+    return sum(counts[n])
+
+def _set_partitions(blocks):
+    """
+    Returns the number of set partitions of {1, ..., Σ blocks} with the given block sizes
+    """
+    result = factorial(sum(blocks))
+    for b in blocks:
+        result //= factorial(b)
+    for count in Counter(blocks).values():
+        result //= factorial(count)
+    return result
+
+class IntersectionNumbers:
+    """
+    Memoized intersection numbers ⟨κ₁^m τ_d1 ... τ_dn⟩_g, as exact fractions.
+    Entries are keyed by the genus and the sorted indices, and shared between all
+    the coefficients asked for.
+    """
+    def __init__(self):
+        self.psi_cache = {}
+        self.kappa_cache = {}
+
+    def clear(self):
+        self.psi_cache.clear()
+        self.kappa_cache.clear()
+
+    def psi(self, g, d):
+        """
+        Returns ⟨τ_d1 ... τ_dn⟩_g
+        """
+        n = len(d)
+        if g < 0 or 2*g - 2 + n <= 0 or any(k < 0 for k in d) or sum(d) != 3*g - 3 + n:
+            return Fraction(0)
+
+        key = (g, tuple(sorted(d, reverse=True)))
+        if key in self.psi_cache:
+            return self.psi_cache[key]
+
+        d = list(key[1])
+        if key == (0, (0, 0, 0)):
+            result = Fraction(1)
+        elif key == (1, (1,)):
+            result = Fraction(1, 24)
+
+        # String equation
+        elif d[-1] == 0:
+            rest = d[:-1]
+            result = sum((self.psi(g, rest[:j] + [rest[j] - 1] + rest[j+1:]) for j in range(len(rest)) if rest[j]),
+                         Fraction(0))
+
+        # Dilaton equation
+        elif d[-1] == 1:
+            result = (2*g - 2 + n - 1) * self.psi(g, d[:-1])
+
+        else:
+            result = self._dvv(g, d[0] - 1, d[1:])
+
+        self.psi_cache[key] = result
+        return result
+
+    def _dvv(self, g, k, S):
+        """
+        The DVV equation for ⟨τ_(k+1) τ_S⟩_g
+        """
+        result = Fraction(0)
+
+        for j, d in enumerate(S):
+            rest = S[:j] + S[j+1:]
+            result += Fraction(double_factorial(2*k + 2*d + 1), double_factorial(2*d - 1)) * self.psi(g, [d + k] + rest)
+
+        splits = Fraction(0)
+        values = Counter(S)
+        for r in range(0, k):
+            s = k - 1 - r
+            weight = double_factorial(2*r + 1) * double_factorial(2*s + 1)
+
+            splits += weight * self.psi(g - 1, [r, s] + S)
+
+            # I ⊔ J = S, enumerated as sub-multisets with their number of labelled choices
+            for counts in itertools.product(*(range(c + 1) for c in values.values())):
+                I = [v for v, c in zip(values, counts) for _ in range(c)]
+                J = [v for v, c in zip(values, counts) for _ in range(values[v] - c)]
+                multiplicity = 1
+                for v, c in zip(values, counts):
+                    multiplicity *= comb(values[v], c)
+
+                # The dimension constraint fixes the genus of the first factor
+                g1, remainder = divmod(r + sum(I) + 2 - len(I), 3)
+                if remainder or not 0 <= g1 <= g:
+                    continue
+                left = self.psi(g1, [r] + I)
+                if left:
+                    splits += weight * multiplicity * left * self.psi(g - g1, [s] + J)
+
+        result += splits / 2
+        return result / double_factorial(2*k + 3)
+
+    def kappa(self, g, m, d):
+        """
+        Returns ⟨κ₁^m τ_d1 ... τ_dn⟩_g
+        """
+        key = (g, m, tuple(sorted(d, reverse=True)))
+        if key not in self.kappa_cache:
+            result = Fraction(0)
+            for blocks in integer_partitions(m):
+                extra = [b + 1 for b in blocks]
+                sign = (-1)**(m - len(blocks))
+                result += sign * _set_partitions(blocks) * self.psi(g, list(key[2]) + extra)
+            self.kappa_cache[key] = result
+
+        return self.kappa_cache[key]
+
+    def volume_coefficient(self, g, n, alpha):
+        """
+        Returns the rational c_α with c_α π^(2m) the coefficient of m_α in V_(g,n),
+        where m = 3g-3+n-|α|
+
+        :param alpha: partition α, with at most n parts
+        """
+        m = 3*g - 3 + n - sum(alpha)
+        if m < 0 or len(alpha) > n:
+            return Fraction(0)
+
+        d = list(alpha) + [0]*(n - len(alpha))
+        denominator = factorial(m) * 2**sum(d)
+        for k in d:
+            denominator *= factorial(k)
+
+        return Fraction(2**m, denominator) * self.kappa(g, m, d)
+
+shared_numbers = IntersectionNumbers()
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from functools import lru_cache
+from fractions import Fraction
+from pathlib import Path
+from math import comb, factorial
+import sympy as sp
+import pickle
+import logging
+
+logger = logging.getLogger(__name__)
+
+_BERNOULLI = [Fraction(1)]
+
+def bernoulli(m):
+    """
+    Returns the Bernoulli number B_m (with B_1 = -1/2) as an exact fraction.
+    The table of Bernoulli numbers is extended as needed.
+    """
+    while len(_BERNOULLI) <= m:
+        k = len(_BERNOULLI)
+        B = -sum(comb(k+1, i)*_BERNOULLI[i] for i in range(k)) / (k+1)
+        _BERNOULLI.append(B)
+
+    return _BERNOULLI[m]
+
+def zeta_even(i):
+    """
+    Returns the rational r such that ζ(2i) = r π^(2i)
+    """
+    return (-1)**(i+1) * bernoulli(2*i) * Fraction(2)**(2*i - 1) / factorial(2*i)
+
+def F_rational(k):
+    """
+    Returns the rationals [r_0, ..., r_k] such that
+        F_{2k-1}(t) = Σ_j r_j π^(2k-2j) t^(2j)
+    """
+    coeffs = []
+    for j in range(0, k+1):
+        i = k - j
+        coeff  = zeta_even(i)
+        coeff *= 2**(2*i + 1) - 4
+        coeff *= factorial(2*k - 1)
+        coeff /= factorial(2*j)
+        coeffs.append(coeff)
+
+    return tuple(coeffs)
+
+@lru_cache(maxsize=None)
+def double_weight(a, b):
+    """
+    returns (2a-1)!(2b-1)!/(2a+2b-1)! as an exact fraction
+    """
+    return Fraction(factorial(2*a - 1) * factorial(2*b - 1), factorial(2*a + 2*b - 1))
+
+def to_domain(r, m, domain):
+    """
+    Converts r π^m to an element of domain
+    """
+    return domain.from_sympy(sp.Rational(r.numerator, r.denominator) * sp.pi**m)
+
+def kernels_file(table_file):
+    """
+    Returns the file in which the F kernels are saved next to a table
+    """
+    table_file = Path(table_file)
+    return table_file.with_name(table_file.stem + ".kernels.pkl")
+
+class FKernelCache:
+    """
+    Bounded LRU cache of F_{2k-1} coefficient vectors, keyed by k.
+
+    Each entry holds the exact rational coefficients, together with their
+    conversions to the coefficient domains that have requested them, so the
+    same cache can serve exact and non-exact calculators.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, k):
+        k = int(k)
+        try:
+            entry = self.entries[k]
+            self.entries.move_to_end(k)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            entry = {"rational": F_rational(k), "converted": {}}
+            self.entries[k] = entry
+            if self.maxsize is not None and len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+        return entry
+
+    def rational(self, k):
+        """
+        Returns the rationals [r_0, ..., r_k], with F_{2k-1}(t) = Σ_j r_j π^(2k-2j) t^(2j)
+        """
+        return self._entry(k)["rational"]
+
+    def coefficients(self, k, domain, graded=False):
+        """
+        Returns the coefficients [f_0, ..., f_k] of F_{2k-1}(t) = Σ_j f_j t^(2j)
+        as elements of domain. Conversions are cached per domain.
+
+        :param graded: if True, leave out the powers of π, returning only the rationals r_j
+        """
+        entry = self._entry(k)
+        converted = entry["converted"]
+
+        if (domain, graded) not in converted:
+            k = len(entry["rational"]) - 1
+            converted[(domain, graded)] = [to_domain(r, 0 if graded else 2*(k-j), domain)
+                                           for j, r in enumerate(entry["rational"])]
+
+        return converted[(domain, graded)]
+
+    def clear(self):
+        self.entries.clear()
+
+    def save(self, filename):
+        logger.info(f"Saving F kernels to <{filename}>.")
+        with open(filename, "wb") as file:
+            pickle.dump({k: entry["rational"] for k, entry in self.entries.items()}, file)
+
+    def load(self, filename):
+        logger.info(f"Loading F kernels from <{filename}>.")
+        with open(filename, "rb") as file:
+            for k, rational in pickle.load(file).items():
+                if k not in self.entries:
+                    self.entries[k] = {"rational": tuple(rational), "converted": {}}
+
+        while self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+shared_cache = FKernelCache()
@@ -0,0 +1,215 @@
+"""
+Bounded memory for long computations.
+
+Without a budget, a table keeps every entry it has read or computed, together with
+the Polys and dicts of terms built from them (see WeilPetersonTable._polys and _terms).
+With a MemoryBudget, the estimated size of the entries in memory is brought back under
+the budget every time an entry is stored. Entries that no remaining computation depends
+on (see plan) are evicted first, then the least recently used ones. Evicted entries stay
+on disk, in the store of the table or in a spill store next to a pickled table, and are
+read back when they are looked up again. Spill stores are removed when the table is closed,
+and those left over by runs that crashed when a table is opened (see remove_stale_spill_files).
+
+Sizes are estimated from the number of terms, since measuring SymPy objects is about as
+slow as building them.
+"""
+from collections import OrderedDict
+from pathlib import Path
+import tempfile
+import fcntl
+import os
+import src.scheduler as scheduler
+from src.symmetric import SymmetricVolume
+from src.profiling import peak_rss
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes per term, measured with tracemalloc on the entries of data/mytable_poly.pkl:
+# a Poly over QQ_I[π] takes 2-3.5 kB per term, a SymmetricVolume 0.1-2 kB per partition,
+# and a dict of terms over QQ (rational=True) a few hundred bytes per term
+POLY_TERM_BYTES = 3000
+SYMMETRIC_TERM_BYTES = 500
+DICT_TERM_BYTES = 300
+
+SPILL_SUFFIX = ".spill.sqlite"
+
+def _spill_location(table_file):
+    if table_file is None:
+        return Path(tempfile.gettempdir()), "table."
+    table_file = Path(table_file)
+    return table_file.parent, table_file.stem + "."
+
+def spill_file(table_file=None):
+    """
+    Creates an empty file, next to the pickled table if given, for the store to which this
+    process spills entries. Every process has its own, so several runs can share a table.
+    
+    :returns: the file, and a descriptor holding a lock on it (see fcntl.flock) until it is
+              closed, or until the process ends, even if it crashes
+    """
+    directory, prefix = _spill_location(table_file)
+    while True:
+        descriptor, filename = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=SPILL_SUFFIX)
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        
+        # The file may have been taken for a stale one and removed before it was locked
+        if os.path.exists(filename) and os.stat(filename).st_ino == os.fstat(descriptor).st_ino:
+            return Path(filename), descriptor
+        os.close(descriptor)
+
+def remove_spill_file(filename):
+    for suffix in ["", "-wal", "-shm"]:
+        Path(str(filename) + suffix).unlink(missing_ok=True)
+
+def remove_stale_spill_files(table_file=None):
+    """
+    Removes the spill stores of a table that no process holds a lock on, left over by runs
+    that crashed before closing their table
+    
+    :returns: number of removed stores
+    """
+    directory, prefix = _spill_location(table_file)
+    removed = 0
+    for filename in directory.glob(prefix + "*" + SPILL_SUFFIX):
+        try:
+            descriptor = os.open(filename, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Still in use
+            os.close(descriptor)
+            continue
+        
+        remove_spill_file(filename)
+        os.close(descriptor)
+        removed += 1
+    
+    if removed:
+        logger.info(f"Removed {removed} spill stores left over in <{directory}>.")
+    return removed
+
+def entry_size(V):
+    """
+    Returns the estimated size in bytes of a table entry, a Poly or a dict of terms
+    """
+    if isinstance(V, SymmetricVolume):
+        return SYMMETRIC_TERM_BYTES * max(len(V.coefficients), 1)
+    if isinstance(V, dict):
+        return DICT_TERM_BYTES * max(len(V), 1)
+    if hasattr(V, "rep"):
+        # Counts the terms without building a dict of them
+        return POLY_TERM_BYTES * max(len(V.rep.terms()), 1)
+    return POLY_TERM_BYTES
+
+class MemoryBudget:
+    """
+    Decides which entries of a WeilPetersonTable to keep in memory, see the module docstring
+    """
+    def __init__(self, table, budget):
+        """
+        :param budget: largest estimated size in bytes of the entries kept in memory
+        """
+        self.table = table
+        self.budget = budget
+
+        # Estimated size of each (g,n) in memory, least recently used first; None until measured
+        self.sizes = OrderedDict()
+        # Planned (g,n) not computed yet, per dependency
+        self.consumers = {}
+
+        self.evicted = set()
+        self.evictions = 0
+        self.reloads = 0
+        self.peak = 0
+
+    def plan(self, targets):
+        """
+        Marks the dependencies of targets not in the table as needed until they are computed
+        """
+        keys = set(self.table.keys())
+        graph = scheduler.dependency_graph(targets, known=lambda g, n: (g, n) in keys)
+        for node, deps in graph.items():
+            for dep in deps:
+                self.consumers.setdefault(dep, set()).add(node)
+
+    def done(self, g, n):
+        """
+        Called once V_(g,n) is stored: its dependencies are no longer needed for it
+        """
+        for dep in scheduler.dependencies(g, n):
+            self.consumers.get(dep, set()).discard((g, n))
+
+    def needed(self, g, n):
+        return bool(self.consumers.get((g, n)))
+
+    def touch(self, g, n, changed=False):
+        """
+        Marks (g,n) as used; with changed, its size is measured again
+        """
+        if (g, n) in self.evicted:
+            self.evicted.discard((g, n))
+            self.reloads += 1
+
+        if changed or (g, n) not in self.sizes:
+            self.sizes[(g, n)] = None
+        self.sizes.move_to_end((g, n))
+
+    def _size(self, g, n):
+        table = self.table
+        V = table.table.get(f"g={g}", {}).get(f"n={n}")
+        size = 0 if V is None else entry_size(V)
+
+        poly = table._polys.get((g, n))
+        if poly is not None and poly is not V:
+            size += entry_size(poly)
+        if (g, n) in table._terms:
+            size += entry_size(table._terms[(g, n)])
+        return size
+
+    def invalidate(self):
+        """
+        Measures every size again, after the caches of the table were cleared
+        """
+        for key in self.sizes:
+            self.sizes[key] = None
+
+    def total(self):
+        for key, size in self.sizes.items():
+            if size is None:
+                self.sizes[key] = self._size(*key)
+        return sum(self.sizes.values())
+
+    def _victims(self):
+        # The most recently used entry is kept, it is usually about to be used again
+        keys = list(self.sizes)[:-1]
+        return [key for key in keys if not self.needed(*key)] + [key for key in keys if self.needed(*key)]
+
+    def enforce(self):
+        """
+        Evicts entries until their estimated size is within the budget
+        """
+        total = self.total()
+        self.peak = max(self.peak, total)
+        if total <= self.budget:
+            return
+
+        for g, n in self._victims():
+            if total <= self.budget:
+                break
+            self.table._evict(g, n)
+            total -= self.sizes.pop((g, n))
+            self.evicted.add((g, n))
+            self.evictions += 1
+
+        logger.info(f"⋅ Evicted entries down to {total/2**20:.1f} MiB ({self.evictions} evictions so far)")
+
+    def report(self):
+        """
+        Returns the peak memory in bytes, resident and of the entries in memory (estimated),
+        and the numbers of evictions and reloads
+        """
+        return {"rss": peak_rss(), "entries": max(self.peak, self.total()), "budget": self.budget,
+                "evictions": self.evictions, "reloads": self.reloads}
@@ -1,56 +1,460 @@
-import scipy.special
 import sympy as sp
+from fractions import Fraction
+from math import comb
+import math
 import pickle
+import os
 import src.utils as utils
-import scipy
+import src.integration as integration
+import src.kernels as kernels
+from src.symmetric import SymmetricVolume
+from src.evaluator import VolumeEvaluator
+from src.array_recursion import ArrayRecursion, FloatArithmetic, MPArithmetic
+import src.scheduler as scheduler
+import src.intersection as intersection
+import src.serialization as serialization
+import src.storage as storage
+from src.checkpoint import Journal, journal_file, atomic_dump
+from src.memory import MemoryBudget, spill_file, remove_spill_file, remove_stale_spill_files
+from src.profiling import NullProfiler
+from src.parallel import ParallelRecursion
+from pathlib import Path
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 class WeilPetersonTable:
-    def __init__(self, pickled_table, exact=True):
-        if exact:
-            self.domain = sp.QQ_I[sp.pi]
+    def __init__(self, pickled_table, compact=False, checkpoint=False, memory_budget=None):
+        # Store volumes by partition-indexed coefficients (see symmetric.SymmetricVolume)
+        self.compact = compact
+        self.filename = pickled_table
+        
+        # Tables only hold exact volumes, approximations are kept apart (see WeilPetersonCalculator)
+        self.domain = sp.QQ_I[sp.pi]
+        
+        # Entries of an on-disk store are read into self.table when looked up
+        self.store = None
+        
+        # Polys built by _check_table, and terms built by the recursion, invalidated by _add_to_table
+        self._polys = {}
+        self._terms = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Timings and counters are recorded by a profiling.Profiler, when one is set
+        self.profiler = NullProfiler()
+        
+        # New entries of pickled tables are journaled as soon as they are stored,
+        # entries of a store are committed to it directly
+        self.journal = None
+        
+        # Modification times of the pickled tables when this table last read or wrote them (see save_table)
+        self._mtimes = {}
+        
+        # With a memory budget, entries are evicted from memory (see memory.py), and
+        # entries of a pickled table are spilled to a store of this process
+        self.memory = None
+        self.spill = None
+        self._spill_lock = None
+        
+        # Without a file, start from an empty table
+        if pickled_table is None:
+            self.table = {}
         else:
-            self.domain = sp.CC
-               
-        self.load_table(pickled_table)
+            self.load_table(pickled_table)
+        
+        if checkpoint and pickled_table is not None and self.store is None:
+            self.journal = Journal(journal_file(pickled_table))
+            if self.journal.filename.exists():
+                logger.warning(f"Found journal <{self.journal.filename}> from an earlier run, use resume() to load it.")
+        
+        if self.store is None:
+            remove_stale_spill_files(self.filename)
+        
+        if memory_budget is not None:
+            self.set_memory_budget(memory_budget)
+    
+    def set_memory_budget(self, budget):
+        """
+        Keeps the estimated size of the entries in memory under budget bytes (see memory.MemoryBudget)
+        """
+        self.memory = MemoryBudget(self, budget)
+        if self.store is None and self.spill is None:
+            filename, self._spill_lock = spill_file(self.filename)
+            self.spill = storage.SQLiteTableStore(filename)
+        
+        for g, n in self.keys():
+            if f"n={n}" in self.table.get(f"g={g}", {}):
+                self.memory.touch(g, n)
+        self.memory.enforce()
+    
+    def close(self):
+        """
+        Removes the spill store created by this table, if there is one
+        """
+        if self.spill is not None:
+            self.spill.close()
+            remove_spill_file(self.spill.filename)
+            os.close(self._spill_lock)
+            self.spill, self._spill_lock = None, None
+    
+    def resume(self):
+        """
+        Adds the entries journaled by an earlier run to the table
+        """
+        journal = Journal(journal_file(self.filename))
+        self.journal, previous = None, self.journal
+        
+        count = 0
+        try:
+            for g, n, record in journal.replay():
+                self._add_to_table(g, n, serialization.volume_from_record(record, self._symbols(n), self.domain))
+                count += 1
+        finally:
+            self.journal = previous
+        
+        logger.info(f"Resumed {count} entries from <{journal.filename}>.")
+        return count
 
     def load_table(self, filename):
+        if storage.is_store(filename):
+            self.store = storage.SQLiteTableStore(filename)
+            self.table = {}
+            logger.info(f"Opened table store <{filename}> ({len(self.store)} entries, {self.store.size()} bytes).")
+            return
+        
         logger.info(f"Loading table from <{filename}>.")
         with open(filename, "rb") as file:
             self.table = pickle.load(file)
+            self._mtimes[Path(filename).resolve()] = os.fstat(file.fileno()).st_mtime_ns
         logger.info(f"Table loaded.")
         
+        if self.compact:
+            self.compact_table()
+    
+    def import_table(self, filename):
+        """
+        Adds every entry of a pickled table to this table (and its store)
+        """
+        logger.info(f"Importing table from <{filename}>.")
+        with open(filename, "rb") as file:
+            table = pickle.load(file)
+        
+        for key_g, entries in table.items():
+            for key_n, V in entries.items():
+                g, n = int(key_g[2:]), int(key_n[2:])
+                if not isinstance(V, SymmetricVolume):
+                    V = sp.Poly(V, self._symbols(n), domain=self.domain)
+                self._add_to_table(g, n, V)
+    
+    def merge_table(self, filename):
+        """
+        Merges the entries of a pickled table into the store of this table (see 
+        SQLiteTableStore.merge). Only one pickled table is in memory at a time.
+        
+        :returns: dict {status: list of (g,n)}, with status "added", "duplicate", "replaced" or "conflict"
+        """
+        if self.store is None:
+            raise ValueError("Tables can only be merged into a store")
+        
+        logger.info(f"Merging table from <{filename}>.")
+        with open(filename, "rb") as file:
+            table = pickle.load(file)
+        
+        statuses = {}
+        for key_g, entries in table.items():
+            for key_n, V in entries.items():
+                g, n = int(key_g[2:]), int(key_n[2:])
+                if not isinstance(V, SymmetricVolume):
+                    V = sp.Poly(V, self._symbols(n), domain=self.domain)
+                status = self.store.merge(g, n, serialization.volume_to_record(V, n), source=str(filename))
+                statuses.setdefault(status, []).append((g, n))
+                
+                # Entries read earlier may have been replaced
+                self.table.get(key_g, {}).pop(key_n, None)
+                self._polys.pop((g, n), None)
+                self._terms.pop((g, n), None)
+        
+        return statuses
+    
+    def keys(self):
+        """
+        Returns the sorted list of (g,n) in the table
+        """
+        keys = {(int(key_g[2:]), int(key_n[2:])) for key_g, entries in self.table.items() for key_n in entries}
+        if self.store is not None:
+            keys.update(self.store.keys())
+        if self.spill is not None:
+            keys.update(self.spill.keys())
+        
+        return sorted(keys)
+    
+    def compact_table(self):
+        """
+        Converts every entry of the table to the compact symmetric form
+        """
+        for key_g, entries in self.table.items():
+            for key_n in entries:
+                g, n = int(key_g[2:]), int(key_n[2:])
+                if not isinstance(entries[key_n], SymmetricVolume):
+                    V, found = self._check_table(g, n)
+                    entries[key_n] = SymmetricVolume.from_poly(V, n)
+        
     def save_table(self, filename):
         logger.info(f"Saving table to <{filename}>.")
-        with open(filename, "wb") as file:
-            pickle.dump(self.table, file)
+        
+        # New entries are already appended to the store
+        if self.store is not None and str(filename) == self.store.filename:
+            return
+        
+        if storage.is_store(filename):
+            store = storage.SQLiteTableStore(filename)
+            for g, n in self.keys():
+                store.put(g, n, serialization.volume_to_record(self._get_entry(g, n, truncated=True), n))
+            store.close()
+            self._clear_journal(filename)
+            return
+        
+        if self.store is not None:
+            for g, n in self.keys():
+                self._lookup(g, n, truncated=True)
+        
+        # Other processes may have saved to the same pickled table since this table last
+        # read or wrote it, so their new entries are added before it is rewritten
+        with storage.file_lock(filename):
+            if self._changed_on_disk(filename):
+                self._add_missing_entries(filename)
+            atomic_dump(self._with_spilled_entries(), filename)
+            self._mtimes[Path(filename).resolve()] = os.stat(filename).st_mtime_ns
+        
+        self._clear_journal(filename)
+    
+    def _clear_journal(self, filename):
+        # Journaled entries are now part of the saved table, if it is the table the journal belongs to;
+        # otherwise they are still needed to resume that table
+        if self.journal is None or not self.journal.filename.exists():
+            return
+        if Path(filename).resolve() != Path(self.filename).resolve():
+            logger.info(f"Keeping <{self.journal.filename}>, which belongs to <{self.filename}>, not <{filename}>.")
+            return
+        logger.info(f"Journaled entries are saved in <{filename}>, clearing <{self.journal.filename}>.")
+        self.journal.clear()
+    
+    def _with_spilled_entries(self):
+        """
+        Returns the table with the spilled entries read back, without keeping them in memory
+        """
+        if self.spill is None:
+            return self.table
+        
+        table = {key_g: dict(entries) for key_g, entries in self.table.items()}
+        for g, n in self.spill.keys():
+            if f"n={n}" not in table.get(f"g={g}", {}):
+                V = serialization.volume_from_record(self.spill.get(g, n), self._symbols(n), self.domain)
+                table.setdefault(f"g={g}", {})[f"n={n}"] = V
+        return table
+    
+    def _changed_on_disk(self, filename):
+        """
+        Returns True if the pickled table filename was written since this table last read
+        or wrote it, or exists and was never read or written by this table
+        """
+        if not Path(filename).exists():
+            return False
+        return os.stat(filename).st_mtime_ns != self._mtimes.get(Path(filename).resolve())
+    
+    def _add_missing_entries(self, filename):
+        """
+        Adds the entries of a pickled table saved by another process which this table lacks,
+        and those holding degrees missing from truncated entries of this table (see storage.compare)
+        """
+        with open(filename, "rb") as file:
+            table = pickle.load(file)
+        
+        added, extended = 0, 0
+        for key_g, entries in table.items():
+            for key_n, V in entries.items():
+                g, n = int(key_g[2:]), int(key_n[2:])
+                try:
+                    ours = self._lookup(g, n, truncated=True)
+                except KeyError:
+                    self.table.setdefault(key_g, {})[key_n] = V
+                    added += 1
+                    continue
+                
+                # Full entries are only compared when merging tables
+                if getattr(ours, "truncation", None) is None and getattr(V, "truncation", None) is None:
+                    continue
+                
+                ours, theirs = self._record(ours, n), self._record(V, n)
+                status = storage.compare(ours, theirs)
+                if status in ("replace", "extend"):
+                    record = theirs if status == "replace" else storage.union(ours, theirs)
+                    self.table[key_g][key_n] = serialization.volume_from_record(record, self._symbols(n), self.domain)
+                    self._polys.pop((g, n), None)
+                    self._terms.pop((g, n), None)
+                    if self.memory is not None:
+                        self.memory.touch(g, n, changed=True)
+                    extended += 1
+                elif status in ("conflict", "disjoint"):
+                    logger.warning(f"{status.capitalize()} entry for V_({g},{n}) in <{filename}>, keeping this one.")
+        
+        logger.info(f"Added {added} entries and extended {extended} saved to <{filename}> by another process.")
+    
+    def _record(self, V, n):
+        """
+        Returns the plain record of an entry (see serialization.volume_to_record)
+        """
+        if not isinstance(V, SymmetricVolume):
+            V = sp.Poly(V, self._symbols(n), domain=self.domain)
+        return serialization.volume_to_record(V, n)
+    
+    def _symbols(self, n):
+        # V_(g,0) is stored as a constant polynomial in L1
+        return utils.boundary_symbols(max(n, 1))
+    
+    def _lookup(self, g, n, truncated=False):
+        """
+        Returns the stored entry for V_(g,n), reading it from the store if necessary.
+        Raises KeyError if there is no entry, or if the entry is truncated (see 
+        WeilPetersonCalculator.__call__) and truncated is False.
+        """
+        try:
+            V = self.table[f"g={g}"][f"n={n}"]
+        except KeyError:
+            store = self.store if self.store is not None else self.spill
+            if store is None:
+                raise
+            
+            record = store.get(g, n)
+            if record is None:
+                raise KeyError((g, n))
+            
+            V = serialization.volume_from_record(record, self._symbols(n), self.domain)
+            self.table.setdefault(f"g={g}", {})[f"n={n}"] = V
+            if self.memory is not None:
+                self.memory.touch(g, n, changed=True)
+        
+        if self.memory is not None:
+            self.memory.touch(g, n)
+        
+        if not truncated and getattr(V, "truncation", None) is not None:
+            raise KeyError((g, n))
+        return V
+    
+    def truncation(self, g, n):
+        """
+        Returns the degree window (min_degree, max_degree) of the stored entry for V_(g,n),
+        with max_degree None for no bound, or None if there is no entry
+        """
+        try:
+            V = self._lookup(g, n, truncated=True)
+        except KeyError:
+            return None
+        return getattr(V, "truncation", None) or (0, None)
     
     def _check_table(self, g, n):
-        L = [sp.Symbol(f"L{i}", positive=True) for i in range(1, n+1)]
+        cached = self._polys.get((g, n))
+        if cached is not None and cached.domain == self.domain:
+            self.cache_hits += 1
+            self.profiler.count("table_hits")
+            if self.memory is not None:
+                self.memory.touch(g, n)
+            return cached, True
+        
+        self.cache_misses += 1
+        self.profiler.count("table_misses")
+        L = self._symbols(n)
         try:
-            V = sp.Poly(self.table[f"g={g}"][f"n={n}"], L, domain=self.domain)
+            V = self._lookup(g, n)
+            
+            if isinstance(V, SymmetricVolume):
+                V = V.to_poly(L, self.domain)
+            else:
+                V = sp.Poly(V, L, domain=self.domain)
             
             if V is None:
                 return V, False
             else:
+                self._polys[(g, n)] = V
+                if self.memory is not None:
+                    self.memory.touch(g, n, changed=True)
                 return V, True
             
         except KeyError:
             return None, False
     
+    def _get_entry(self, g, n, truncated=False):
+        """
+        Returns the stored entry for V_(g,n) as it is: a SymmetricVolume for compact
+        and truncated entries, and a Poly in the domain of the table otherwise
+        """
+        V = self._lookup(g, n, truncated)
+        if isinstance(V, SymmetricVolume):
+            return V
+        
+        return self._check_table(g, n)[0]
+    
+    def _rationals(self, g, n):
+        """
+        Returns the coefficients {α: c_α} of V_(g,n) in the symmetric monomials,
+        without the powers of π implied by the grading
+        """
+        V = self._get_entry(g, n)
+        if not isinstance(V, SymmetricVolume):
+            V = SymmetricVolume.from_poly(V, n)
+        return V.rationals()
+    
     def _add_to_table(self, g, n, V):
         key_g = f"g={g}"
         key_n = f"n={n}"
+        self._polys.pop((g, n), None)
+        self._terms.pop((g, n), None)
+        
+        if self.compact and not isinstance(V, SymmetricVolume):
+            V = SymmetricVolume.from_poly(sp.Poly(V, self._symbols(n), domain=self.domain), n)
         
         if key_g not in self.table.keys():
             self.table[key_g] = {}
         self.table[key_g][key_n] = V
         
+        if self.store is not None or self.journal is not None:
+            if not isinstance(V, SymmetricVolume):
+                V = sp.Poly(V, self._symbols(n), domain=self.domain)
+            record = serialization.volume_to_record(V, n)
+            
+            if self.store is not None:
+                self.store.put(g, n, record)
+            if self.journal is not None:
+                self.journal.append(g, n, record)
+        
         logger.info(f"⋅ stored to table: V_({g},{n})")
         
+        if self.memory is not None:
+            self.memory.touch(g, n, changed=True)
+            self.memory.done(g, n)
+            self.memory.enforce()
+    
+    def _evict(self, g, n):
+        """
+        Removes V_(g,n) from memory, spilling it first if it is not in the store
+        """
+        V = self.table.get(f"g={g}", {}).pop(f"n={n}", None)
+        self._polys.pop((g, n), None)
+        self._terms.pop((g, n), None)
+        
+        if V is not None and self.spill is not None:
+            if not isinstance(V, SymmetricVolume):
+                V = sp.Poly(V, self._symbols(n), domain=self.domain)
+            self.spill.put(g, n, serialization.volume_to_record(V, n))
+        
+    def evaluator(self, g, n, basis="power"):
+        """
+        Returns a VolumeEvaluator of V_(g,n), for evaluating it at many boundary lengths at once
+        """
+        return VolumeEvaluator.from_entry(self._get_entry(g, n), g, n, basis=basis)
+    
     def initialize_table(self, filename="Weil-Peterson-base.pkl"):
         L1 = sp.Symbol("L1", positive=True)
 
@@ -68,7 +472,10 @@ class WeilPetersonTable:
     def display_table(self):
         logger.info("Displaying table...")
         import pandas as pd
-        table = pd.DataFrame(self.table)
+        table = {}
+        for g, n in self.keys():
+            table.setdefault(f"g={g}", {})[f"n={n}"] = True
+        table = pd.DataFrame(table)
         table = ~table.isnull()
         table = table.reindex(sorted(table.index), axis=0)
         print()
@@ -76,43 +483,271 @@ class WeilPetersonTable:
         print()
         
 class WeilPetersonCalculator(WeilPetersonTable):
-    def __init__(self, pickled_table, exact=True):
-        super().__init__(pickled_table)
-        self.x = sp.Symbol("x", positive=True)      # integration variables
-        self.y = sp.Symbol("y", positive=True)      # integration variables
+    def __init__(self, pickled_table, exact=True, kernel_cache=None, compact=False, checkpoint=False,
+                 rational=False, precision=None, intersection_numbers=None, coefficient_seed=0.5,
+                 entry_jobs=1, parallel_threshold=20000, memory_budget=None):
+        super().__init__(pickled_table, compact=compact, checkpoint=checkpoint, memory_budget=memory_budget)
         self.exact = exact
         
+        # Without exact, volumes are approximated by the NumPy recursion (see array_recursion)
+        # in float64, or in mpmath with precision decimal digits, starting from the exact
+        # entries of the table. Approximations are not stored in the table.
+        self.precision = precision
         if self.exact:
-            self.factorial = sp.factorial
-            self.zeta = sp.zeta
-            self.domain = sp.QQ_I[sp.pi]
+            self.approximation = None
+        elif precision is None:
+            self.approximation = ArrayRecursion(FloatArithmetic())
         else:
-            self.domain = sp.CC
-            self.factorial = scipy.special.factorial
-            self.zeta = scipy.special.zeta
+            self.approximation = ArrayRecursion(MPArithmetic(precision))
+        
+        # The coefficient of a monomial of degree 2d in V_(g,n) is a rational times
+        # π^(6g-6+2n-2d). With rational=True, the recursion works with these rationals
+        # in QQ, and the powers of π are only restored when entries are stored.
+        self.rational = rational
+        if self.rational:
+            self.ring = sp.QQ
+        else:
+            self.ring = self.domain
+        
+        # F_{2k-1} kernels are shared between calculators unless a cache is given
+        if kernel_cache is None:
+            kernel_cache = kernels.shared_cache
+        self.kernels = kernel_cache
+        self._weights = {}
+        
+        # Single coefficients from intersection numbers (see coefficient), shared between
+        # calculators unless given. Once coefficient_seed of the coefficients of an entry
+        # have been asked for, the rest are computed and the entry is stored.
+        if intersection_numbers is None:
+            intersection_numbers = intersection.shared_numbers
+        self.intersections = intersection_numbers
+        self.coefficient_seed = coefficient_seed
+        self._coefficients = {}
+        
+        # With entry_jobs > 1, the terms of entries whose largest dependency has at least
+        # parallel_threshold terms are integrated on a process pool (see parallel.py)
+        self.parallel = ParallelRecursion(self, entry_jobs) if entry_jobs > 1 else None
+        self.parallel_threshold = parallel_threshold
+        
+        # During a truncated computation (see __call__): the largest power of π² kept
+        # in every entry, the target and the largest degree kept in the target
+        self._truncation = None
+        
+        if pickled_table is not None and kernels.kernels_file(pickled_table).exists():
+            self.kernels.load(kernels.kernels_file(pickled_table))
+    
+    def F_coefficients(self, k):
+        """
+        Returns the coefficients [f_0, ..., f_k] of F_{2k-1}(t) = Σ f_j t^(2j),
+        as elements of self.ring
+        """
+        return self.kernels.coefficients(k, self.ring, graded=self.rational)
     
     def F(self, k, t):
         """
         Computes F_{2k-1}(t)
         """
-        sum = sp.Float(0)
-        k = int(k)
-        for i in range(0, k+1):
-            coeff = self.zeta(2*i)
-            coeff *= 2**(2*i + 1) - 4
-            coeff /= self.factorial(2*k-2*i)
-            
-            term = coeff * t**(2*k-2*i)
-            sum += term.expand()
+        sum = sp.Integer(0)
+        for j, coeff in enumerate(self.kernels.coefficients(k, self.domain)):
+            sum += self.domain.to_sympy(coeff) * t**(2*j)
         
-        sum *= self.factorial(2*k-1)
         return sum
     
-    def _H(self, x, y):
+    def _rational(self, p, q):
+        """
+        returns p/q as an element of self.ring
+        """
+        if (p, q) not in self._weights:
+            self._weights[(p, q)] = kernels.to_domain(Fraction(p, q), 0, self.ring)
+        
+        return self._weights[(p, q)]
+    
+    def _double_weight(self, a, b):
+        """
+        returns (2a-1)!(2b-1)!/(2a+2b-1)!
+        """
+        weight = kernels.double_weight(a, b)
+        return self._rational(weight.numerator, weight.denominator)
+    
+    def save_table(self, filename, save_kernels=False):
         """
-        returns H(x,y)
-        """    
-        return sp.Function("H")(x, y)
+        Saves the table, and optionally the F kernels next to it (see kernels_file)
+        """
+        super().save_table(filename)
+        
+        if save_kernels:
+            self.kernels.save(kernels.kernels_file(filename))
+    
+    def evaluator(self, g, n, basis="power"):
+        """
+        Returns a VolumeEvaluator of V_(g,n), computing V_(g,n) if necessary
+        """
+        if not self._check_table(g, n)[1]:
+            self(g, n)
+        return super().evaluator(g, n, basis)
+    
+    def coefficient(self, g, alpha, n=None):
+        """
+        Returns the coefficient c_α π^(6g-6+2n-2|α|) of the symmetric monomial m_α(L1², ..., Ln²)
+        in V_(g,n), without computing the whole volume. Coefficients not in the table are 
+        computed from intersection numbers (see intersection.py).
+        
+        :param alpha: exponents of the L_i², in any order
+        :param n: no. of boundaries, by default the length of alpha
+        :rtype: sp.Expr
+        """
+        if n is None:
+            n = len(alpha)
+        alpha = tuple(sorted((a for a in alpha if a), reverse=True))
+        if len(alpha) > n:
+            raise ValueError(f"m_{alpha} has more than {n} variables")
+        
+        c = self._coefficient(g, alpha, n)
+        m = 3*g - 3 + n - sum(alpha)
+        return sp.Rational(c.numerator, c.denominator) * sp.pi**(2*max(m, 0))
+    
+    def _coefficient(self, g, alpha, n):
+        """
+        Returns the rational c_α of coefficient, without the power of π, for alpha
+        a partition in decreasing order
+        """
+        m = 3*g - 3 + n - sum(alpha)
+        if m < 0 or 2*g - 2 + n <= 0:
+            return Fraction(0)
+        
+        if self._check_table(g, n)[1]:
+            c = self._rationals(g, n).get(alpha, Fraction(0))
+        else:
+            computed = self._coefficients.setdefault((g, n), {})
+            if alpha not in computed:
+                computed[alpha] = self.intersections.volume_coefficient(g, n, alpha)
+            c = computed[alpha]
+            
+            if len(computed) >= self.coefficient_seed * intersection.count_partitions(3*g - 3 + n, n):
+                self._seed_entry(g, n)
+        
+        return c
+    
+    def _seed_entry(self, g, n):
+        """
+        Computes the coefficients of V_(g,n) not yet asked for, and stores the volume
+        """
+        logger.info(f"⋅ Completing V_({g},{n}) from intersection numbers")
+        computed = self._coefficients.pop((g, n))
+        top = 3*g - 3 + n
+        
+        coefficients = {}
+        for d in range(top + 1):
+            for alpha in intersection.integer_partitions(d):
+                if len(alpha) > n:
+                    continue
+                c = computed.get(alpha)
+                if c is None:
+                    c = self.intersections.volume_coefficient(g, n, alpha)
+                if c:
+                    coefficients[alpha] = [[2*(top - d), c.numerator, c.denominator]]
+        
+        self._add_to_table(g, n, SymmetricVolume(coefficients, n))
+    
+    def _get_terms(self, g, n):
+        """
+        Returns V_(g,n) as a dict {(e1, ..., en): coefficient}, with coefficients in self.ring, 
+        computing it if necessary
+        """
+        if (g, n) in self._terms:
+            if self.memory is not None:
+                self.memory.touch(g, n)
+            return self._truncate(self._terms[(g, n)], g, n)
+        
+        # Compact entries are expanded directly, without building a Poly
+        try:
+            V = self._lookup(g, n)
+        except KeyError:
+            V = None
+        
+        if isinstance(V, SymmetricVolume):
+            terms = V.terms(self.ring, graded=self.rational)
+        else:
+            V, found = self._check_table(g, n)
+            
+            if not found:
+                V = sp.Poly(self.calculate_V(g, n), self.L_list[:n], domain=self.domain)
+            
+            terms = V.as_dict(native=True)
+            if self.rational:
+                terms = {monom: serialization.coefficient_from_plain(serialization.coefficient_to_plain(c),
+                                                                     self.ring, graded=True)
+                         for monom, c in terms.items()}
+        
+        self._terms[(g, n)] = terms
+        if self.memory is not None:
+            self.memory.touch(g, n, changed=True)
+        return self._truncate(terms, g, n)
+    
+    def _window(self, g, n):
+        """
+        Returns the degree window (min_degree, max_degree) of the monomials of V_(g,n) kept
+        by the current truncated computation, or None if it is not truncated
+        """
+        if self._truncation is None:
+            return None
+        
+        codegree, target, max_degree = self._truncation
+        min_degree = max(0, 2*(3*g - 3 + n - codegree))
+        return (min_degree, max_degree if (g, n) == target else None)
+    
+    def _min_degree(self, g, n):
+        window = self._window(g, n)
+        return 0 if window is None else window[0]
+    
+    def _truncate(self, terms, g, n):
+        """
+        Returns the terms {(e1, ..., en): coefficient} of degree in the window of V_(g,n)
+        """
+        window = self._window(g, n)
+        if window is None or window == (0, None):
+            return terms
+        
+        min_degree, max_degree = window
+        return {monom: c for monom, c in terms.items()
+                if sum(monom) >= min_degree and (max_degree is None or sum(monom) <= max_degree)}
+    
+    def _truncate_poly(self, V, g, n):
+        terms = self._truncate(V.as_dict(native=True), g, n)
+        return sp.Poly.from_dict(terms, V.gens, domain=V.domain)
+    
+    def _check_truncated(self, g, n):
+        """
+        Looks up a truncated entry covering the window of V_(g,n), and returns it 
+        truncated to the window, as _check_table does
+        """
+        stored = self.truncation(g, n)
+        min_degree, max_degree = self._window(g, n)
+        if stored is None or stored[0] > min_degree:
+            return None, False
+        if stored[1] is not None and (max_degree is None or stored[1] < max_degree):
+            return None, False
+        
+        V = self._lookup(g, n, truncated=True)
+        if isinstance(V, SymmetricVolume):
+            V = V.to_poly(self._symbols(n), self.domain)
+        return self._truncate_poly(sp.Poly(V, self._symbols(n), domain=self.domain), g, n), True
+    
+    def _to_entry(self, terms, g, n):
+        """
+        Converts a dict {(e1, ..., en): coefficient} over self.ring to a Poly over self.domain
+        """
+        if not self.rational:
+            return sp.Poly.from_dict(terms, self._symbols(n), domain=self.domain)
+        
+        # Restore the powers of π from the grading
+        top = 6*g - 6 + 2*n
+        V = {}
+        for monom, c in terms.items():
+            plain = [[top - sum(monom), int(c.numerator), int(c.denominator)]]
+            V[monom] = serialization.coefficient_from_plain(plain, self.domain)
+        
+        return sp.Poly.from_dict(V, self._symbols(n), domain=self.domain)
     
     def _compute_term_1(self, g, n):
         """
@@ -120,89 +755,92 @@ class WeilPetersonCalculator(WeilPetersonTable):
         """
         if g < 1 or n < 0:
         #if g < 1 or 1n < 0:
-            return sp.Integer(0)
-        
-        V, found = self._check_table(g-1, n+1)
-
-        if not found:
-            V = self.calculate_V(g-1, n+1)
-           
-        L1 = self.L_list[0]
-        x = self.x
-        y = self.y
+            return {}
         
         logger.debug(f"({g},{n}) TERM 1")
         logger.debug(f"----------------------")
-        logger.debug(f"V_({g-1},{n+1}) = {V}")
+        logger.debug(f"V_({g-1},{n+1}) = {self._get_terms(g-1, n+1)}")
+        
+        integrand = self._integrand_1(g, n)
         
-        V = V.subs({L1: x, self.L_list[n]: y})
-        logger.debug(f"subbed: {V}")
         logger.debug(f"----------------------")
         logger.debug(f"INTEGRATING TERM 1 ({g},{n})")
         
-        integrand = x * y * self._H(x + y, L1) * V.as_expr()
-        term1  = self._double_integral(integrand, x, y)
+        self.profiler.count("integrand_terms", len(integrand))
+        with self.profiler.stage("double_integral"):
+            term1 = integration.double_integral(integrand, self.F_coefficients, self._double_weight,
+                                                min_degree=self._min_degree(g, n))
              
         return term1
     
+    def _integrand_1(self, g, n):
+        """
+        Returns the integrand of the first term, see integration.double_integral
+        """
+        # V_(g-1,n+1)(x, L2, ..., Ln, y): x^(2a-2) y^(2b-2) -> x^(2a-1) y^(2b-1)
+        integrand = {}
+        for monom, c in self._get_terms(g-1, n+1).items():
+            a = monom[0]//2 + 1
+            b = monom[n]//2 + 1
+            integrand[(a, b, monom[1:n])] = c
+        return integrand
+    
     def _compute_term_2(self, g, n):
         """
-        Computes the third (surface-splitting) term in Mirzakhani"s recursion.
+        Computes the second (surface-splitting) term in Mirzakhani"s recursion.
         Splits the surface into two surfaces of genus g₁ & g₂ with n₁ & n₂ boundaries, such that g₁+g₂=g and n₁-n₂= n+1.
 
         :param n: Number of boundaries
         :param g: Genus
-        :param L_list: List of boundary length symbols
-        :return: SymPy expression representing term3
+        :return: dict {(e1, ..., en): coefficient} representing term2
         """
         if g<0: #or n<2:
-            return sp.Integer(0)
+            return {}
         if 2*g + n  < 3:
-            return sp.Integer(0)
+            return {}
         
-        x = self.x
-        y = self.y
-        L1 = self.L_list[0]
-
-        partitions = utils.all_bipartitions(self.L_list[1:n])
+        min_degree = self._min_degree(g, n)
+        integrand = self._integrand_2(g, n, min_degree)
 
-        integrand = sp.Integer(0)
+        self.profiler.count("integrand_terms", len(integrand))
+        with self.profiler.stage("double_integral"):
+            term2 = integration.double_integral(integrand, self.F_coefficients, self._double_weight,
+                                                min_degree=min_degree)
+        
+        # Symmetrize
+        term2 = {(e1, *monom): c for (e1, *rest), c in term2.items()
+                 for monom in utils.distinct_permutations(rest)}
+        
+        return term2
+    
+    def _integrand_2(self, g, n, min_degree=0):
+        """
+        Returns the integrand of the second term, averaged over the orbits of the exponents
+        of L2, ..., Ln, see integration.double_integral
+        """
+        # The sum over all I ⊔ J = {2,...,n} with |I| = n₁ equals C(n-1, n₁) times
+        # the symmetrization in L2,...,Ln of the representative I = {2,...,n₁+1}.
+        # Products are therefore only computed for one representative per (g₁, n₁),
+        # and accumulated by the orbit of the exponents of L2,...,Ln.
+        # Products of degree too low to reach the window of a truncated computation are skipped
+        integrand = {}
         for g1 in range(0, g+1):
             g2 = g - g1
-            for L_I, L_J in partitions:
-                n1 = len(L_I)
-                n2 = len(L_J)
-                       
-                # Sanity check the partitions: 
-                if set(L_I).intersection(L_J) != set():
-                    logger.warning(f"Overlapping boundaries in partition: {L_I}, {L_J}")
-                if set(L_I).union(L_J) != set(self.L_list[1:n]):
-                    logger.warning(f"Partition does not cover all boundaries: {L_I}, {L_J}")
+            for n1 in range(0, n):
+                n2 = n - 1 - n1
                 
                 # Compute V₁ and V₂:
                 if (2*g1 + n1 >= 2) and (2*g2 + n2 >= 2):
-                    V1, found1 = self._check_table(g1, n1+1)
-                    V2, found2 = self._check_table(g2, n2+1)
-                    
-                    if not found1:
-                        V1 = self.calculate_V(g1, n1+1)
-                    
-                    if not found2:
-                        V2 = self.calculate_V(g2, n2+1)
-                    
-                    V1 = V1.as_expr()
-                    V2 = V2.as_expr()
+                    V1 = self._get_terms(g1, n1+1)
+                    V2 = self._get_terms(g2, n2+1)
                     
-                    V1 = V1.subs({L1: x})      
-                    V1 = V1.subs({old: new for old, new in zip(self.L_list[1:n1+1], L_I)}, simultaneous=True)
-                    V2 = V2.subs({L1: y})                        
-                    V2 = V2.subs({old: new for old, new in zip(self.L_list[1:n2+1], L_J)}, simultaneous=True)
-                        
-                    integrand += x*y*self._H(x + y, L1) * V1.as_expr() * V2.as_expr()
-
-        term2 = self._double_integral(integrand, x, y)
+                    # V₁(x, L_I) V₂(y, L_J)
+                    integration.split_integrand(V1, V2, comb(n-1, n1), min_degree, integrand)
         
-        return term2
+        # Average over each orbit
+        for (a, b, rest), c in integrand.items():
+            integrand[(a, b, rest)] = c * self._rational(1, utils.orbit_size(rest))
+        return integrand
     
     def _compute_term_3(self, g, n):
         """
@@ -210,98 +848,51 @@ class WeilPetersonCalculator(WeilPetersonTable):
 
         :param n: Number of boundaries
         :param g: Genus
-        :param L_list: List of boundary length symbols
-        :return: SymPy expression representing term3
+        :return: dict {(e1, ..., en): coefficient} representing term3
         """
         if n < 2:
-            return sp.Integer(0)
+            return {}
         
         if 2*g + n < 3:
-            return sp.Integer(0)
+            return {}
         
-        V, found = self._check_table(g, n-1)
-        if not found:
-            V = self.calculate_V(g, n-1)#, L_list[:n-1])
-        
-        x  = self.x
-        L1 = self.L_list[0]
-        Ln = self.L_list[n-1]
-        integrand = sp.Integer(0)
-        V = V.as_expr()
-        for k in range(1, n):
-            Lk = self.L_list[k]
-            Lk_hat = list(self.L_list[:n].copy())
-            Lk_hat.pop(k)
-            V_temp = V.subs({L1:x, Lk:Ln}, simultaneous=True)
-            integrand += x *(self._H(x, L1 + Lk) + self._H(x, L1 - Lk)) * V_temp
-        
-        term3 = self._single_integral(integrand, x) 
+        integrand = self._integrand_3(g, n)
         
-        return term3
+        self.profiler.count("integrand_terms", len(integrand))
+        with self.profiler.stage("single_integral"):
+            term3 = integration.single_integral(integrand, self.F_coefficients, min_degree=self._min_degree(g, n))
         
-    def _single_integral(self, integrand, x):
+        return term3
+    
+    def _integrand_3(self, g, n):
         """
-        Computes integral by identifying with known F_2k-1(x) functions
+        Returns the integrand of the third term, see integration.single_integral
         """
-        if integrand == 0:
-            return 0
-        terms = sp.Add.make_args(integrand.expand())
-        result = sp.Float(0)
+        # V_(g,n-1)(x, L̂_k), with L_k replaced by L_n 
+        integrand = {}
+        for monom, c in self._get_terms(g, n-1).items():
+            a = monom[0]//2 + 1
+            for k in range(0, n-1):
+                rest = list(monom[1:]) + [0]
+                rest[k], rest[n-2] = 0, rest[k]
+                integrand[(a, k, tuple(rest))] = c
+        return integrand
     
-        k = sp.Wild("k")                   # power in x^(2k-1)
-        t = sp.Wild("t")                   # argument of H
-        c = sp.Wild("c", exclude=(x,))     # constant coefficient of integrand
-        H = self._H(x, t)
-        sub_expr = c*self.x**(2*k - 1) * H
-                
-        for term in terms:
-            match = term.match(sub_expr)
-            
-            if match and match[k].is_Number:
-                result += match[c]*self.F(match[k], match[t])
-                
-            else:
-                logger.warning(f"Unmatched term in single integral: {term}")
-                logger.warning(f"Matched: {match}")
-                
-        return result           
- 
-    def _double_integral(self, integrand, x, y):
+    def _recursion_size(self, g, n):
         """
-        Computes integral by identifying with known F_2k-1(x) functions
+        Returns the number of terms of the largest dependency of V_(g,n) in the recursion
         """
-        if integrand == 0:
-            return 0
-        
-        terms = sp.Add.make_args(integrand.expand())
-        result = sp.Float(0)
-        
-        a = sp.Wild("a")                        # power in x^(2a-1)
-        b = sp.Wild("b")                        # power in y^(2b-1)
-        t = sp.Wild("t")                        # 2nd argument of H
-        c = sp.Wild("c", exclude=(x, y))        # constant coefficient integrand
-        H = self._H(x + y, t)
-        sub_expr = c * x**(2*a-1) * y**(2*b-1) * H
-        
-        for term in terms:
-            match = term.match(sub_expr)
-
-            if match and match[a].is_Number and match[b].is_Number:
-                _a = int(match[a])
-                _b = int(match[b])
-                _t = match[t]
-                _c = match[c]
-                
-                F_coeff  = self.factorial(2*_a - 1)
-                F_coeff *= self.factorial(2*_b - 1)
-                F_coeff /= self.factorial(2*_a + 2*_b - 1)            
-                new = _c*F_coeff*self.F(_a + _b, _t)
-                result += new
-            else:
-                logger.warning(f"Unmatched term in double integral: {term}")
-                logger.warning(f"Matched: {match}")
-            
-        return result
+        if g >= 1:
+            return len(self._get_terms(g-1, n+1))
+        return len(self._get_terms(g, n-1)) if n >= 2 else 0
+    
+    def close(self):
+        """
+        Shuts down the process pool of entry_jobs, if there is one, and removes the spill store
+        """
+        if self.parallel is not None:
+            self.parallel.close()
+        super().close()
     
     def _apply_mirzakhanis_recursion(self, g, n):
         """
@@ -309,96 +900,284 @@ class WeilPetersonCalculator(WeilPetersonTable):
         """
         if 2 - 2*g - n > 0:
             logger.warning(f"({g},{n}) - Invalid input")
-            return sp.Integer(0)
+            return {}
+        
+        elif self.parallel is not None and self._recursion_size(g, n) >= self.parallel_threshold:
+            with self.profiler.stage("parallel_terms"):
+                return self.parallel(g, n)
         
         else:
-            term1 = self._compute_term_1(g, n)    
-            term2 = self._compute_term_2(g, n)
-            term3 = self._compute_term_3(g, n)
+            with self.profiler.stage("term1"):
+                term1 = self._compute_term_1(g, n)
+            with self.profiler.stage("term2"):
+                term2 = self._compute_term_2(g, n)
+            with self.profiler.stage("term3"):
+                term3 = self._compute_term_3(g, n)
             
             logger.debug(f"({g},{n}) TERM1: {term1}")
             logger.debug(f"({g},{n}) TERM2: {term2}")
             logger.debug(f"({g},{n}) TERM3: {term3}")
             
-            return term1 + term2 + term3
+            return self._sum_terms(term1, term2, term3)
+    
+    def _sum_terms(self, *terms):
+        """
+        Returns the sum of the three terms of the recursion, as dicts {(e1, ..., en): coefficient}.
+        Counts the monomials of the result, and those shared by several terms, which are merged.
+        """
+        result = dict(terms[0])
+        for term in terms[1:]:
+            for monom, c in term.items():
+                if monom in result:
+                    result[monom] += c
+                else:
+                    result[monom] = c
+        
+        self.profiler.count("merged_monomials", sum(map(len, terms)) - len(result))
+        self.profiler.count("result_monomials", len(result))
+        return result
 
     def _apply_dilaton_equation(self, g, n=0):
         """
-        Applies the dilaton equation to compute V_(g,n):
-        (See Corollary 23 of Do's paper)
+        Applies the dilaton equation coefficient-wise, in exact rationals:
+        a term c L^rest L_(n+1)^(2j) of V_(g,n+1) contributes 
+            c 2j (2πi)^(2j-1) / (2πi (2g-2+n)) L^rest = c 2j (-4π²)^(j-1) / (2g-2+n) L^rest
+        to V_(g,n), which is real. In the symmetric monomials, the terms with L_(n+1)^(2j)
+        of c_α m_α are c_α m_β, for every distinct part j of α and β = α without j.
+        The powers of π are implied by the grading.
+        """
+        try:
+            coefficients = self._rationals(g, n+1)
+        except KeyError:
+            coefficients = SymmetricVolume.from_poly(self.calculate_V(g, n+1), n+1).rationals()
+        
+        V = {}
+        for alpha, c in coefficients.items():
+            for i, j in enumerate(alpha):
+                if i > 0 and alpha[i-1] == j:
+                    continue
+                beta = alpha[:i] + alpha[i+1:]
+                if len(beta) > n:
+                    continue
+                V[beta] = V.get(beta, 0) + c * Fraction(2*j*(-4)**(j-1), 2*g - 2 + n)
+        
+        top = 3*g - 3 + n
+        window = self._window(g, n) or (0, None)
+        V = {beta: [[2*(top - sum(beta)), c.numerator, c.denominator]] for beta, c in V.items()
+             if c and 2*sum(beta) >= window[0] and (window[1] is None or 2*sum(beta) <= window[1])}
+        return SymmetricVolume(V, n).to_poly(self._symbols(n), self.domain)
+    
+    def _apply_dilaton_equation_symbolic(self, g, n=0):
+        """
+        Applies the dilaton equation to compute V_(g,n) by differentiating V_(g,n+1)
+        and substituting L_(n+1) = 2πi (see Corollary 23 of Do's paper). Much slower than
+        _apply_dilaton_equation, and kept to check it.
         """
         V_next, found = self._check_table(g, n+1)
         
         if not found:
             V_next = self.calculate_V(g, n+1)
         
-        #V_ne = sp.Poly(V_next, self.L_list[:n+1], domain=self.domain)
-        dilaton_lhs = V_next.diff(self.L_list[n]).subs({self.L_list[n]: 2*sp.pi*sp.I})
-
-        V, remainder = sp.div(dilaton_lhs, 2*sp.pi*sp.I * (2*g - 2 + n) )
-        
-        if remainder:
-            logger.warning(f"CRITICAL ERROR - ({g},{n}) Remainder in dilaton equation: {remainder}")
+        L = self._symbols(n+1)
+        dilaton_lhs = V_next.as_expr().diff(L[n]).subs({L[n]: 2*sp.pi*sp.I})
+        V = sp.Poly(sp.expand(dilaton_lhs / (2*sp.pi*sp.I * (2*g - 2 + n))), self._symbols(n), domain=self.domain)
         
-        return V        
+        return V
     
     def calculate_V(self, g, n):#, L_list):
         V, found = self._check_table(g, n)
         
+        if self._truncation is not None:
+            if found:
+                V = self._truncate_poly(V, g, n)
+            else:
+                V, found = self._check_truncated(g, n)
+        
         if not found:
-            logger.info(f"Not found in table: V_({g},{n}) - calculating...")
-            T0 = time.time()
-            L1 = self.L_list[0]
+            with self.profiler.entry(g, n):
+                V = self._calculate_missing(g, n)
+        return V
+    
+    def _calculate_missing(self, g, n):
+        logger.info(f"Not found in table: V_({g},{n}) - calculating...")
+        T0 = time.time()
 
-            if 2*g + n <= 3:
-                V = sp.Poly(sp.Integer(0), L1, domain=self.domain)
-                
-            # Apply dilaton equation if n=0
-            elif n==0:
-                logger.info(f". Applying Dilaton equation...")
+        if 2*g + n <= 3:
+            V = sp.Poly(sp.Integer(0), self.L_list[:max(n, 1)], domain=self.domain)
+            
+        # Apply dilaton equation if n=0
+        elif n==0:
+            logger.info(f". Applying Dilaton equation...")
+            with self.profiler.stage("dilaton"):
                 V = self._apply_dilaton_equation(g, n)
-                
-            # Otherwise, use Mirzakhani's recursion
-            else:
-                logger.info(f"⋅ Applying Mirzakhani's recursion...")
-                integrand = sp.Poly(self._apply_mirzakhanis_recursion(g, n), domain=self.domain)
-                
-                T1 = time.time()
-                logger.info(f"  (took  {T1-T0:.2f} s)")
-                T0 = time.time()
-                logger.info(f"⋅ Integrating result...")
-
-                V, remainder = sp.div(integrand.integrate(L1), 2*L1)#.div(2*L1)# / (2*L1)#sp.integrate(integrand, L1) / ( 2*L1 )
-                V = sp.Poly(V, self.L_list[:n+1], domain=self.domain)
-                if remainder:
-                    logger.warning(f"CRITICAL ERROR - ({g},{n}) Remainder in division: {remainder}")
-
+            
+        # Otherwise, use Mirzakhani's recursion
+        else:
+            logger.info(f"⋅ Applying Mirzakhani's recursion...")
+            integrand = self._apply_mirzakhanis_recursion(g, n)
+            
             T1 = time.time()
             logger.info(f"  (took  {T1-T0:.2f} s)")
+            T0 = time.time()
+            logger.info(f"⋅ Integrating result...")
+            
+            # ∫ L1^e dL1 / (2 L1) = L1^e / (2(e+1))
+            with self.profiler.stage("L1_integration"):
+                V = {}
+                for monom, c in self._truncate(integrand, g, n).items():
+                    if c:
+                        V[monom] = c * self._rational(1, 2*(monom[0] + 1))
+                V = self._to_entry(V, g, n)
 
-            self._add_to_table(g, n, V)
+        T1 = time.time()
+        logger.info(f"  (took  {T1-T0:.2f} s)")
+
+        with self.profiler.stage("store"):
+            window = self._window(g, n)
+            if window is None or window == (0, None):
+                self._add_to_table(g, n, V)
+            else:
+                self._add_to_table(g, n, SymmetricVolume(SymmetricVolume.from_poly(V, n).coefficients, n, window))
         return V
         
-    def __call__(self, g, n):
+    def _approximate(self, g, n):
+        """
+        Approximates V_(g,n) by the array recursion, starting from the exact entries of the
+        table. Returns a Poly with floating-point coefficients.
+        """
+        approximation = self.approximation
+        
+        def known(g, n):
+            return (g, n) in approximation.volumes or self._check_table(g, n)[1]
+        
+        graph = scheduler.dependency_graph([(g, n)], known=known)
+        for node in set().union({(g, n)}, *graph.values()):
+            if node not in graph and node not in approximation.volumes:
+                approximation.add(*node, self._rationals(*node))
+        
+        approximation.compute([(g, n)])
+        
+        if self.precision is None:
+            domain, pi = sp.RR, math.pi
+        else:
+            domain, pi = sp.RealField(dps=self.precision), approximation.arithmetic.mp.pi
+        
+        top = 3*g - 3 + n
+        P, C = approximation.volume(g, n)
+        terms = {}
+        for alpha, c in zip(P.tolist(), C):
+            c = domain.from_sympy(sp.Float(str(c * pi**(2*(top - sum(alpha)))), domain.dps))
+            for monom in utils.distinct_permutations([2*a for a in alpha] or [0]):
+                terms[monom] = c
+        
+        return sp.Poly.from_dict(terms, self._symbols(n), domain=domain)
+    
+    def approximation_errors(self):
+        """
+        Compares the approximated volumes with the exact entries of the table. Volumes
+        without an exact entry are compared with the array recursion in mpmath with about
+        twice the digits, from the same exact entries, which estimates their error.
+        
+        :returns: dict {(g,n): (largest relative error of a coefficient, "exact" or "estimated")}
         """
-        Computes Wein-Peterson volume V_(g,n) using Mirzakhani"s recursion
+        def fraction(x):
+            if hasattr(x, "man"):
+                return Fraction(int(x.man)) * Fraction(2)**int(x.exp)
+            return Fraction(x)
+        
+        def largest_error(computed, expected):
+            error = Fraction(0)
+            for alpha, c in expected.items():
+                c = fraction(c)
+                if c:
+                    error = max(error, abs(fraction(computed.get(alpha, 0)) - c) / abs(c))
+            return float(error)
+        
+        errors, unchecked = {}, []
+        for g, n in sorted(self.approximation.volumes):
+            if self._check_table(g, n)[1]:
+                errors[(g, n)] = (largest_error(self.approximation.coefficients(g, n), self._rationals(g, n)), "exact")
+            else:
+                unchecked.append((g, n))
+        
+        if unchecked:
+            digits = 16 if self.precision is None else self.precision
+            known = {key: self._rationals(*key) for key in self.approximation.volumes if key not in unchecked}
+            reference = ArrayRecursion(MPArithmetic(2*digits + 10), known)
+            reference.compute(unchecked)
+            for g, n in unchecked:
+                error = largest_error(self.approximation.coefficients(g, n), reference.coefficients(g, n))
+                errors[(g, n)] = (error, "estimated")
+        
+        return errors
+    
+    def __call__(self, g, n, min_degree=None, max_degree=None):
+        """
+        Computes Wein-Peterson volume V_(g,n) using Mirzakhani"s recursion.
+        
+        With min_degree or max_degree, only the monomials of V_(g,n) of total degree in L 
+        in [min_degree, max_degree] are computed, e.g. min_degree=6g-6+2n for the top-degree
+        (Witten-Kontsevich) part. A term of degree d of a dependency only contributes to 
+        terms of degree at least d - 2(3g'-3+n') + 2(3g-3+n) in V_(g,n), so the dependencies
+        are truncated from below as well, and the other terms are dropped as soon as they are
+        produced. Truncated entries are stored with their degree window (see truncation), and
+        are only used by truncated computations.
 
         :param n: no. of boundaries
         :type n: int
         :param g: genus
         :type g: int
+        :param min_degree: smallest degree kept, or None for 0
+        :param max_degree: largest degree kept, or None for no bound
         :returns: computed term
         :rtype: sp.Expr
         """
         T0 = time.time()
         logger.info(f"Starting recursion for V_({g},{n})")
+        
+        if self.memory is not None:
+            self.memory.plan([(g, n)])
+        
+        if min_degree is not None or max_degree is not None:
+            if not self.exact:
+                raise ValueError("Truncated computations are only available with exact=True")
+            return self._calculate_truncated(g, n, min_degree or 0, max_degree)
 
-        self.L_list = [sp.Symbol(f"L{i}", positive=True) for i in range(1, 3*g + n+1)]
+        if not self.exact:
+            with self.profiler.stage("approximate", g=g, n=n):
+                V = self._approximate(g, n)
+            logger.info(f"Approximated V_({g},{n}) - {time.time()-T0} s")
+            return V
+        
+        self.L_list = utils.boundary_symbols(3*g + n)
         V = self.calculate_V(g, n)
         
         T1 = time.time()
         logger.info(f"Finished recursion for V_({g},{n}) - {T1-T0} s")
+        logger.info(f"Table cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        
+        return V
+    
+    def _calculate_truncated(self, g, n, min_degree, max_degree):
+        T0 = time.time()
+        self.L_list = utils.boundary_symbols(3*g + n)
+        
+        # Largest power of π² kept; the degrees of monomials are even
+        codegree = 3*g - 3 + n - (min_degree + 1)//2
+        if codegree < 0 or (max_degree is not None and max_degree < 2*((min_degree + 1)//2)):
+            return sp.Poly(sp.Integer(0), self._symbols(n), domain=self.domain)
+        
+        self._truncation = (codegree, (g, n), max_degree)
+        try:
+            V = self.calculate_V(g, n)
+        finally:
+            # Terms of truncated entries are not kept for later computations
+            self._truncation = None
+            self._terms.clear()
+            if self.memory is not None:
+                self.memory.invalidate()
         
+        logger.info(f"Finished truncated recursion for V_({g},{n}), degrees {min_degree} to {max_degree} - {time.time()-T0} s")
         return V
     
 if __name__=="__main__":
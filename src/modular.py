@@ -0,0 +1,161 @@
+"""
+Multi-modular exact computation of Weil-Peterson volumes.
+
+The rational coefficients of the volumes are computed modulo several primes
+p < 2^31 with the NumPy recursion of array_recursion, each prime in its own
+process. The rationals are then rebuilt by Chinese remaindering and rational
+reconstruction, and checked against one more prime. If the reconstruction
+fails or the check does not agree, more primes are added.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from math import gcd, isqrt
+import sympy as sp
+from src.array_recursion import ArrayRecursion, ModularArithmetic
+from src.symmetric import SymmetricVolume
+import src.scheduler as scheduler
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def primes(count, below=2**31):
+    """
+    Returns the count largest primes below the given bound
+    """
+    result = []
+    p = below
+    while len(result) < count:
+        p = sp.prevprime(p)
+        result.append(p)
+    return result
+
+def crt(residues, moduli):
+    """
+    Returns the x in [0, M) with x ≡ residues[i] mod moduli[i], and M = Π moduli
+    """
+    x, M = 0, 1
+    for r, p in zip(residues, moduli):
+        t = (r - x) * pow(M, -1, p) % p
+        x += M * t
+        M *= p
+    return x, M
+
+def rational_reconstruction(x, M):
+    """
+    Returns the fraction a/b ≡ x mod M with |a|, b ≤ √(M/2), or None if there is none
+    """
+    bound = isqrt(M // 2)
+    r0, r1 = M, x % M
+    s0, s1 = 0, 1
+    while r1 > bound:
+        q = r0 // r1
+        r0, r1 = r1, r0 - q*r1
+        s0, s1 = s1, s0 - q*s1
+
+    if s1 == 0 or abs(s1) > bound or gcd(r1, abs(s1)) != 1:
+        return None
+    if s1 < 0:
+        r1, s1 = -r1, -s1
+    return Fraction(r1, s1)
+
+def _modular_volumes(p, targets, known):
+    """
+    Computes the volumes of targets modulo p, in a worker process
+
+    :returns: dict {(g,n): {α: residue}} for every computed volume
+    """
+    recursion = ArrayRecursion(ModularArithmetic(p), known)
+    recursion.compute(targets)
+    return {node: {alpha: int(c) for alpha, c in recursion.coefficients(*node).items()}
+            for node in recursion.volumes if node not in known}
+
+class MultiModularSolver:
+    """
+    Computes volumes exactly by the multi-modular method, starting from the
+    entries in the table of a calculator and storing the results in it.
+    """
+    def __init__(self, calculator, jobs=1, primes=4, max_primes=256):
+        """
+        :param jobs: number of processes, each running the recursion for one prime
+        :param primes: number of primes to start with; doubled until the reconstruction succeeds
+        :param max_primes: number of primes after which to give up
+        """
+        self.calculator = calculator
+        self.jobs = jobs
+        self.initial_primes = primes
+        self.max_primes = max_primes
+
+    def _known(self, g, n):
+        return self.calculator._check_table(g, n)[1]
+
+    def _residues(self, moduli, targets, known):
+        if self.jobs > 1 and len(moduli) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(moduli))) as executor:
+                results = executor.map(_modular_volumes, moduli,
+                                       [targets]*len(moduli), [known]*len(moduli))
+                return dict(zip(moduli, results))
+
+        return {p: _modular_volumes(p, targets, known) for p in moduli}
+
+    def _reconstruct(self, residues, nodes):
+        """
+        Rebuilds the rationals from the residues modulo every prime so far, and checks
+        them modulo the last prime. Returns None if that fails.
+        """
+        moduli = list(residues)
+        check = moduli.pop()
+
+        volumes = {}
+        for node in nodes:
+            partitions = set().union(*(residues[p][node] for p in residues))
+            coefficients = {}
+            for alpha in partitions:
+                x, M = crt([residues[p][node].get(alpha, 0) for p in moduli], moduli)
+                c = rational_reconstruction(x, M)
+                if c is None:
+                    return None
+                if ModularArithmetic(check).convert(c) != residues[check][node].get(alpha, 0):
+                    return None
+                if c:
+                    coefficients[alpha] = c
+            volumes[node] = coefficients
+
+        return volumes
+
+    def run(self, targets):
+        """
+        Computes V_(g,n) for every (g,n) in targets.
+
+        :param targets: list of (g,n)
+        :returns: dict {(g,n): V}
+        """
+        T0 = time.time()
+        graph = scheduler.dependency_graph(targets, known=self._known)
+        known = {dep: self.calculator._rationals(*dep)
+                 for deps in graph.values() for dep in deps if dep not in graph}
+
+        count = self.initial_primes
+        residues = {}
+        volumes = None
+        while volumes is None:
+            if count > self.max_primes:
+                raise ArithmeticError(f"Rational reconstruction failed with {self.max_primes} primes")
+
+            # One more prime than needed for the reconstruction, to check it
+            moduli = primes(count + 1)
+            residues.update(self._residues([p for p in moduli if p not in residues], targets, known))
+            logger.info(f"Computed {len(graph)} volumes modulo {len(residues)} primes ({time.time() - T0:.2f} s)")
+
+            volumes = self._reconstruct({p: residues[p] for p in moduli}, graph)
+            count *= 2
+
+        for level in scheduler.levels(graph):
+            for g, n in level:
+                top = 3*g - 3 + n
+                coefficients = {alpha: [[2*(top - sum(alpha)), c.numerator, c.denominator]]
+                                for alpha, c in volumes[(g, n)].items()}
+                self.calculator._add_to_table(g, n, SymmetricVolume(coefficients, n))
+
+        logger.info(f"Multi-modular computation of {targets} finished ({time.time() - T0:.2f} s)")
+        return {(g, n): self.calculator(g, n) for g, n in targets}
@@ -0,0 +1,156 @@
+"""
+Parallel evaluation of the three terms of Mirzakhani's recursion within one V_(g,n).
+
+The integrands of terms 1 and 3 are cut into chunks, and term 2 into its genus
+splits (g₁, n₁), themselves cut into chunks of the terms of V₁. Every chunk is
+integrated in a worker process, in exact rationals without the powers of π
+which are implied by the grading (see WeilPetersonCalculator.rational), as
+elements of QQ. The results are summed as dicts of coefficients, and converted
+back to the ring of the calculator at the end.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+import itertools
+import sympy as sp
+import src.integration as integration
+import src.serialization as serialization
+import src.kernels as kernels
+import src.utils as utils
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _F(k):
+    return kernels.shared_cache.coefficients(k, sp.QQ, graded=True)
+
+def _weight(a, b):
+    weight = kernels.double_weight(a, b)
+    return sp.QQ(weight.numerator, weight.denominator)
+
+def _double_task(integrand, min_degree):
+    return integration.double_integral(integrand, _F, _weight, min_degree)
+
+def _single_task(integrand, min_degree):
+    return integration.single_integral(integrand, _F, min_degree)
+
+def _split_task(V1, V2, multiplicity, min_degree):
+    integrand = integration.split_integrand(V1, V2, multiplicity, min_degree)
+    for (a, b, rest), c in integrand.items():
+        integrand[(a, b, rest)] = c * sp.QQ(1, utils.orbit_size(rest))
+    return integration.double_integral(integrand, _F, _weight, min_degree)
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = dict(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+class ParallelRecursion:
+    """
+    Computes the sum of the three terms of Mirzakhani's recursion for V_(g,n), as
+    _apply_mirzakhanis_recursion does, on a pool of jobs processes. The dependencies
+    are looked up (or computed) by the calculator in this process.
+    """
+    def __init__(self, calculator, jobs, chunk_size=2048):
+        """
+        :param chunk_size: number of integrand terms, or of products of terms for
+                           term 2, in each task
+        """
+        self.calculator = calculator
+        self.jobs = jobs
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _graded(self, terms):
+        """
+        Converts terms over the ring of the calculator to QQ, leaving out the powers of π
+        """
+        if self.calculator.rational:
+            return terms
+        return {monom: serialization.coefficient_from_plain(serialization.coefficient_to_plain(c), sp.QQ, graded=True)
+                for monom, c in terms.items()}
+
+    def _tasks(self, g, n):
+        """
+        Yields (term, function, args) for every chunk of the three terms
+        """
+        calculator = self.calculator
+        min_degree = calculator._min_degree(g, n)
+
+        # Term 1: V_(g-1,n+1)(x, L2, ..., Ln, y)
+        if g >= 1:
+            V = self._graded(calculator._get_terms(g-1, n+1))
+            integrand = {(monom[0]//2 + 1, monom[n]//2 + 1, monom[1:n]): c for monom, c in V.items()}
+            for chunk in _chunks(integrand.items(), self.chunk_size):
+                yield "term1", _double_task, (chunk, min_degree)
+
+        # Term 2: one representative I ⊔ J per (g₁, n₁), see _compute_term_2
+        if 2*g + n >= 3:
+            for g1 in range(0, g+1):
+                g2 = g - g1
+                for n1 in range(0, n):
+                    n2 = n - 1 - n1
+                    if (2*g1 + n1 >= 2) and (2*g2 + n2 >= 2):
+                        V1 = self._graded(calculator._get_terms(g1, n1+1))
+                        V2 = self._graded(calculator._get_terms(g2, n2+1))
+                        size = max(1, self.chunk_size // max(len(V2), 1))
+                        for chunk in _chunks(V1.items(), size):
+                            yield "term2", _split_task, (chunk, V2, comb(n-1, n1), min_degree)
+
+        # Term 3: V_(g,n-1)(x, L̂_k), with L_k replaced by L_n
+        if n >= 2 and 2*g + n >= 3:
+            V = self._graded(calculator._get_terms(g, n-1))
+            integrand = {}
+            for monom, c in V.items():
+                a = monom[0]//2 + 1
+                for k in range(0, n-1):
+                    rest = list(monom[1:]) + [0]
+                    rest[k], rest[n-2] = 0, rest[k]
+                    integrand[(a, k, tuple(rest))] = c
+            for chunk in _chunks(integrand.items(), self.chunk_size):
+                yield "term3", _single_task, (chunk, min_degree)
+
+    def __call__(self, g, n):
+        """
+        :returns: dict {(e1, ..., en): coefficient} over the ring of the calculator
+        """
+        profiler = self.calculator.profiler
+        with profiler.stage("submit"):
+            futures = [(term, self.executor.submit(function, *args)) for term, function, args in self._tasks(g, n)]
+        profiler.count("parallel_tasks", len(futures))
+        logger.info(f"⋅ Integrating V_({g},{n}) in {len(futures)} tasks on {self.jobs} processes")
+
+        with profiler.stage("gather"):
+            terms = {"term1": {}, "term2": {}, "term3": {}}
+            for term, future in futures:
+                for monom, c in future.result().items():
+                    integration._accumulate(terms[term], monom, c)
+
+            # Symmetrize term 2 in L2, ..., Ln
+            term2 = {}
+            for (e1, *rest), c in terms["term2"].items():
+                for monom in utils.distinct_permutations(rest):
+                    integration._accumulate(term2, (e1, *monom), c)
+            result = self.calculator._sum_terms(terms["term1"], term2, terms["term3"])
+
+        if self.calculator.rational:
+            return {monom: c for monom, c in result.items() if c}
+        
+        with profiler.stage("convert"):
+            top = 6*g - 6 + 2*n
+            return {monom: serialization.coefficient_from_plain([[top - sum(monom), int(c.numerator), int(c.denominator)]],
+                                                                 self.calculator.ring)
+                    for monom, c in result.items() if c}
@@ -0,0 +1,138 @@
+from contextlib import contextmanager, nullcontext
+from collections import Counter
+import threading
+import tracemalloc
+import resource
+import time
+import json
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+def peak_rss():
+    """
+    Returns the peak resident memory of this process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    return peak if sys.platform == "darwin" else 1024*peak
+
+class NullProfiler:
+    """
+    Profiler that records nothing, used when profiling is off
+    """
+    def stage(self, name, **args):
+        return nullcontext()
+
+    def entry(self, g, n):
+        return nullcontext()
+
+    def count(self, name, value=1):
+        pass
+
+class Profiler(NullProfiler):
+    """
+    Records the wall and CPU time of nested stages of a computation.
+
+    Stages are timed both inclusively and exclusively of the stages nested in
+    them, so the time spent computing a dependency inside a term of the recursion
+    is not counted for that term. Stages within entry(g, n) are also totalled per
+    (g,n). Every stage is kept as an event for the Chrome trace format
+    (chrome://tracing or https://ui.perfetto.dev).
+    """
+    def __init__(self, trace_memory=False):
+        """
+        :param trace_memory: if True, also trace the peak memory allocated by Python
+                             (tracemalloc), which slows the computation down
+        """
+        self.stages = {}
+        self.entries = {}
+        self.counters = Counter()
+        self.events = []
+        self._stack = []
+        self._start = time.perf_counter()
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+
+    def _totals(self, totals, name, wall, cpu, self_wall, self_cpu):
+        if name not in totals:
+            totals[name] = {"calls": 0, "wall": 0.0, "cpu": 0.0, "self_wall": 0.0, "self_cpu": 0.0}
+        total = totals[name]
+        total["calls"] += 1
+        total["wall"] += wall
+        total["cpu"] += cpu
+        total["self_wall"] += self_wall
+        total["self_cpu"] += self_cpu
+
+    @contextmanager
+    def stage(self, name, **args):
+        frame = {"name": name, "entry": None, "child_wall": 0.0, "child_cpu": 0.0}
+        if self._stack:
+            frame["entry"] = self._stack[-1]["entry"]
+        self._stack.append(frame)
+
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]["child_wall"] += wall
+                self._stack[-1]["child_cpu"] += cpu
+
+            self_wall, self_cpu = wall - frame["child_wall"], cpu - frame["child_cpu"]
+            self._totals(self.stages, name, wall, cpu, self_wall, self_cpu)
+            if frame["entry"] is not None:
+                self._totals(self.entries[frame["entry"]]["stages"], name, wall, cpu, self_wall, self_cpu)
+
+            self.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                "ts": 1e6*(start - self._start), "dur": 1e6*wall, "args": args})
+
+    @contextmanager
+    def entry(self, g, n):
+        """
+        Stage for the computation of V_(g,n)
+        """
+        key = f"({g},{n})"
+        self.entries.setdefault(key, {"stages": {}})
+        with self.stage(f"V_{key}", g=g, n=n):
+            self._stack[-1]["entry"] = key
+            yield
+        self.entries[key].update(self.entries[key]["stages"].pop(f"V_{key}"))
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def peak_memory(self):
+        """
+        Returns the peak memory in bytes: resident, and traced if trace_memory is on
+        """
+        memory = {"rss": peak_rss()}
+        if self.trace_memory:
+            memory["traced"] = tracemalloc.get_traced_memory()[1]
+        return memory
+
+    def report(self):
+        return {"wall": time.perf_counter() - self._start,
+                "stages": self.stages,
+                "entries": self.entries,
+                "counters": dict(self.counters),
+                "peak_memory": self.peak_memory()}
+
+    def save(self, filename):
+        """
+        Saves the report as JSON to filename, and the trace to filename with the suffix .trace.json
+        """
+        filename = str(filename)
+        with open(filename, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+        trace = filename[:-len(".json")] if filename.endswith(".json") else filename
+        with open(trace + ".trace.json", "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+
+        logger.info(f"Saved profile to <{filename}> and <{trace}.trace.json>.")
@@ -0,0 +1,147 @@
+"""
+Fast lookup of single volumes, without SymPy.
+
+    python -m src.query g n [--table FILE] [--json] [--at L1 ... Ln]
+
+Prints V_(g,n) from a table, as text or as its plain record (see serialization),
+or evaluates it at the given boundary lengths. Tables in an SQLite store (see
+storage) are read one entry at a time, with only the standard library. Pickled
+tables hold SymPy polynomials, so reading them imports SymPy and loads the whole
+table; convert them to a store for fast lookups, e.g. with
+
+    python main.py --import data/mytable_poly.pkl -o mytable.sqlite
+
+Without --table, data/Weil-Peterson-base.sqlite is read if it exists, and the
+pickled data/Weil-Peterson-base.pkl otherwise.
+"""
+import argparse
+import math
+import json
+import sys
+import os
+from src.combinatorics import distinct_permutations
+
+# pathlib is left out to keep the start-up short
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def default_table():
+    """
+    Returns data/Weil-Peterson-base.sqlite if it exists, otherwise the pickled
+    data/Weil-Peterson-base.pkl, which is much slower to read
+    """
+    store = os.path.join(DATA_PATH, "Weil-Peterson-base.sqlite")
+    return store if os.path.exists(store) else os.path.join(DATA_PATH, "Weil-Peterson-base.pkl")
+
+def read_record(filename, g, n):
+    """
+    Returns the plain record of V_(g,n) in a table (see serialization.volume_to_record),
+    or None if there is no entry
+    """
+    import src.storage as storage
+
+    if storage.is_store(filename):
+        store = storage.SQLiteTableStore(filename)
+        try:
+            return store.get(g, n)
+        finally:
+            store.close()
+
+    # Pickled tables need SymPy
+    import pickle
+    import src.serialization as serialization
+    from src.symmetric import SymmetricVolume
+
+    with open(filename, "rb") as file:
+        table = pickle.load(file)
+    try:
+        V = table[f"g={g}"][f"n={n}"]
+    except KeyError:
+        return None
+
+    if not isinstance(V, SymmetricVolume):
+        import sympy as sp
+        from src.utils import boundary_symbols
+        V = sp.Poly(V, boundary_symbols(max(n, 1)), domain=sp.QQ_I[sp.pi])
+    return serialization.volume_to_record(V, n)
+
+def record_terms(record):
+    """
+    Returns the terms of a record as a list of (monom, [[k, num, den], ...]),
+    monom the exponents of L1, ..., Ln
+    """
+    if record["format"] == "plain":
+        return [(tuple(monom), c) for monom, c in record["terms"]]
+
+    n = record["n"]
+    terms = []
+    for alpha, c in record["coefficients"]:
+        padded = [2*a for a in alpha] + [0]*(n - len(alpha))
+        terms.extend((monom, c) for monom in distinct_permutations(padded))
+    return terms
+
+def evaluate(record, L):
+    """
+    Evaluates a record at the boundary lengths L, in floating point
+    """
+    result = 0.0
+    for monom, c in record_terms(record):
+        value = sum(num / den * math.pi**k for k, num, den in c)
+        for x, e in zip(L, monom):
+            value *= x**e
+        result += value
+    return result
+
+def format_record(record):
+    """
+    Returns the volume of a record as text, e.g. 1/48*L1^2 + 1/12*pi^2
+    """
+    terms = []
+    for monom, c in sorted(record_terms(record), key=lambda term: (-sum(term[0]), [-e for e in term[0]])):
+        for k, num, den in c:
+            factors = [f"{num}/{den}" if den != 1 else f"{num}"]
+            if k:
+                factors.append(f"pi^{k}")
+            factors.extend(f"L{i+1}^{e}" for i, e in enumerate(monom) if e)
+            terms.append("*".join(factors))
+
+    if record.get("truncation") is not None:
+        min_degree, max_degree = record["truncation"]
+        if max_degree is None:
+            terms.append(f"(degrees {min_degree} and up only)")
+        else:
+            terms.append(f"(degrees {min_degree} to {max_degree} only)")
+    return " + ".join(terms).replace("+ -", "- ") or "0"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up a Weil-Peterson volume in a table")
+    parser.add_argument("g", type=int)
+    parser.add_argument("n", type=int)
+    parser.add_argument("-t", "--table", type=str, default=None,
+                        help="by default the store data/Weil-Peterson-base.sqlite, or the pickled table if there is none")
+    parser.add_argument("--json", action="store_true", help="print the plain record")
+    parser.add_argument("--at", type=float, nargs="+", action="append", metavar="L",
+                        help="evaluate at boundary lengths L1 ... Ln (may be repeated)")
+    args = parser.parse_args(argv)
+    if args.table is None:
+        args.table = default_table()
+
+    record = read_record(args.table, args.g, args.n)
+    if record is None:
+        print(f"V_({args.g},{args.n}) is not in <{args.table}>", file=sys.stderr)
+        return 1
+
+    if args.at:
+        for L in args.at:
+            if len(L) != args.n:
+                print(f"Expected {args.n} boundary lengths, got {len(L)}", file=sys.stderr)
+                return 2
+            print(repr(evaluate(record, L)))
+    elif args.json:
+        print(json.dumps(record, separators=(",", ":")))
+    else:
+        print(format_record(record))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
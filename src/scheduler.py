@@ -0,0 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
+import src.serialization as serialization
+from src.symmetric import SymmetricVolume
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+def dependencies(g, n):
+    """
+    Returns the set of (g', n') whose volumes are needed to compute V_(g,n),
+    mirroring the terms of WeilPetersonCalculator.calculate_V
+    """
+    deps = set()
+
+    if 2*g + n <= 3:
+        return deps
+
+    # Dilaton equation
+    if n == 0:
+        deps.add((g, 1))
+        return deps
+
+    # Term 1: V_(g-1,n+1)
+    if g >= 1:
+        deps.add((g-1, n+1))
+
+    # Term 2: V_(g1,n1+1) V_(g2,n2+1), with n1 + n2 = n-1
+    for g1 in range(0, g+1):
+        g2 = g - g1
+        for n1 in range(0, n):
+            n2 = n - 1 - n1
+            if (2*g1 + n1 >= 2) and (2*g2 + n2 >= 2):
+                deps.add((g1, n1+1))
+                deps.add((g2, n2+1))
+
+    # Term 3: V_(g,n-1)
+    if n >= 2:
+        deps.add((g, n-1))
+
+    return deps
+
+def dependency_graph(targets, known=None):
+    """
+    Builds the full dependency DAG for a list of targets (g,n).
+
+    :param known: optional predicate known(g, n) for entries that are already
+                  available, which are left out of the graph together with
+                  their own dependencies
+    :returns: dict {(g,n): set of dependencies}
+    """
+    graph = {}
+    stack = list(targets)
+    while stack:
+        node = stack.pop()
+        if node in graph or (known is not None and known(*node)):
+            continue
+        graph[node] = dependencies(*node)
+        stack.extend(graph[node])
+
+    return graph
+
+def levels(graph):
+    """
+    Sorts the nodes of a dependency graph into levels, such that every node
+    only depends on nodes of lower levels.
+
+    :returns: list of lists of (g,n)
+    """
+    level = {}
+
+    def _level(node):
+        if node not in level:
+            level[node] = 1 + max((_level(dep) for dep in graph[node] if dep in graph), default=-1)
+        return level[node]
+
+    for node in graph:
+        _level(node)
+
+    result = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for node in sorted(level):
+        result[level[node]].append(node)
+
+    return result
+
+def _pack(V):
+    """
+    Unpickling SymPy polynomials is slow, so volumes are passed between
+    processes in the plain serialized form
+    """
+    if isinstance(V, SymmetricVolume):
+        return V
+    return serialization.poly_to_plain(V)
+
+def _unpack(data, n, calculator):
+    if isinstance(data, SymmetricVolume):
+        return data
+    return serialization.poly_from_plain(data, calculator._symbols(n), calculator.domain)
+
+def _compute_entry(g, n, deps, compact, rational):
+    """
+    Computes V_(g,n) in a worker process, given all its dependencies
+    """
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+
+    calculator = WeilPetersonCalculator(None, compact=compact, rational=rational)
+    for (g_dep, n_dep), data in deps.items():
+        calculator._add_to_table(g_dep, n_dep, _unpack(data, n_dep, calculator))
+
+    calculator(g, n)
+    return _pack(calculator._get_entry(g, n))
+
+class Scheduler:
+    """
+    Evaluates the dependency DAG of a set of targets bottom-up, level by level,
+    computing the entries of each level in parallel and storing them in the
+    table of the given calculator.
+    """
+    def __init__(self, calculator, jobs=1):
+        if not calculator.exact:
+            raise ValueError("The scheduler stores entries in the table, and needs an exact calculator")
+        self.calculator = calculator
+        self.jobs = jobs
+
+    def _known(self, g, n):
+        return self.calculator._check_table(g, n)[1]
+
+    def _packed_dependencies(self, deps):
+        return {(g, n): _pack(self.calculator._get_entry(g, n))
+                for g, n in deps}
+
+    def _run_level(self, graph, level, executor):
+        # Base cases are cheap, and always computed directly
+        leaves = [node for node in level if not graph[node]]
+        for g, n in leaves:
+            self.calculator(g, n)
+
+        nodes = [node for node in level if graph[node]]
+        if executor is None:
+            for g, n in nodes:
+                self.calculator(g, n)
+        else:
+            futures = {node: executor.submit(_compute_entry, *node,
+                                             self._packed_dependencies(graph[node]),
+                                             self.calculator.compact,
+                                             self.calculator.rational)
+                       for node in nodes}
+            for (g, n), future in futures.items():
+                self.calculator._add_to_table(g, n, _unpack(future.result(), n, self.calculator))
+
+    def run(self, targets):
+        """
+        Computes V_(g,n) for every (g,n) in targets.
+
+        :param targets: list of (g,n)
+        :returns: dict {(g,n): V}
+        """
+        graph = dependency_graph(targets, known=self._known)
+        schedule = levels(graph)
+        logger.info(f"Scheduled {len(graph)} entries in {len(schedule)} levels on {self.jobs} processes.")
+
+        if self.jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=self.jobs)
+        else:
+            executor = None
+
+        try:
+            for i, level in enumerate(schedule):
+                T0 = time.time()
+                logger.info(f"Level {i}: {len(level)} entries {level}")
+                with self.calculator.profiler.stage(f"level {i}", entries=len(level)):
+                    self._run_level(graph, level, executor)
+                logger.info(f"Level {i} finished ({time.time() - T0:.2f} s)")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return {(g, n): self.calculator(g, n) for g, n in targets}
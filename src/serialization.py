@@ -0,0 +1,84 @@
+"""
+Plain serialized form of Weil-Peterson volumes.
+
+A volume V_(g,n) is stored as a list of terms [monom, coefficient], where monom
+is the list of exponents of L1, ..., Ln and the coefficient is a list of
+[k, num, den] for each term num/den π^k. Only Python integers are used, so
+volumes can be passed between processes, written to disk and read back
+without SymPy.
+"""
+
+def coefficient_to_plain(c):
+    """
+    Converts an element of QQ_I[pi] or QQ[pi] to a list of [k, num, den]
+    """
+    terms = []
+    for (k,), r in sorted(c.items()):
+        # Gaussian rationals
+        if hasattr(r, "y"):
+            if r.y:
+                raise ValueError(f"Complex coefficient in volume: {c}")
+            r = r.x
+        terms.append([k, int(r.numerator), int(r.denominator)])
+
+    return terms
+
+def poly_to_plain(V):
+    """
+    Converts a Poly over QQ_I[pi] or QQ[pi] to the plain serialized form
+    """
+    return [[list(monom), coefficient_to_plain(c)] for monom, c in sorted(V.as_dict(native=True).items())]
+
+def coefficient_from_plain(terms, domain, graded=False):
+    """
+    Converts a list of [k, num, den] to an element of domain
+
+    :param graded: if True, leave out the powers of π (see WeilPetersonCalculator.rational)
+    """
+    import sympy as sp
+
+    if graded:
+        return domain.convert(sum((sp.QQ(num, den) for k, num, den in terms), sp.QQ(0)))
+
+    # Polynomial rings in π are filled in directly, which is much faster than from_sympy
+    if getattr(domain, "symbols", None) == (sp.pi,):
+        return domain.ring.from_dict({(k,): sp.QQ(num, den) for k, num, den in terms})
+
+    return domain.from_sympy(sum((sp.Rational(num, den) * sp.pi**k for k, num, den in terms), sp.Integer(0)))
+
+def poly_from_plain(plain, L, domain):
+    """
+    Converts the plain serialized form to a Poly in the generators L
+    """
+    import sympy as sp
+    V = {tuple(monom): coefficient_from_plain(terms, domain) for monom, terms in plain}
+    return sp.Poly.from_dict(V, L, domain=domain)
+
+def volume_to_record(V, n):
+    """
+    Converts a table entry, a SymmetricVolume or a Poly over QQ_I[pi], to a record
+    of plain Python objects
+    """
+    from src.symmetric import SymmetricVolume
+
+    if isinstance(V, SymmetricVolume):
+        coefficients = [[list(alpha), terms] for alpha, terms in sorted(V.coefficients.items())]
+        record = {"format": "symmetric", "n": n, "coefficients": coefficients}
+        if V.truncation is not None:
+            record["truncation"] = list(V.truncation)
+        return record
+
+    return {"format": "plain", "n": n, "terms": poly_to_plain(V)}
+
+def volume_from_record(record, L, domain):
+    """
+    Converts a record back to a table entry, a SymmetricVolume or a Poly in the generators L
+    """
+    from src.symmetric import SymmetricVolume
+
+    if record["format"] == "symmetric":
+        coefficients = {tuple(alpha): terms for alpha, terms in record["coefficients"]}
+        truncation = record.get("truncation")
+        return SymmetricVolume(coefficients, record["n"], None if truncation is None else tuple(truncation))
+
+    return poly_from_plain(record["terms"], L, domain)
@@ -0,0 +1,238 @@
+"""
+Local server of Weil-Peterson volumes over HTTP.
+
+    python -m src.server [--table FILE] [--port 8765] [--evaluators 64]
+
+One process owns the table, and analysis jobs query it instead of each loading
+their own copy. Requests and responses are JSON:
+
+    GET  /keys                              the stored (g,n)
+    GET  /volume?g=2&n=1                    plain record of V_(g,n) (see serialization)
+    GET  /coefficient?g=2&n=1&alpha=3       c_α as [num, den], and the power of π
+    POST /evaluate  {"queries": [{"g": 2, "n": 1, "L": [[1.0], [2.5]]}, ...]}
+                                            V_(g,n) at each row of L, per query,
+                                            in mpmath with "dps" digits if given
+
+Volumes missing from the table are computed by the calculator, one at a time.
+Concurrent requests for the same missing volume wait for a single computation.
+Evaluators (see evaluator.VolumeEvaluator) are kept in an LRU cache.
+"""
+from concurrent.futures import Future
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import threading
+import argparse
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class VolumeService:
+    """
+    Thread-safe access to the volumes of a calculator. The calculator is only used by
+    one thread at a time; evaluations run in the threads of the requests.
+    """
+    def __init__(self, calculator, evaluators=64):
+        """
+        :param evaluators: number of evaluators kept
+        """
+        self.calculator = calculator
+        self.max_evaluators = evaluators
+        self.evaluators = OrderedDict()
+        self.computations = 0
+
+        self._calculator_lock = threading.RLock()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def _found(self, g, n):
+        with self._calculator_lock:
+            return self.calculator._check_table(g, n)[1]
+
+    def ensure(self, g, n):
+        """
+        Makes sure V_(g,n) is in the table, computing it if necessary. Concurrent calls
+        for the same missing (g,n) share one computation.
+        """
+        if self._found(g, n):
+            return
+
+        with self._lock:
+            future = self._pending.get((g, n))
+            owner = future is None
+            if owner:
+                future = self._pending[(g, n)] = Future()
+
+        if owner:
+            try:
+                with self._calculator_lock:
+                    if not self.calculator._check_table(g, n)[1]:
+                        logger.info(f"Computing V_({g},{n}) on demand")
+                        self.calculator(g, n)
+                        self.computations += 1
+                future.set_result(None)
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                with self._lock:
+                    del self._pending[(g, n)]
+
+        future.result()
+
+    def keys(self):
+        with self._calculator_lock:
+            return self.calculator.keys()
+
+    def record(self, g, n):
+        import src.serialization as serialization
+
+        self.ensure(g, n)
+        with self._calculator_lock:
+            return serialization.volume_to_record(self.calculator._get_entry(g, n), n)
+
+    def coefficient(self, g, n, alpha):
+        """
+        Returns (c_α, power of π) of the coefficient of m_α in V_(g,n), computed from
+        intersection numbers if V_(g,n) is not in the table (see WeilPetersonCalculator.coefficient)
+        """
+        alpha = tuple(sorted((a for a in alpha if a), reverse=True))
+        if len(alpha) > n:
+            raise ValueError(f"m_{alpha} has more than {n} variables")
+
+        with self._calculator_lock:
+            c = self.calculator._coefficient(g, alpha, n)
+        return c, 2*max(3*g - 3 + n - sum(alpha), 0)
+
+    def evaluator(self, g, n):
+        """
+        Returns the evaluator of V_(g,n), from the LRU cache if possible
+        """
+        with self._lock:
+            if (g, n) in self.evaluators:
+                self.evaluators.move_to_end((g, n))
+                return self.evaluators[(g, n)]
+
+        self.ensure(g, n)
+        with self._calculator_lock:
+            evaluator = self.calculator.evaluator(g, n)
+
+        with self._lock:
+            self.evaluators[(g, n)] = evaluator
+            while len(self.evaluators) > self.max_evaluators:
+                self.evaluators.popitem(last=False)
+        return evaluator
+
+    def evaluate(self, queries):
+        """
+        :param queries: list of {"g": g, "n": n, "L": list of rows of n lengths, "dps": optional}
+        :returns: list of lists of volumes, as floats or as strings for dps
+        """
+        results = []
+        for query in queries:
+            g, n = int(query["g"]), int(query["n"])
+            evaluator = self.evaluator(g, n)
+            L = query.get("L") or [[]]
+            if query.get("dps"):
+                results.append([str(v) for v in evaluator.evaluate_mp(L, int(query["dps"]))])
+            else:
+                results.append([float(v) for v in evaluator(L)])
+        return results
+
+class VolumeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of the module docstring; self.server.service is the VolumeService
+    """
+    def _reply(self, status, body):
+        data = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, handler):
+        try:
+            self._reply(200, handler())
+        except (KeyError, ValueError, TypeError) as error:
+            self._reply(400, {"error": f"{type(error).__name__}: {error}"})
+        except Exception as error:
+            logger.exception("Request failed")
+            self._reply(500, {"error": f"{type(error).__name__}: {error}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+
+        if url.path == "/keys":
+            self._handle(lambda: {"keys": service.keys()})
+        elif url.path == "/volume":
+            self._handle(lambda: service.record(int(params["g"]), int(params["n"])))
+        elif url.path == "/coefficient":
+            def coefficient():
+                alpha = [int(a) for a in params.get("alpha", "").split(",") if a]
+                c, k = service.coefficient(int(params["g"]), int(params["n"]), alpha)
+                return {"coefficient": [c.numerator, c.denominator], "pi": k}
+            self._handle(coefficient)
+        else:
+            self._reply(404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/evaluate":
+            self._reply(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as error:
+            self._reply(400, {"error": f"Invalid JSON: {error}"})
+            return
+        self._handle(lambda: {"results": self.server.service.evaluate(body.get("queries", []))})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def make_server(calculator, host="127.0.0.1", port=8765, evaluators=64):
+    """
+    Returns a ThreadingHTTPServer serving the volumes of calculator; port 0 picks a free port
+    """
+    server = ThreadingHTTPServer((host, port), VolumeRequestHandler)
+    server.daemon_threads = True
+    server.service = VolumeService(calculator, evaluators=evaluators)
+    return server
+
+def main(argv=None):
+    from src.mirzakhani_recursion import WeilPetersonCalculator
+
+    parser = argparse.ArgumentParser(description="Serve Weil-Peterson volumes over HTTP")
+    parser.add_argument("-t", "--table", type=str, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--evaluators", type=int, default=64)
+    parser.add_argument("--rational", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    # Computed entries are committed to stores, and journaled for pickled tables
+    calculator = WeilPetersonCalculator(args.table, rational=args.rational, checkpoint=True)
+    server = make_server(calculator, args.host, args.port, args.evaluators)
+    logger.info(f"Serving <{args.table}> on http://{args.host}:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if calculator.store is None and calculator.journal is not None and len(calculator.journal):
+            calculator.save_table(args.table)
+
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
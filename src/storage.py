@@ -0,0 +1,246 @@
+from contextlib import contextmanager
+import sqlite3
+import fcntl
+import json
+import zlib
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORE_SUFFIXES = (".sqlite", ".db")
+
+@contextmanager
+def file_lock(filename):
+    """
+    Holds an exclusive lock (see fcntl.flock) on the directory of filename, e.g. while
+    rewriting a pickled table that other processes may also write. The table itself
+    cannot be locked, since it is replaced when it is rewritten (see checkpoint.atomic_dump),
+    and locking the directory leaves no lock files behind.
+    """
+    lock = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(lock)
+
+def canonical(record):
+    """
+    Returns the coefficients of a record as a dict {α: terms}, the same for records
+    in the plain and in the symmetric form of a volume
+    """
+    if record["format"] == "symmetric":
+        items = ((tuple(alpha), terms) for alpha, terms in record["coefficients"])
+    else:
+        # Symmetric volumes are determined by their terms with decreasing exponents
+        items = ((tuple(e//2 for e in monom if e), terms) for monom, terms in record["terms"]
+                 if all(monom[i] >= monom[i+1] for i in range(len(monom) - 1)))
+
+    return {alpha: sorted(map(tuple, terms)) for alpha, terms in items if terms}
+
+def window(record):
+    """
+    Returns the degree window (min_degree, max_degree) of a record, (0, None) if it is not truncated
+    """
+    truncation = record.get("truncation")
+    return (0, None) if truncation is None else tuple(truncation)
+
+def covers(outer, inner):
+    """
+    Returns True if the degree window outer contains the window inner
+    """
+    return outer[0] <= inner[0] and (outer[1] is None or (inner[1] is not None and outer[1] >= inner[1]))
+
+def _even_degrees(window):
+    # Degrees of the monomials of volumes are even
+    low, high = window
+    return (low + low % 2, None if high is None else high - high % 2)
+
+def union(stored, record):
+    """
+    Returns one record, in the symmetric form, holding the terms of two agreeing records
+    whose windows overlap or adjoin (see compare)
+    """
+    (low1, high1), (low2, high2) = window(stored), window(record)
+    low = min(low1, low2)
+    high = None if high1 is None or high2 is None else max(high1, high2)
+
+    coefficients = canonical(stored)
+    coefficients.update(canonical(record))
+    result = {"format": "symmetric", "n": stored["n"],
+              "coefficients": [[list(alpha), [list(term) for term in terms]]
+                               for alpha, terms in sorted(coefficients.items())]}
+    if (low, high) != (0, None):
+        result["truncation"] = [low, high]
+    return result
+
+def compare(stored, record):
+    """
+    Compares a new record for an entry with the stored one
+
+    :returns: "duplicate" if the stored record holds all of record, "replace" if record
+              holds all of the stored one and more, "extend" if each holds degrees the other
+              lacks and their windows overlap or adjoin (see union), "disjoint" if there are
+              degrees between their windows which neither holds, and "conflict" if they disagree
+    """
+    low = max(window(stored)[0], window(record)[0])
+    highs = [high for high in (window(stored)[1], window(record)[1]) if high is not None]
+    high = min(highs, default=None)
+
+    def restricted(r):
+        return {alpha: terms for alpha, terms in canonical(r).items()
+                if low <= 2*sum(alpha) and (high is None or 2*sum(alpha) <= high)}
+
+    if restricted(stored) != restricted(record):
+        return "conflict"
+    if covers(window(stored), window(record)):
+        return "duplicate"
+    if covers(window(record), window(stored)):
+        return "replace"
+
+    (low1, high1), (low2, high2) = sorted(map(_even_degrees, (window(stored), window(record))),
+                                          key=lambda w: w[0])
+    return "extend" if low2 <= high1 + 2 else "disjoint"
+
+def is_store(filename):
+    """
+    Returns True if filename refers to an SQLite table store rather than a pickle
+    """
+    return str(filename).endswith(STORE_SUFFIXES)
+
+class SQLiteTableStore:
+    """
+    Table of volumes in an SQLite database, with one row per (g,n).
+
+    Entries are records in the plain serialized form (see serialization.volume_to_record),
+    stored as compressed JSON. Entries are only read when asked for, and new
+    entries are appended without touching the existing ones.
+    
+    Several processes can share a store: the database is in WAL mode, so readers
+    do not block the writer, and every write is a transaction that waits up to
+    timeout seconds for the other writers.
+    """
+    def __init__(self, filename, timeout=60.0):
+        self.filename = str(filename)
+        # The connection may be shared between threads (see server), which serialize their use of it.
+        # Transactions are begun explicitly (see _transaction).
+        self.connection = sqlite3.connect(self.filename, timeout=timeout, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS volumes (
+                                           g INTEGER NOT NULL,
+                                           n INTEGER NOT NULL,
+                                           data BLOB NOT NULL,
+                                           PRIMARY KEY (g, n))""")
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS conflicts (
+                                           g INTEGER NOT NULL,
+                                           n INTEGER NOT NULL,
+                                           source TEXT,
+                                           data BLOB NOT NULL,
+                                           time REAL NOT NULL)""")
+    
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock at once, so read-then-write cannot race
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+    
+    @staticmethod
+    def _encode(record):
+        return zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+
+    def __contains__(self, key):
+        g, n = key
+        row = self.connection.execute("SELECT 1 FROM volumes WHERE g=? AND n=?", (g, n)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM volumes").fetchone()[0]
+
+    def keys(self):
+        """
+        Returns the list of stored (g,n)
+        """
+        return [tuple(row) for row in self.connection.execute("SELECT g, n FROM volumes ORDER BY g, n")]
+
+    def get(self, g, n):
+        """
+        Returns the record stored for (g,n), or None
+        """
+        row = self.connection.execute("SELECT data FROM volumes WHERE g=? AND n=?", (g, n)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, g, n, record):
+        """
+        Stores the record for (g,n), replacing any previous entry, unless record is
+        truncated and the previous entry holds all of it. Truncated records extending
+        the previous entry are joined with it (see union).
+        
+        :returns: True if the record was stored
+        """
+        with self._transaction():
+            stored = self.get(g, n)
+            if stored is not None and record.get("truncation") is not None:
+                if covers(window(stored), window(record)):
+                    return False
+                if compare(stored, record) == "extend":
+                    record = union(stored, record)
+            self.connection.execute("INSERT OR REPLACE INTO volumes (g, n, data) VALUES (?, ?, ?)",
+                                    (g, n, self._encode(record)))
+        return True
+
+    def merge(self, g, n, record, source=None):
+        """
+        Adds the record for (g,n) from another table. Identical entries are kept once, and
+        a record disagreeing with the stored entry is kept apart in the conflicts table.
+        
+        :param source: name of the other table, recorded with conflicts
+        :returns: "added", "duplicate", "replaced", "extended", "disjoint" or "conflict".
+                  Disjoint records cannot be joined into one window, and are kept apart
+                  with the conflicts.
+        """
+        with self._transaction():
+            stored = self.get(g, n)
+            status = "added" if stored is None else compare(stored, record)
+            
+            if status in ("conflict", "disjoint"):
+                self.connection.execute("INSERT INTO conflicts (g, n, source, data, time) VALUES (?, ?, ?, ?, ?)",
+                                        (g, n, source, self._encode(record), time.time()))
+                logger.warning(f"{status.capitalize()} entry for V_({g},{n}) in <{source}>, keeping the stored one.")
+            elif status == "extend":
+                self.connection.execute("INSERT OR REPLACE INTO volumes (g, n, data) VALUES (?, ?, ?)",
+                                        (g, n, self._encode(union(stored, record))))
+            elif status in ("added", "replace"):
+                self.connection.execute("INSERT OR REPLACE INTO volumes (g, n, data) VALUES (?, ?, ?)",
+                                        (g, n, self._encode(record)))
+        
+        return {"replace": "replaced", "extend": "extended"}.get(status, status)
+
+    def conflicts(self):
+        """
+        Returns the list of (g, n, source, record) of the conflicting records found by merge
+        """
+        rows = self.connection.execute("SELECT g, n, source, data FROM conflicts ORDER BY g, n, time")
+        return [(g, n, source, json.loads(zlib.decompress(data))) for g, n, source, data in rows]
+
+    def size(self):
+        """
+        Returns the size of the database file in bytes
+        """
+        return os.path.getsize(self.filename)
+
+    def info(self):
+        return {"file": self.filename, "entries": len(self), "bytes": self.size()}
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,87 @@
+import src.utils as utils
+import src.serialization as serialization
+
+class SymmetricVolume:
+    """
+    Compact representation of a volume V_(g,n) = Σ_α c_α m_α(L1, ..., Ln),
+    storing only the coefficients c_α indexed by partitions α (see utils.m).
+
+    Coefficients are kept in the plain serialized form (see serialization),
+    and are only expanded to monomials or a Poly when asked for.
+    """
+    def __init__(self, coefficients, n, truncation=None):
+        """
+        :param coefficients: dict {α: [[k, num, den], ...]}, α a partition in decreasing order
+        :param n: number of boundaries
+        :param truncation: degree window (min_degree, max_degree) of the monomials kept,
+                           for volumes computed in a truncated mode, or None
+        """
+        self.coefficients = coefficients
+        self.n = n
+        self.truncation = truncation
+        self._expanded = {}
+
+    @classmethod
+    def from_terms(cls, terms, n):
+        """
+        Builds the compact form from a dict {(e1, ..., en): coefficient} of a symmetric
+        polynomial over QQ_I[pi]. Only the terms with decreasing exponents are read.
+        """
+        coefficients = {}
+        for monom, c in terms.items():
+            if all(monom[i] >= monom[i+1] for i in range(len(monom) - 1)) and c:
+                coefficients[utils.partition_of(monom)] = serialization.coefficient_to_plain(c)
+
+        return cls(coefficients, n)
+
+    @classmethod
+    def from_poly(cls, V, n):
+        return cls.from_terms(V.as_dict(native=True), n)
+
+    def __getstate__(self):
+        # Expanded forms are rebuilt on demand
+        return {"coefficients": self.coefficients, "n": self.n, "truncation": self.truncation}
+
+    def __setstate__(self, state):
+        self.__init__(state["coefficients"], state["n"], state.get("truncation"))
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def rationals(self):
+        """
+        Returns the coefficients as a dict {α: rational}, leaving out the powers of π
+        implied by the grading (see WeilPetersonCalculator.rational)
+        """
+        from fractions import Fraction
+        return {alpha: sum((Fraction(num, den) for k, num, den in terms), Fraction(0))
+                for alpha, terms in self.coefficients.items()}
+
+    def terms(self, domain, n=None, graded=False):
+        """
+        Returns the expanded volume as a dict {(e1, ..., en): coefficient} over domain.
+        The expansion is cached per domain.
+
+        :param n: number of variables, at least self.n (defaults to self.n)
+        :param graded: if True, leave out the powers of π
+        """
+        if n is None:
+            n = self.n
+
+        if (domain, n, graded) not in self._expanded:
+            terms = {}
+            for alpha, c in self.coefficients.items():
+                c = serialization.coefficient_from_plain(c, domain, graded)
+                padded = [2*a for a in alpha] + [0]*(n - len(alpha))
+                for monom in utils.distinct_permutations(padded):
+                    terms[monom] = c
+            self._expanded[(domain, n, graded)] = terms
+
+        return self._expanded[(domain, n, graded)]
+
+    def to_poly(self, L, domain):
+        """
+        Expands the volume to a Poly in the generators L
+        """
+        import sympy as sp
+        return sp.Poly.from_dict(self.terms(domain, len(L)), L, domain=domain)
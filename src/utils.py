@@ -1,5 +1,18 @@
 import itertools
+import collections
+import math
 import sympy as sp
+from src.combinatorics import distinct_permutations
+
+_SYMBOLS = []
+
+def boundary_symbols(n):
+    """
+    Returns the boundary length symbols [L1, ..., Ln], from a pool shared by all tables
+    """
+    while len(_SYMBOLS) < n:
+        _SYMBOLS.append(sp.Symbol(f"L{len(_SYMBOLS) + 1}", positive=True))
+    return _SYMBOLS[:n]
 
 def all_bipartitions(L_list):
     """
@@ -24,6 +37,22 @@ def all_bipartitions(L_list):
             #yield (L_I, L_J)
     return tuple(partitions)
             
+def orbit_size(sequence):
+    """
+    Returns the number of distinct permutations of a sequence
+    """
+    size = math.factorial(len(sequence))
+    for count in collections.Counter(sequence).values():
+        size //= math.factorial(count)
+    return size
+
+def partition_of(monom):
+    """
+    Returns the partition α with L^monom a term of m_α, i.e. the non-zero
+    exponents halved, in decreasing order
+    """
+    return tuple(sorted((e // 2 for e in monom if e), reverse=True))
+
 def m(alpha, L):
     """
     Computes symmetric monomial
@@ -33,11 +62,8 @@ def m(alpha, L):
     # Pad alpha with zeros to match the length of L
     padded_alpha = alpha + [0] * (n - k)
     
-    # Use a set to avoid duplicate permutations
-    unique_permutations = set(itertools.permutations(padded_alpha))
-    
     result = 0
-    for perm in unique_permutations:
+    for perm in distinct_permutations(padded_alpha):
         # Compute the product for the current permutation
         product = 1
         for Li, beta_i in zip(L, perm):
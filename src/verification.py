@@ -0,0 +1,185 @@
+"""
+Randomized verification of the entries of a table.
+
+Every entry is checked at random points modulo a large prime p, with π replaced
+by a random element x of F_p. This is sound because each relation below holds
+as an identity of polynomials in π and the L_i:
+
+* grading: V_(g,n) has only even exponents, and a term c π^k L^e has k + |e| = 6g-6+2n,
+* symmetry: V_(g,n)(L) = V_(g,n)(σL) for the generators σ of S_n,
+* dilaton equation: ∂V_(g,n+1)/∂L_(n+1)(L, 2πi) = 2πi (2g-2+n) V_(g,n)(L),
+* string equation: V_(g,n+1)(L, 2πi) = Σ_k ∫_0^(L_k) L_k V_(g,n)(L) dL_k,
+
+the last two between each V_(g,n+1) and V_(g,n) in the table. A wrong entry
+passes a random check with probability at most about deg/p.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIME = 2**61 - 1
+
+def _terms(record, p=PRIME):
+    """
+    Returns the terms of a record (see serialization.volume_to_record) as a list
+    of (monom, k, c) with c π^k L^monom, c reduced modulo p
+    """
+    from src.query import record_terms
+
+    terms = []
+    for monom, coefficient in record_terms(record):
+        for k, num, den in coefficient:
+            terms.append((tuple(monom), k, num * pow(den, -1, p) % p))
+    return terms
+
+def evaluate(terms, L, x, p=PRIME):
+    """
+    Evaluates terms (see _terms) at L, with π = x, modulo p
+    """
+    result = 0
+    for monom, k, c in terms:
+        value = c * pow(x, k, p)
+        for L_i, e in zip(L, monom):
+            value = value * pow(L_i, e, p) % p
+        result += value
+    return result % p
+
+def check_grading(terms, g, n):
+    """
+    :returns: list of failure messages
+    """
+    top = 6*g - 6 + 2*n
+    failures = []
+    for monom, k, c in terms:
+        if any(e % 2 for e in monom):
+            failures.append(f"odd exponent in L^{list(monom)}")
+        elif k + sum(monom) != top:
+            failures.append(f"π^{k} L^{list(monom)} has degree {k + sum(monom)}, not {top}")
+        if failures:
+            break
+    return failures
+
+def check_symmetry(terms, n, rng, p=PRIME):
+    """
+    Checks invariance under the transposition (1 2) and the cycle (1 2 ... n), which generate S_n
+    """
+    L = [rng.randrange(p) for _ in range(n)]
+    x = rng.randrange(p)
+    value = evaluate(terms, L, x, p)
+    for permuted in [[L[1], L[0]] + L[2:], L[1:] + L[:1]]:
+        if evaluate(terms, permuted, x, p) != value:
+            return ["not symmetric in L"]
+    return []
+
+def _at_2πi(upper, n, p=PRIME, derivative=False):
+    """
+    Substitutes L_(n+1) = 2πi in the terms of V_(g,n+1), or in their derivative by L_(n+1)
+    divided by 2πi. (2πi)^(2j) = (-4)^j π^(2j) is real, so the result has terms in L1, ..., Ln.
+    """
+    terms = []
+    for monom, k, c in upper:
+        e = monom[n] if len(monom) > n else 0
+        j = e // 2
+        if derivative:
+            if e == 0:
+                continue
+            # e (2πi)^(e-1) / (2πi) = e (-4)^(j-1) π^(2j-2)
+            c = c * e * pow(-4, j - 1, p) % p if j >= 1 else 0
+            k += 2*j - 2
+        else:
+            c = c * pow(-4, j, p) % p
+            k += 2*j
+        terms.append((monom[:n], k, c))
+    return terms
+
+def check_dilaton(upper, lower, g, n, rng, p=PRIME):
+    """
+    Checks the dilaton equation between the terms of V_(g,n+1) and V_(g,n)
+    """
+    L = [rng.randrange(p) for _ in range(n)]
+    x = rng.randrange(p)
+    left = evaluate(_at_2πi(upper, n, p, derivative=True), L, x, p)
+    right = (2*g - 2 + n) * evaluate(lower, L, x, p) % p
+    return [] if left == right else [f"dilaton equation fails against V_({g},{n})"]
+
+def check_string(upper, lower, g, n, rng, p=PRIME):
+    """
+    Checks the string equation between the terms of V_(g,n+1) and V_(g,n)
+    """
+    L = [rng.randrange(p) for _ in range(n)]
+    x = rng.randrange(p)
+    left = evaluate(_at_2πi(upper, n, p), L, x, p)
+
+    # ∫_0^(L_k) L_k L_k^e dL_k = L_k^(e+2) / (e+2)
+    integrated = []
+    for monom, k, c in lower:
+        monom = tuple(monom[:n]) + (0,)*(n - len(monom))
+        for i in range(n):
+            raised = monom[:i] + (monom[i] + 2,) + monom[i+1:]
+            integrated.append((raised, k, c * pow(monom[i] + 2, -1, p) % p))
+    right = evaluate(integrated, L, x, p)
+    return [] if left == right else [f"string equation fails against V_({g},{n})"]
+
+def verify_entry(g, n, record, lower=None, trials=2, seed=0, p=PRIME):
+    """
+    Checks V_(g,n), given as a record, and its consistency with V_(g,n-1) if lower is given
+
+    :returns: list of failure messages
+    """
+    rng = random.Random(hash((seed, g, n)))
+    terms = _terms(record, p)
+    failures = check_grading(terms, g, n)
+
+    for _ in range(trials):
+        if n > 1:
+            failures += check_symmetry(terms, n, rng, p)
+        if lower is not None:
+            lower_terms = _terms(lower, p)
+            failures += check_dilaton(terms, lower_terms, g, n - 1, rng, p)
+            failures += check_string(terms, lower_terms, g, n - 1, rng, p)
+
+    # Report each failure once
+    return sorted(set(failures))
+
+def _verify_task(args):
+    g, n, record, lower, trials, seed = args
+    try:
+        return (g, n), verify_entry(g, n, record, lower, trials, seed)
+    except Exception as error:
+        return (g, n), [f"could not check: {type(error).__name__}: {error}"]
+
+def verify_table(table, jobs=1, trials=2, seed=0):
+    """
+    Checks every entry of a WeilPetersonTable
+
+    :returns: dict {(g,n): list of failure messages}, for every entry
+    """
+    import src.serialization as serialization
+
+    records, results = {}, {}
+    for g, n in table.keys():
+        try:
+            V = table._get_entry(g, n, truncated=True)
+            records[(g, n)] = serialization.volume_to_record(V, n)
+        except Exception as error:
+            results[(g, n)] = [f"could not read: {type(error).__name__}: {error}"]
+
+    tasks = []
+    for (g, n), record in records.items():
+        # The dilaton and string equations need full entries, and 2g-2+(n-1) > 0
+        lower = records.get((g, n - 1))
+        if n < 1 or 2*g - 3 + n <= 0 or any(r.get("truncation") for r in (record, lower) if r):
+            lower = None
+        tasks.append((g, n, record, lower, trials, seed))
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results.update(executor.map(_verify_task, tasks))
+    else:
+        results.update(map(_verify_task, tasks))
+
+    failed = sum(1 for failures in results.values() if failures)
+    logger.info(f"Verified {len(results)} entries, {failed} failed.")
+    return dict(sorted(results.items()))
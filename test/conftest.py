@@ -0,0 +1,44 @@
+import pytest
+import shutil
+from pathlib import Path
+from src.mirzakhani_recursion import WeilPetersonCalculator
+
+TEST_PATH = Path(__file__).parent
+
+@pytest.fixture
+def instance():
+    return WeilPetersonCalculator(pickled_table = TEST_PATH / "test_table.pkl")
+
+@pytest.fixture(scope="session")
+def reference():
+    """
+    Calculator on the test table for the expected volumes, shared by all tests,
+    so it is only used to compute volumes
+    """
+    return WeilPetersonCalculator(pickled_table = TEST_PATH / "test_table.pkl")
+
+@pytest.fixture
+def table_file(tmp_path):
+    """
+    Copy of the test table, for tests writing to their table
+    """
+    filename = tmp_path / "table.pkl"
+    shutil.copy(TEST_PATH / "test_table.pkl", filename)
+    return filename
+
+@pytest.fixture
+def make_calculator():
+    """
+    Returns a function creating calculators on the test table with the given options,
+    which are closed after the test
+    """
+    calculators = []
+
+    def make(**options):
+        calculator = WeilPetersonCalculator(pickled_table = TEST_PATH / "test_table.pkl", **options)
+        calculators.append(calculator)
+        return calculator
+
+    yield make
+    for calculator in calculators:
+        calculator.close()
@@ -0,0 +1,29 @@
+import sympy as sp
+from src.batch import BatchRun, parse_values, parse_targets, plan
+import src.scheduler as scheduler
+
+def test_parse_targets():
+    assert parse_values("3") == [3]
+    assert parse_values("7:10") == [7, 8, 9, 10]
+    assert parse_values("0:2,5") == [0, 1, 2, 5]
+    assert parse_targets("0:1", "0:3") == [(0, 3), (1, 1), (1, 2), (1, 3)]
+
+def test_batch_run(instance, reference):
+    calculator, expected = instance, reference
+    targets = parse_targets("2:3", "0:2")
+
+    # Every target comes after its dependencies
+    order = plan(targets)
+    assert sorted(order) == sorted(targets)
+    for i, (g, n) in enumerate(order):
+        graph = scheduler.dependency_graph([(g, n)])
+        assert not set(order[i+1:]) & set(graph) - {(g, n)}
+
+    saves = []
+    batch = BatchRun(calculator, save=lambda: saves.append(len(calculator.keys())), save_interval=0)
+    volumes = batch.run(targets)
+
+    assert len(saves) == len(targets)
+    assert set(batch.times) == set(targets)
+    for g, n in targets:
+        assert sp.expand(volumes[(g, n)].as_expr() - expected(g, n).as_expr()) == 0
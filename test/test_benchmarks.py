@@ -0,0 +1,31 @@
+import copy
+import json
+from benchmarks import benchmark
+
+def test_benchmark_history(tmp_path):
+    history = tmp_path / "history.jsonl"
+    record = benchmark.run(targets=[(1, 2), (2, 0)], engines=["rational", "float"], history=history, repeat=1)
+    
+    assert "recursion/rational/V_(2,0)" in record["results"]
+    assert "tables/load/store" in record["results"]
+    assert benchmark.load_history(history) == [record]
+    
+    slower = copy.deepcopy(record)
+    slower["results"]["recursion/rational/V_(1,2)"] *= 2
+    rows, regressions = benchmark.compare(record, slower, threshold=0.5)
+    assert regressions == ["recursion/rational/V_(1,2)"]
+    assert len(rows) == len(record["results"])
+    
+    assert benchmark.main(["--history", str(history), "compare"]) == 0
+    
+    # Runs on other machines are not regressions, nor baselines by default
+    elsewhere = copy.deepcopy(slower)
+    elsewhere["machine"] = "elsewhere"
+    rows, regressions = benchmark.compare(record, elsewhere, threshold=0.5)
+    assert regressions == [] and len(rows) == len(record["results"])
+    
+    with open(history, "a") as file:
+        for run in [elsewhere, slower]:
+            file.write(json.dumps(run) + "\n")
+    assert benchmark.main(["--history", str(history), "compare", "--threshold", "0.5"]) == 1
+    assert benchmark.main(["--history", str(history), "compare", "--baseline", "1", "--threshold", "0.5"]) == 0
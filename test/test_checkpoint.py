@@ -0,0 +1,46 @@
+from src.mirzakhani_recursion import WeilPetersonCalculator
+from src.checkpoint import Journal, journal_file
+
+def test_resume_from_journal(table_file):
+    table = table_file
+    
+    calculator = WeilPetersonCalculator(table, checkpoint=True)
+    V = calculator(1, 3)
+    assert len(Journal(journal_file(table))) == 3      # V_(1,2), V_(0,4), V_(1,3)
+    
+    # Simulate a crash in the middle of writing a new entry
+    with open(journal_file(table), "ab") as file:
+        file.write(b"\x40\x00\x00\x00\x00\x00\x00\x00\x01\x02")
+    
+    resumed = WeilPetersonCalculator(table, checkpoint=True)
+    assert resumed.resume() == 3
+    assert resumed._check_table(1, 3)[0] == V
+    
+    # Saving to the table file makes the journal redundant
+    resumed.save_table(table)
+    assert not journal_file(table).exists()
+    assert WeilPetersonCalculator(table)._check_table(1, 3)[0] == V
+
+def test_resume_after_torn_entry(table_file):
+    table = table_file
+    
+    calculator = WeilPetersonCalculator(table, checkpoint=True)
+    calculator(1, 3)
+    with open(journal_file(table), "ab") as file:
+        file.write(b"\x40\x00\x00\x00\x00\x00\x00\x00\x01\x02")
+    
+    # Entries journaled after the torn one are replayed after a second crash
+    resumed = WeilPetersonCalculator(table, checkpoint=True)
+    assert resumed.resume() == 3
+    resumed(0, 5)
+    resumed(1, 4)
+    
+    again = WeilPetersonCalculator(table, checkpoint=True)
+    assert again.resume() == 5
+    assert again._check_table(1, 4)[0] == resumed._check_table(1, 4)[0]
+    
+    # Saving to another file keeps the journal of the table
+    again.save_table(table.parent / "other.pkl")
+    assert WeilPetersonCalculator(table, checkpoint=True).resume() == 5
+    again.save_table(table)
+    assert not journal_file(table).exists()
@@ -0,0 +1,38 @@
+import numpy as np
+import sympy as sp
+import mpmath
+from fractions import Fraction
+from src import evaluator, utils
+
+def test_power_sums():
+    # m_(1,1) = (p_1² - p_2)/2
+    assert evaluator.to_power_sums({(1, 1): 1}) == {(1, 1): Fraction(1, 2), (2,): Fraction(-1, 2)}
+    assert evaluator.power_sum_expansion((2, 1)) == {(2, 1): 1, (3,): 1}
+
+def test_evaluator(instance):
+    points = [[Fraction(1, 2), Fraction(3, 1), Fraction(7, 4)], [Fraction(0), Fraction(5, 4), Fraction(11, 2)]]
+    L = utils.boundary_symbols(3)
+    
+    for g, n in [(0, 3), (1, 3), (2, 3)]:
+        V = instance(g, n).as_expr()
+        expected = [V.subs(dict(zip(L, map(sp.Rational, point)))) for point in points]
+        
+        for basis in ("power", "monomial"):
+            evaluate = instance.evaluator(g, n, basis=basis)
+            
+            computed = evaluate(np.array(points, dtype=float))
+            assert np.allclose(computed, [float(e) for e in expected], rtol=1e-13, atol=0)
+            
+            computed = evaluate.evaluate_mp([[mpmath.mpf(x.numerator)/x.denominator for x in point] for point in points], dps=40)
+            with mpmath.workdps(50):
+                for c, e in zip(computed, expected):
+                    assert abs(c - mpmath.mpf(str(sp.N(e, 50)))) < mpmath.mpf(10)**-30 * abs(c), f"Evaluation of V_({g},{n}) failed"
+
+def test_evaluator_batch(instance):
+    evaluate = instance.evaluator(1, 2)
+    L = np.random.default_rng(0).uniform(0, 10, size=(1000, 2))
+    
+    # V_(1,2) = (L1² + L2² + 4π²)(L1² + L2² + 12π²)/192
+    s = (L**2).sum(axis=1)
+    assert np.allclose(evaluate(L), (s + 4*np.pi**2)*(s + 12*np.pi**2)/192, rtol=1e-13)
+    assert evaluate(np.zeros((0, 2))).shape == (0,)
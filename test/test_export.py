@@ -0,0 +1,42 @@
+import sys
+import subprocess
+from fractions import Fraction
+import numpy as np
+from pathlib import Path
+from src import export
+
+TEST_PATH = Path(__file__).parent
+PROJECT_ROOT = TEST_PATH.parent
+
+def test_export(tmp_path, instance):
+    calculator = instance
+    calculator(2, 2)
+    calculator(2, 0)
+    calculator.save_table(tmp_path / "table.pkl")
+
+    # One command converts a whole table
+    result = subprocess.run([sys.executable, "-m", "src.export", str(tmp_path / "table.pkl")],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    directory = tmp_path / "table_arrays"
+
+    index = export.read_index(directory)
+    assert [(entry["g"], entry["n"]) for entry in index["entries"]] == calculator.keys()
+    for g, n in calculator.keys():
+        arrays = export.read_volume(directory, g, n, index=index)
+        assert isinstance(arrays.exponents, np.memmap) and arrays.exponents.shape == (len(arrays), n)
+        assert arrays.rationals() == calculator._rationals(g, n)
+
+    L = [[1.0, 2.0], [0.5, 3.0]]
+    assert np.allclose(export.read_volume(directory, 2, 2).evaluator()(L), calculator.evaluator(2, 2)(L), rtol=1e-12)
+    assert export.read_volume(directory, 9, 9) is None
+
+def test_export_big_integers(tmp_path):
+    # V_(1,1) = 1/48 L1² + π²/12, written with integers beyond int64
+    record = {"format": "plain", "n": 1, "terms": [[[0], [[2, 2**70, 12 * 2**70]]], [[2], [[0, 1, 48]]]]}
+    entry = export.write_volume(tmp_path, 1, 1, record)
+    assert entry["numerators"] == "bytes" and entry["denominators"] == "bytes"
+
+    arrays = export.read_volume(tmp_path, 1, 1, index={"entries": [entry]})
+    assert list(arrays.numerators) == [2**70, 1] and arrays.denominators[0] == 12 * 2**70
+    assert arrays.rationals() == {(): Fraction(1, 12), (1,): Fraction(1, 48)}
@@ -1,8 +1,11 @@
 import sympy as sp
 from src import utils 
-from src.mirzakhani_recursion import WeilPetersonCalculator
+from src import integration
+from src import kernels
+from src.mirzakhani_recursion import WeilPetersonCalculator, WeilPetersonTable
 from pathlib import Path
 import logging
+from fractions import Fraction
 
 def test_F():
     TEST_PATH = Path(__file__).parent
@@ -24,6 +27,85 @@ def test_F():
            
         assert abs(expected[i] - computed[i])<1e-14, msg
 
+def test_kernel_cache():
+    cache = kernels.FKernelCache(maxsize=2)
+    
+    # ζ(2) = π²/6, ζ(4) = π⁴/90
+    assert kernels.zeta_even(1) == Fraction(1, 6)
+    assert kernels.zeta_even(2) == Fraction(1, 90)
+    assert cache.rational(3) == (Fraction(992, 63), Fraction(56, 3), Fraction(10, 3), Fraction(1, 6))
+    
+    cache.rational(1)
+    cache.rational(2)
+    assert list(cache.entries) == [1, 2], "Least recently used kernel was not evicted"
+
+def test_integrals(instance):
+    tester = instance
+    L1, L2 = sp.symbols("L1 L2")
+    
+    # ∫ x H(x, L1 + L2) + x H(x, L1 - L2) dx = F_1(L1 + L2) + F_1(L1 - L2)
+    computed = integration.single_integral({(1, 0, (0,)): tester.domain.one}, tester.F_coefficients)
+    computed = sp.Poly.from_dict(computed, [L1, L2], domain=tester.domain).as_expr()
+    expected = (tester.F(1, L1 + L2) + tester.F(1, L1 - L2)).expand()
+    assert (computed - expected).expand() == 0, "Single integral failed"
+    
+    # ∫∫ x y^3 H(x + y, L1) dx dy = 1!3!/5! F_5(L1)
+    computed = integration.double_integral({(1, 2, ()): tester.domain.one}, tester.F_coefficients, tester._double_weight)
+    computed = sp.Poly.from_dict(computed, [L1], domain=tester.domain).as_expr()
+    expected = (tester.F(3, L1) / 20).expand()
+    assert (computed - expected).expand() == 0, "Double integral failed"
+
+def test_table_cache(instance):
+    tester = instance
+    
+    V, found = tester._check_table(1, 1)
+    assert tester.cache_misses == 1 and tester.cache_hits == 0
+    assert tester._check_table(1, 1)[0] is V
+    assert tester.cache_hits == 1
+    
+    # Storing an entry invalidates the cached Poly
+    tester._add_to_table(1, 1, 2*V)
+    assert tester._check_table(1, 1)[0] == 2*V
+    assert tester.cache_misses == 2
+
+def test_rational_engine(reference, make_calculator):
+    rational = make_calculator(rational=True)
+    
+    for g, n in [(0, 6), (1, 4), (2, 2), (3, 1), (3, 0)]:
+        expected = reference(g, n)
+        computed = rational(g, n)
+        assert sp.expand(computed.as_expr() - expected.as_expr()) == 0, f"Rational engine failed for (g,n) = ({g},{n})"
+
+def test_dilaton_equation(instance):
+    for g, n in [(2, 0), (3, 0), (4, 0), (1, 1), (2, 2)]:
+        instance(g, n+1)
+        computed = instance._apply_dilaton_equation(g, n)
+        expected = instance._apply_dilaton_equation_symbolic(g, n)
+        assert sp.expand(computed.as_expr() - expected.as_expr()) == 0, f"Dilaton equation failed for (g,n) = ({g},{n})"
+    
+    # V_(2,0) = 43π⁶/2160
+    assert instance(2, 0).as_expr() == 43*sp.pi**6/2160
+
+def test_approximate_engine(reference, make_calculator):
+    for precision, tolerance in [(None, 1e-14), (40, 1e-38)]:
+        approximate = make_calculator(exact=False, precision=precision)
+        for g, n in [(0, 6), (1, 4), (2, 2), (3, 1), (3, 0)]:
+            assert approximate(g, n).domain.is_RealField
+            reference(g, n)
+        assert approximate.keys() == [(0, 1), (0, 2), (0, 3), (1, 1)], "Approximations must not be stored in the table"
+        
+        # Without exact entries, the errors are estimated
+        estimated = approximate.approximation_errors()
+        assert all(estimated[key][1] == "estimated" for key in [(0, 6), (1, 4), (2, 2), (3, 1), (3, 0)])
+        assert max(error for error, method in estimated.values()) < tolerance
+        
+        approximate.table = reference.table
+        
+        errors = approximate.approximation_errors()
+        assert {(0, 6), (1, 4), (2, 2), (3, 1), (3, 0)} <= set(errors)
+        assert all(method == "exact" for error, method in errors.values())
+        assert max(error for error, method in errors.values()) < tolerance
+
 def test_V06(instance):
     L    = [sp.Symbol(f"L{i}", positive=True) for i in range(1,7)]
     m3   = utils.m([3], L)
@@ -108,6 +190,37 @@ def test_V14(instance):
     
     assert computed.equals(expected), "Test failed for (g,n) = (1,4)"
 
+def test_truncated_computation(tmp_path, reference):
+    expected = reference
+    filename = tmp_path / "base.pkl"
+    WeilPetersonTable(None).initialize_table(filename)
+    
+    for g, n, min_degree, max_degree in [(2, 2, 6, None), (1, 4, 4, 6), (3, 0, 0, 0), (3, 1, 14, None)]:
+        calculator = WeilPetersonCalculator(filename)
+        V = calculator(g, n, min_degree=min_degree, max_degree=max_degree)
+        
+        terms = {monom: c for monom, c in expected(g, n).as_dict().items()
+                 if sum(monom) >= min_degree and (max_degree is None or sum(monom) <= max_degree)}
+        assert V.as_dict() == terms, f"Truncated computation failed for (g,n) = ({g},{n})"
+        
+        # Truncated entries are stored with their window, and not used for full computations
+        assert calculator.truncation(g, n) == (min_degree, max_degree)
+        assert not calculator._check_table(g, n)[1]
+        assert sp.expand(calculator(g, n).as_expr() - expected(g, n).as_expr()) == 0
+        assert calculator.truncation(g, n) == (0, None)
+
+def test_parallel_terms(reference, make_calculator):
+    for rational in [False, True]:
+        calculator = make_calculator(rational=rational, entry_jobs=2, parallel_threshold=0)
+        calculator.parallel.chunk_size = 7
+        for g, n in [(0, 6), (1, 4), (2, 2), (3, 1), (3, 0)]:
+            computed = calculator(g, n)
+            assert sp.expand(computed.as_expr() - reference(g, n).as_expr()) == 0, f"Parallel terms failed for (g,n) = ({g},{n})"
+        
+        truncated = calculator(2, 3, min_degree=10)
+        terms = {monom: c for monom, c in reference(2, 3).as_dict().items() if sum(monom) >= 10}
+        assert truncated.as_dict() == terms
+
 def test_calculator():
     TEST_PATH = Path(__file__).parent
     tester = WeilPetersonCalculator(pickled_table = TEST_PATH / "test_table.pkl")
@@ -0,0 +1,46 @@
+import sympy as sp
+from fractions import Fraction
+from src.mirzakhani_recursion import WeilPetersonCalculator, WeilPetersonTable
+from src.symmetric import SymmetricVolume
+from src.intersection import IntersectionNumbers, count_partitions
+
+def test_psi_numbers():
+    numbers = IntersectionNumbers()
+
+    # ⟨τ_(3g-2)⟩_g = 1/(24^g g!)
+    assert numbers.psi(1, [1]) == Fraction(1, 24)
+    assert numbers.psi(2, [4]) == Fraction(1, 1152)
+    assert numbers.psi(3, [7]) == Fraction(1, 82944)
+    assert numbers.psi(0, [1, 0, 0, 0]) == 1
+    assert numbers.psi(1, [2, 0]) == numbers.psi(1, [1])
+    assert numbers.psi(2, [2, 3]) == Fraction(29, 5760)
+
+def test_volume_coefficients(reference):
+    numbers = IntersectionNumbers()
+    expected = reference
+
+    for g, n in [(0, 4), (1, 1), (1, 2), (2, 0), (2, 1), (0, 6), (1, 4), (2, 2)]:
+        V = expected(g, n)
+        coefficients = SymmetricVolume.from_poly(V, n).rationals()
+        for alpha, c in coefficients.items():
+            assert numbers.volume_coefficient(g, n, alpha) == c, f"Wrong coefficient {alpha} of V_({g},{n})"
+
+def test_calculator_coefficient(tmp_path, reference):
+    filename = tmp_path / "base.pkl"
+    WeilPetersonTable(None).initialize_table(filename)
+    calculator = WeilPetersonCalculator(filename, coefficient_seed=0.4)
+    expected = reference
+
+    # V_(2,2) has 12 coefficients: the first four are computed one at a time
+    assert count_partitions(5, 2) == 12
+    V = sp.Poly(expected(2, 2).as_expr(), *sp.symbols("L1 L2", positive=True))
+    for alpha in [(5,), (4, 1), (0, 3), ()]:
+        monom = tuple(2*a for a in alpha) + (0,)*(2 - len(alpha))
+        assert sp.simplify(calculator.coefficient(2, alpha, n=2) - V.coeff_monomial(monom)) == 0
+        assert not calculator._check_table(2, 2)[1]
+
+    # The fifth seeds the whole entry
+    calculator.coefficient(2, (2, 2))
+    V, found = calculator._check_table(2, 2)
+    assert found
+    assert sp.expand(V.as_expr() - expected(2, 2).as_expr()) == 0
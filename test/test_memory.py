@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+from src.mirzakhani_recursion import WeilPetersonCalculator
+from src.batch import BatchRun
+from src.memory import spill_file
+
+def test_memory_budget(tmp_path, table_file, instance):
+    expected = instance
+    calculator = WeilPetersonCalculator(pickled_table = table_file, memory_budget=100_000)
+
+    targets = [(2, 3), (3, 2), (4, 1)]
+    volumes = BatchRun(calculator).run(targets)
+    for g, n in targets:
+        assert volumes[(g, n)] == expected(g, n)
+
+    # Evicted entries are spilled and read back on demand
+    memory = calculator.memory.report()
+    assert memory["evictions"] > 0 and memory["reloads"] > 0
+    spill = Path(calculator.spill.filename)
+    assert spill.exists() and spill.parent == tmp_path
+    assert sum(map(len, calculator.table.values())) < len(calculator.keys())
+    assert calculator(2, 2) == expected(2, 2)
+    assert calculator.keys() == expected.keys()
+
+    # Saved tables hold the spilled entries too
+    calculator.save_table(table_file)
+    calculator.close()
+    assert not spill.exists()
+    assert WeilPetersonCalculator(pickled_table = table_file).keys() == expected.keys()
+
+def test_memory_budget_shared_table(table_file):
+    # Two runs on the same pickled table spill to their own stores
+    first = WeilPetersonCalculator(pickled_table = table_file, memory_budget=100_000)
+    first(3, 2)
+    spilled = first.spill.keys()
+    assert spilled
+
+    second = WeilPetersonCalculator(pickled_table = table_file, memory_budget=100_000)
+    second(2, 3)
+    assert first.spill.filename != second.spill.filename
+    second.close()
+    assert first.spill.keys() == spilled
+
+    keys = first.keys()
+    first.save_table(table_file)
+    first.close()
+    assert set(keys) <= set(WeilPetersonCalculator(pickled_table = table_file).keys())
+
+def test_stale_spill_files(table_file, reference):
+    running = WeilPetersonCalculator(pickled_table = table_file, memory_budget=100_000)
+    running(2, 2)
+    
+    # A run killed before closing its table leaves its spill store, without a lock on it
+    stale, lock = spill_file(table_file)
+    os.close(lock)
+    
+    WeilPetersonCalculator(pickled_table = table_file)
+    assert not stale.exists()
+    assert Path(running.spill.filename).exists()
+    assert running(2, 2) == reference(2, 2)
+    running.close()
+
+def test_memory_budget_store(tmp_path, instance, reference):
+    instance.save_table(tmp_path / "table.sqlite")
+
+    calculator = WeilPetersonCalculator(pickled_table = tmp_path / "table.sqlite", memory_budget=0)
+    assert calculator.spill is None
+    V = calculator(3, 2)
+    assert sum(map(len, calculator.table.values())) == 1
+    assert reference(3, 2) == V
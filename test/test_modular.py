@@ -0,0 +1,31 @@
+import sympy as sp
+from fractions import Fraction
+from src.array_recursion import ArrayRecursion, ModularArithmetic
+from src import modular
+
+def test_rational_reconstruction():
+    moduli = modular.primes(3)
+    r = Fraction(-123456789, 987654321)
+    x, M = modular.crt([ModularArithmetic(p).convert(r) for p in moduli], moduli)
+    assert modular.rational_reconstruction(x, M) == r
+    
+    # Too few primes for the size of the fraction
+    x, M = modular.crt([ModularArithmetic(moduli[0]).convert(r)], moduli[:1])
+    assert modular.rational_reconstruction(x, M) != r
+
+def test_modular_recursion():
+    p = modular.primes(1)[0]
+    recursion = ArrayRecursion(ModularArithmetic(p))
+    
+    # V_(1,2) = 1/192 m_(2) + 1/96 m_(1,1) + 1/12 π² m_(1) + 1/4 π⁴
+    expected = {(2,): Fraction(1, 192), (1, 1): Fraction(1, 96), (1,): Fraction(1, 12), (): Fraction(1, 4)}
+    assert recursion.coefficients(1, 2) == {alpha: ModularArithmetic(p).convert(c) for alpha, c in expected.items()}
+
+def test_multimodular_solver(instance, reference):
+    calculator, expected = instance, reference
+    
+    targets = [(0, 6), (1, 4), (2, 2), (3, 0)]
+    computed = modular.MultiModularSolver(calculator, primes=2).run(targets)
+    
+    for g, n in targets:
+        assert sp.expand(computed[(g, n)].as_expr() - expected(g, n).as_expr()) == 0, f"Multi-modular computation failed for (g,n) = ({g},{n})"
@@ -0,0 +1,35 @@
+import json
+from src.profiling import Profiler
+
+def test_profiler(tmp_path, instance):
+    calculator = instance
+    calculator.profiler = Profiler()
+    calculator(2, 1)
+    
+    report = calculator.profiler.report()
+    assert {"(2,1)", "(1,2)"} <= set(report["entries"])
+    assert {"term1", "term2", "term3", "double_integral", "single_integral", "L1_integration"} <= set(report["stages"])
+    assert report["counters"]["table_misses"] > 0
+    assert report["peak_memory"]["rss"] > 0
+    
+    # Time spent on V_(1,2) inside term 1 of V_(2,1) is not counted for that term
+    entry = report["entries"]["(2,1)"]
+    assert entry["stages"]["term1"]["self_wall"] <= entry["stages"]["term1"]["wall"]
+    assert entry["wall"] >= report["entries"]["(1,2)"]["wall"]
+    
+    calculator.profiler.save(tmp_path / "profile.json")
+    assert json.loads((tmp_path / "profile.json").read_text())["entries"].keys() == report["entries"].keys()
+    trace = json.loads((tmp_path / "profile.trace.json").read_text())
+    assert any(event["name"] == "V_(2,1)" for event in trace["traceEvents"])
+
+def test_profiler_parallel_counters(make_calculator):
+    # Both paths of the recursion count the monomials of the sum of its terms alike
+    counters = []
+    for entry_jobs in [1, 2]:
+        calculator = make_calculator(entry_jobs=entry_jobs, parallel_threshold=0)
+        calculator.profiler = Profiler()
+        calculator(2, 1)
+        counters.append(calculator.profiler.report()["counters"])
+    
+    for name in ["merged_monomials", "result_monomials"]:
+        assert counters[0][name] == counters[1][name] > 0
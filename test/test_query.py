@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import sympy as sp
+from pathlib import Path
+from src import query
+
+TEST_PATH = Path(__file__).parent
+PROJECT_ROOT = TEST_PATH.parent
+
+def test_query(tmp_path, instance):
+    calculator = instance
+    V = calculator(2, 2)
+    calculator.save_table(tmp_path / "table.sqlite")
+    calculator.compact_table()
+    calculator.save_table(tmp_path / "compact.sqlite")
+
+    L1, L2 = calculator._symbols(2)
+    expected = float(V.as_expr().subs({L1: sp.Rational(3, 2), L2: sp.Rational(1, 4)}))
+    for filename in ["table.sqlite", "compact.sqlite"]:
+        record = query.read_record(tmp_path / filename, 2, 2)
+        assert abs(query.evaluate(record, [1.5, 0.25]) - expected) < 1e-12 * expected
+        assert len(query.record_terms(record)) == len(V.terms())
+
+    assert query.read_record(tmp_path / "table.sqlite", 9, 9) is None
+    assert query.format_record(query.read_record(tmp_path / "table.sqlite", 1, 1)) == "1/48*L1^2 + 1/12*pi^2"
+
+    # Stores are read without SymPy
+    code = ("import sys; import src.query as q; "
+            f"assert q.main(['2', '2', '-t', {str(tmp_path / 'table.sqlite')!r}, '--at', '1.5', '0.25']) == 0; "
+            "assert 'sympy' not in sys.modules and 'scipy' not in sys.modules")
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert abs(float(result.stdout) - expected) < 1e-12 * expected
+
+def test_query_defaults(tmp_path, monkeypatch, instance):
+    # Unbounded windows of truncated entries
+    record = {"format": "plain", "n": 1, "terms": [[[2], [[0, 1, 48]]]], "truncation": [2, None]}
+    assert query.format_record(record) == "1/48*L1^2 + (degrees 2 and up only)"
+
+    # The store is read by default when there is one
+    monkeypatch.setattr(query, "DATA_PATH", str(tmp_path))
+    assert query.default_table() == str(tmp_path / "Weil-Peterson-base.pkl")
+    instance.save_table(tmp_path / "Weil-Peterson-base.sqlite")
+    assert query.default_table() == str(tmp_path / "Weil-Peterson-base.sqlite")
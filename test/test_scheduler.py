@@ -0,0 +1,22 @@
+import sympy as sp
+from src import scheduler
+
+def test_dependency_levels():
+    graph = scheduler.dependency_graph([(1, 2)])
+    assert graph[(1, 2)] == {(0, 3), (1, 1)}
+    
+    schedule = scheduler.levels(graph)
+    position = {node: i for i, level in enumerate(schedule) for node in level}
+    for node, deps in graph.items():
+        for dep in deps:
+            assert position[dep] < position[node], f"{dep} is not scheduled before {node}"
+
+def test_parallel_scheduler(instance, reference):
+    serial, parallel = reference, instance
+    
+    targets = [(0, 5), (1, 3), (2, 0)]
+    computed = scheduler.Scheduler(parallel, jobs=2).run(targets)
+    
+    for g, n in targets:
+        expected = serial(g, n)
+        assert sp.expand(computed[(g, n)].as_expr() - expected.as_expr()) == 0, f"Scheduler failed for (g,n) = ({g},{n})"
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen, Request
+import threading
+import json
+import sympy as sp
+from src.server import make_server
+
+def _get(url):
+    with urlopen(url) as response:
+        return json.loads(response.read())
+
+def _post(url, body):
+    request = Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urlopen(request) as response:
+        return json.loads(response.read())
+
+def test_server(instance, reference):
+    calculator, expected = instance, reference
+    server = make_server(calculator, port=0, evaluators=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        assert [1, 1] in _get(f"{url}/keys")["keys"]
+        assert _get(f"{url}/volume?g=1&n=1")["n"] == 1
+
+        # V_(1,2) = 1/192 m_(2) + 1/96 m_(1,1) + 1/12 π² m_(1) + 1/4 π⁴
+        assert _get(f"{url}/coefficient?g=1&n=2&alpha=1,1") == {"coefficient": [1, 96], "pi": 0}
+        assert _get(f"{url}/coefficient?g=1&n=2") == {"coefficient": [1, 4], "pi": 4}
+
+        # Concurrent requests for a missing volume are computed once
+        query = {"queries": [{"g": 3, "n": 2, "L": [[1.0, 2.0], [0.5, 0.0]]}, {"g": 2, "n": 0}]}
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: _post(f"{url}/evaluate", query), range(4)))
+        assert server.service.computations <= 2
+        assert all(result == results[0] for result in results)
+
+        L1, L2 = calculator._symbols(2)
+        V = expected(3, 2).as_expr()
+        volumes = results[0]["results"]
+        assert abs(volumes[0][0] - float(V.subs({L1: 1, L2: 2}))) < 1e-12 * volumes[0][0]
+        assert abs(volumes[0][1] - float(V.subs({L1: sp.Rational(1, 2), L2: 0}))) < 1e-12 * volumes[0][1]
+        assert abs(volumes[1][0] - float(43*sp.pi**6/2160)) < 1e-12
+
+        assert len(server.service.evaluators) == 2
+    finally:
+        server.shutdown()
+        server.server_close()
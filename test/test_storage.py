@@ -0,0 +1,149 @@
+import sympy as sp
+from pathlib import Path
+from src.mirzakhani_recursion import WeilPetersonCalculator, WeilPetersonTable
+from src.symmetric import SymmetricVolume
+import src.serialization as serialization
+import src.storage as storage
+
+TEST_PATH = Path(__file__).parent
+
+def test_store_roundtrip(tmp_path):
+    store = tmp_path / "table.sqlite"
+    
+    table = WeilPetersonTable(store)
+    table.import_table(TEST_PATH / "test_table.pkl")
+    assert len(table.store) == 4
+    
+    calculator = WeilPetersonCalculator(store)
+    V14 = calculator(1, 4)
+    calculator = WeilPetersonCalculator(store, compact=True)
+    V21 = calculator(2, 1)
+    assert isinstance(calculator._lookup(2, 1), SymmetricVolume)
+    
+    # Entries are only read when looked up
+    table = WeilPetersonTable(store)
+    assert table.table == {}
+    assert (1, 4) in table.keys() and (2, 1) in table.keys()
+    assert table._check_table(1, 4)[0] == V14
+    assert table.table.keys() == {"g=1"}
+    
+    # Export to a pickle, and back
+    table.save_table(tmp_path / "table.pkl")
+    exported = WeilPetersonTable(tmp_path / "table.pkl")
+    assert exported._check_table(2, 1)[0] == V21
+    assert exported.keys() == table.keys()
+
+def _compute_in_store(store, g, n):
+    calculator = WeilPetersonCalculator(store)
+    calculator(g, n)
+    return calculator.keys()
+
+def test_concurrent_writers(tmp_path, reference):
+    from concurrent.futures import ProcessPoolExecutor
+    
+    store = tmp_path / "table.sqlite"
+    WeilPetersonTable(store).import_table(TEST_PATH / "test_table.pkl")
+    
+    # Processes computing overlapping dependencies into one store
+    targets = [(1, 4), (2, 2), (0, 6), (2, 1)]
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        list(executor.map(_compute_in_store, [store]*len(targets), *zip(*targets)))
+    
+    table = WeilPetersonTable(store)
+    expected = reference
+    for g, n in targets:
+        assert sp.expand(table._check_table(g, n)[0].as_expr() - expected(g, n).as_expr()) == 0
+
+def test_merge_tables(tmp_path, reference, make_calculator):
+    calculator = make_calculator()
+    calculator(1, 2)
+    calculator.save_table(tmp_path / "first.pkl")
+    calculator(2, 1)
+    calculator.compact_table()
+    calculator.save_table(tmp_path / "second.pkl")
+    
+    # A snapshot with a wrong V_(1,2)
+    calculator = make_calculator()
+    L1, L2 = calculator._symbols(2)
+    calculator._add_to_table(1, 2, sp.Poly(L1**2 + L2**2, L1, L2, domain=calculator.domain))
+    calculator.save_table(tmp_path / "wrong.pkl")
+    
+    table = WeilPetersonTable(tmp_path / "merged.sqlite")
+    first = table.merge_table(tmp_path / "first.pkl")
+    assert first.keys() == {"added"}
+    second = table.merge_table(tmp_path / "second.pkl")
+    assert second["added"] == [(2, 1)]
+    assert (1, 2) in second["duplicate"]
+    wrong = table.merge_table(tmp_path / "wrong.pkl")
+    assert wrong["conflict"] == [(1, 2)]
+    
+    assert [(g, n) for g, n, source, record in table.store.conflicts()] == [(1, 2)]
+    assert sp.expand(table._check_table(1, 2)[0].as_expr() - reference(1, 2).as_expr()) == 0
+
+def test_partial_windows(tmp_path, instance):
+    calculator = instance
+    full = serialization.volume_to_record(SymmetricVolume.from_poly(calculator(2, 2), 2), 2)
+    
+    def truncated(low, high):
+        coefficients = [[alpha, terms] for alpha, terms in full["coefficients"]
+                        if low <= 2*sum(alpha) and (high is None or 2*sum(alpha) <= high)]
+        return dict(full, coefficients=coefficients, truncation=[low, high])
+    
+    assert storage.compare(truncated(0, 4), truncated(2, None)) == "extend"
+    assert storage.compare(truncated(0, 2), truncated(4, 6)) == "extend"
+    assert storage.compare(truncated(0, 2), truncated(6, None)) == "disjoint"
+    assert storage.canonical(storage.union(truncated(0, 4), truncated(2, None))) == storage.canonical(full)
+    assert "truncation" not in storage.union(truncated(0, 4), truncated(2, None))
+    
+    store = storage.SQLiteTableStore(tmp_path / "table.sqlite")
+    assert store.merge(2, 2, truncated(0, 4)) == "added"
+    assert store.merge(2, 2, truncated(8, None)) == "disjoint"
+    assert store.merge(2, 2, truncated(2, 8)) == "extended"
+    assert storage.window(store.get(2, 2)) == (0, 8)
+    assert store.put(2, 2, truncated(6, None))
+    assert storage.canonical(store.get(2, 2)) == storage.canonical(full)
+    assert len(store.conflicts()) == 1
+
+def test_concurrent_pickle_saves(table_file):
+    filename = table_file
+    first = WeilPetersonCalculator(filename)
+    second = WeilPetersonCalculator(filename)
+    
+    # Each run keeps the entries saved by the other
+    first(1, 2)
+    first.save_table(filename)
+    second(0, 5)
+    second.save_table(filename)
+    
+    keys = WeilPetersonTable(filename).keys()
+    assert (1, 2) in keys and (0, 5) in keys
+
+def test_concurrent_truncated_save(table_file):
+    filename = table_file
+    first = WeilPetersonCalculator(filename)
+    second = WeilPetersonCalculator(filename)
+    
+    # A truncated entry does not overwrite the full one saved by another run
+    second(2, 3)
+    second.save_table(filename)
+    first(2, 3, max_degree=2)
+    first.save_table(filename)
+    assert WeilPetersonTable(filename).truncation(2, 3) == (0, None)
+    assert first.truncation(2, 3) == (0, None)
+
+def test_concurrent_saves_to_output(tmp_path, make_calculator):
+    # Runs loading one table and saving to another, e.g. -i base.pkl -o shared.pkl
+    first, second = make_calculator(), make_calculator()
+    
+    first(1, 3)
+    first.save_table(tmp_path / "shared.pkl")
+    second(2, 2)
+    second.save_table(tmp_path / "shared.pkl")
+    first(0, 6)
+    first.save_table(tmp_path / "shared.pkl")
+    
+    keys = WeilPetersonTable(tmp_path / "shared.pkl").keys()
+    assert {(1, 3), (2, 2), (0, 6)} <= set(keys)
+    
+    # Saves leave no lock files behind
+    assert not list(tmp_path.glob("*.lock"))
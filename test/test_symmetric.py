@@ -0,0 +1,23 @@
+import pickle
+import sympy as sp
+from src import utils
+from src.symmetric import SymmetricVolume
+
+def test_symmetric_volume():
+    L = [sp.Symbol(f"L{i}", positive=True) for i in range(1, 4)]
+    domain = sp.QQ_I[sp.pi]
+    V = sp.Poly(utils.m([2, 1], L)/192 + utils.m([1], L)*sp.pi**2/24 + 14*sp.pi**6/9, L, domain=domain)
+    
+    compact = SymmetricVolume.from_poly(V, 3)
+    assert set(compact.coefficients) == {(2, 1), (1,), ()}
+    
+    compact = pickle.loads(pickle.dumps(compact))
+    assert compact.to_poly(L, domain) == V, "Compact volume did not expand to the original"
+
+def test_compact_calculator(reference, make_calculator):
+    calculator, expected = make_calculator(compact=True), reference
+    
+    for g, n in [(0, 6), (1, 4), (2, 2), (2, 0)]:
+        computed = calculator(g, n)
+        assert isinstance(calculator.table[f"g={g}"][f"n={n}"], SymmetricVolume)
+        assert sp.expand(computed.as_expr() - expected(g, n).as_expr()) == 0, f"Compact table failed for (g,n) = ({g},{n})"
@@ -0,0 +1,32 @@
+import src.serialization as serialization
+import src.verification as verification
+
+def test_verify_table(instance):
+    calculator = instance
+    calculator(2, 0)
+    calculator(2, 1)
+    calculator(1, 4)
+    results = verification.verify_table(calculator)
+    assert (1, 4) in results and (2, 0) in results
+    assert not any(results.values())
+
+    calculator.compact_table()
+    assert not any(verification.verify_table(calculator, jobs=2).values())
+
+def test_verify_wrong_entry(instance):
+    calculator = instance
+    calculator(1, 2)
+    V12 = serialization.volume_to_record(calculator._get_entry(1, 2), 2)
+    V11 = serialization.volume_to_record(calculator._get_entry(1, 1), 1)
+    assert verification.verify_entry(1, 2, V12, V11) == []
+
+    # Wrong coefficient of π⁴ (see test_merge_tables)
+    wrong = dict(V12, terms=[[monom, [[k, 1, 2] if k == 4 else [k, num, den] for k, num, den in c]]
+                             for monom, c in V12["terms"]])
+    assert verification.verify_entry(1, 2, wrong, V11) == ["string equation fails against V_(1,1)"]
+
+    # Not symmetric, and not graded
+    wrong = dict(V12, terms=V12["terms"] + [[[2, 0], [[2, 1, 7]]]])
+    assert verification.verify_entry(1, 2, wrong) == ["not symmetric in L"]
+    wrong = dict(V12, terms=V12["terms"] + [[[2, 2], [[2, 1, 7]]]])
+    assert verification.check_grading(verification._terms(wrong), 1, 2)